@@ -0,0 +1,223 @@
+import numpy as np
+import glm
+from SceneBounds import mat4_to_np
+
+leaf_size = 8  # primitives per leaf
+
+
+def morton_codes(points: np.ndarray) -> np.ndarray:
+    ''' 30 bit Morton codes of (N,3) points, quantized to 1024 steps over their bounding box '''
+    lo = points.min(axis=0)
+    extent = np.maximum(points.max(axis=0) - lo, 1e-12)
+    q = np.clip((points - lo) / extent * 1023, 0, 1023).astype(np.uint32)
+    code = np.zeros(points.shape[0], dtype=np.uint32)
+    for bit in range(10):
+        for axis in range(3):
+            code |= ((q[:, axis] >> bit) & 1) << (3 * bit + 2 - axis)
+    return code
+
+
+class BVH:
+    ''' Bounding volume hierarchy over N axis aligned boxes (the primitives, e.g., triangles or objects).
+    The primitives are sorted along a Morton curve and cut into leaves of leaf_size, and the tree is a complete
+    binary tree over the leaves in heap layout (the children of node i are 2i+1 and 2i+2, and the leaves are the
+    last level), so it is stored as three flat arrays: the primitive of each leaf slot (-1 for padding), and the
+    min and max corners of each node. Empty nodes have min > max and are never hit.
+    Queries go down the tree one level at a time for all their rays or planes at once, with numpy. '''
+    def __init__(self, order: np.ndarray, node_min: np.ndarray, node_max: np.ndarray,
+                 prim_min: np.ndarray, prim_max: np.ndarray):
+        self.order = order          # (leaves*leaf_size,) primitive in each leaf slot, -1 for padding
+        self.node_min = node_min    # (2*leaves-1, 3) node boxes, in heap order
+        self.node_max = node_max
+        self.prim_min = prim_min    # (N,3) primitive boxes
+        self.prim_max = prim_max
+        self.leaves = (node_min.shape[0] + 1) // 2
+        self.depth = self.leaves.bit_length() - 1  # the leaves are the nodes of this level
+        self.leaf_prims = order.reshape(self.leaves, -1)
+
+    @classmethod
+    def build(cls, prim_min: np.ndarray, prim_max: np.ndarray, leaf_size: int = leaf_size) -> 'BVH':
+        ''' build the hierarchy over (N,3) primitive boxes '''
+        prim_min = np.asarray(prim_min, dtype='f4')
+        prim_max = np.asarray(prim_max, dtype='f4')
+        n = prim_min.shape[0]
+        leaves = 1 << int(np.ceil(np.log2(max(-(-n // leaf_size), 1))))
+        order = np.full(leaves * leaf_size, -1, dtype='i4')
+        if n:
+            order[:n] = np.argsort(morton_codes((prim_min + prim_max) * 0.5), kind='stable')
+        # leaf boxes from their primitives (padding slots are empty boxes), then each level from the one below
+        slot_min = np.full((order.shape[0], 3), np.inf, dtype='f4')
+        slot_max = np.full((order.shape[0], 3), -np.inf, dtype='f4')
+        slot_min[:n], slot_max[:n] = prim_min[order[:n]], prim_max[order[:n]]
+        levels_min = [slot_min.reshape(leaves, leaf_size, 3).min(axis=1)]
+        levels_max = [slot_max.reshape(leaves, leaf_size, 3).max(axis=1)]
+        while levels_min[0].shape[0] > 1:
+            levels_min.insert(0, levels_min[0].reshape(-1, 2, 3).min(axis=1))
+            levels_max.insert(0, levels_max[0].reshape(-1, 2, 3).max(axis=1))
+        return cls(order, np.concatenate(levels_min), np.concatenate(levels_max), prim_min, prim_max)
+
+    @property
+    def arrays(self) -> tuple:
+        ''' the arrays to save for rebuilding the hierarchy with the primitive boxes (see MeshCache) '''
+        return self.order, self.node_min, self.node_max
+
+    def _descend(self, queries: np.ndarray, hits) -> tuple:
+        ''' (query, primitive) pairs whose boxes pass hits(queries, box_min, box_max) at every level.
+        queries index the caller's queries; all start at the root. '''
+        nodes = np.zeros(queries.shape[0], dtype=np.int64)
+        for level in range(self.depth + 1):
+            keep = hits(queries, self.node_min[nodes], self.node_max[nodes])
+            queries, nodes = queries[keep], nodes[keep]
+            if level < self.depth:
+                queries = np.repeat(queries, 2)
+                nodes = (2 * nodes[:, None] + [1, 2]).reshape(-1)
+        prims = self.leaf_prims[nodes - (self.leaves - 1)]
+        queries = np.repeat(queries, prims.shape[1])
+        prims = prims.reshape(-1)
+        valid = prims >= 0
+        queries, prims = queries[valid], prims[valid]
+        keep = hits(queries, self.prim_min[prims], self.prim_max[prims])
+        return queries[keep], prims[keep]
+
+    def overlap_planes(self, planes: np.ndarray) -> np.ndarray:
+        ''' boolean mask over the primitives, false for those whose box is outside one of the (P,4) planes
+        (positive inside), e.g., Culling.frustum_planes of a view '''
+        def inside(queries, box_min, box_max):
+            with np.errstate(invalid='ignore'):  # inf - inf of empty nodes
+                centers, extents = (box_min + box_max) * 0.5, (box_max - box_min) * 0.5
+                reach = centers @ planes[:, :3].T + extents @ np.abs(planes[:, :3]).T + planes[:, 3]
+            return np.all(reach >= 0, axis=1) & np.all(box_min <= box_max, axis=1)
+        mask = np.zeros(self.prim_min.shape[0], dtype=bool)
+        mask[self._descend(np.zeros(1, dtype=np.int64), inside)[1]] = True
+        return mask
+
+    def ray_pairs(self, origins: np.ndarray, dirs: np.ndarray, t_min, t_max) -> tuple:
+        ''' (ray, primitive) index pairs for the (R,3) rays origins + t dirs, t_min <= t <= t_max, that hit
+        the primitive box (slab test) '''
+        with np.errstate(divide='ignore'):
+            inv = 1.0 / dirs
+        t_min = np.broadcast_to(t_min, origins.shape[:1])
+        t_max = np.broadcast_to(t_max, origins.shape[:1])
+
+        def hit(rays, box_min, box_max):
+            o, d = origins[rays], inv[rays]
+            with np.errstate(invalid='ignore'):
+                t0, t1 = (box_min - o) * d, (box_max - o) * d
+            t_near = np.fmax(np.fmin(t0, t1).max(axis=1), t_min[rays])  # fmin and fmax skip the nan of 0 * inf
+            t_far = np.fmin(np.fmax(t0, t1).min(axis=1), t_max[rays])
+            return (t_near <= t_far) & np.all(box_min <= box_max, axis=1)
+        return self._descend(np.arange(origins.shape[0]), hit)
+
+
+def intersect_triangles(origins: np.ndarray, dirs: np.ndarray, v0: np.ndarray, v1: np.ndarray, v2: np.ndarray) -> np.ndarray:
+    ''' ray parameter t of the hits of (K,3) rays with (K,3) triangles, pairwise (Moller-Trumbore), inf on a miss '''
+    e1, e2 = v1 - v0, v2 - v0
+    p = np.cross(dirs, e2)
+    det = np.einsum('ij,ij->i', e1, p)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        inv = 1.0 / det
+        s = origins - v0
+        u = np.einsum('ij,ij->i', s, p) * inv
+        q = np.cross(s, e1)
+        v = np.einsum('ij,ij->i', dirs, q) * inv
+        t = np.einsum('ij,ij->i', e2, q) * inv
+        hit = (np.abs(det) > 1e-12) & (u >= 0) & (v >= 0) & (u + v <= 1)
+    return np.where(hit, t, np.inf)
+
+
+class MeshBVH:
+    ''' BVH over the triangles of a mesh, for casting many rays at once. '''
+    def __init__(self, positions: np.ndarray, indices: np.ndarray, arrays: tuple = None):
+        self.positions = np.asarray(positions, dtype='f4').reshape(-1, 3)
+        self.triangles = np.asarray(indices).reshape(-1, 3)
+        corners = self.positions[self.triangles]  # (T,3,3)
+        tri_min, tri_max = corners.min(axis=1), corners.max(axis=1)
+        if arrays is None:
+            self.bvh = BVH.build(tri_min, tri_max)
+        else:  # saved with the mesh (see MeshCache)
+            self.bvh = BVH(*(np.asarray(a) for a in arrays), tri_min, tri_max)
+
+    def hits(self, origins: np.ndarray, dirs: np.ndarray, t_min, t_max) -> tuple:
+        ''' (ray, triangle, t) of all hits of the rays with t_min <= t <= t_max '''
+        rays, tris = self.bvh.ray_pairs(origins, dirs, t_min, t_max)
+        v = self.positions[self.triangles[tris]]
+        t = intersect_triangles(origins[rays], dirs[rays], v[:, 0], v[:, 1], v[:, 2])
+        keep = (t >= np.broadcast_to(t_min, origins.shape[:1])[rays]) & (t <= np.broadcast_to(t_max, origins.shape[:1])[rays])
+        return rays[keep], tris[keep], t[keep]
+
+
+class SceneBVH:
+    ''' Two level BVH: a hierarchy over the object bounding boxes, with a MeshBVH over the triangles of each
+    object, all in world coordinates. Objects are added as they are loaded, and the object level is rebuilt
+    lazily on the next query. '''
+    def __init__(self):
+        self.names = []
+        self.meshes = []
+        self._objects = None
+
+    def add(self, name: str, positions: np.ndarray, indices: np.ndarray, arrays: tuple = None):
+        ''' add an object, with the saved arrays of its triangle hierarchy if there are any '''
+        self.names.append(name)
+        self.meshes.append(MeshBVH(positions, indices, arrays))
+        self._objects = None
+
+    @property
+    def objects(self) -> BVH:
+        if self._objects is None:
+            roots = [mesh.bvh for mesh in self.meshes]
+            self._objects = BVH.build(np.array([b.node_min[0] for b in roots]).reshape(-1, 3),
+                                      np.array([b.node_max[0] for b in roots]).reshape(-1, 3), leaf_size=2)
+        return self._objects
+
+    def frustum_objects(self, M: glm.mat4) -> np.ndarray:
+        ''' boolean mask over the objects (in the order they were added), false for objects outside the view
+        volume of M '''
+        from Culling import frustum_planes
+        return self.objects.overlap_planes(frustum_planes(M))
+
+    def depth_range(self, V: glm.mat4) -> tuple:
+        ''' near and far distances along the -Z axis of the (affine) view V that just fit all vertices.
+        Only the objects whose box can hold the nearest or farthest vertex are read. '''
+        A = mat4_to_np(V)
+        boxes = self.objects
+        centers = (boxes.prim_min + boxes.prim_max) * 0.5 @ A[2, :3] + A[2, 3]
+        extents = (boxes.prim_max - boxes.prim_min) * 0.5 @ np.abs(A[2, :3])
+        lo, hi = centers - extents, centers + extents  # view z range of each object box
+        near = [self.meshes[k].positions @ A[2, :3] for k in np.flatnonzero(hi >= lo.max())]
+        far = [self.meshes[k].positions @ A[2, :3] for k in np.flatnonzero(lo <= hi.min())]
+        return -float(max(z.max() for z in near) + A[2, 3]), -float(min(z.min() for z in far) + A[2, 3])
+
+    def intersect(self, origins: np.ndarray, dirs: np.ndarray, t_min: float = 0.0, t_max=np.inf) -> tuple:
+        ''' closest hits of the (R,3) rays: t (inf for a miss), object index and triangle index (-1 for a miss) '''
+        origins = np.asarray(origins, dtype='f4').reshape(-1, 3)
+        dirs = np.asarray(dirs, dtype='f4').reshape(-1, 3)
+        t_best = np.array(np.broadcast_to(t_max, origins.shape[:1]), dtype='f8')
+        obj_best = np.full(origins.shape[0], -1)
+        tri_best = np.full(origins.shape[0], -1)
+        rays, objs = self.objects.ray_pairs(origins, dirs, t_min, t_best)
+        for k in np.unique(objs):
+            r = rays[objs == k]
+            hit_rays, tris, t = self.meshes[k].hits(origins[r], dirs[r], t_min, t_best[r])
+            order = np.lexsort((t, hit_rays))  # closest hit of each ray first
+            first = np.unique(hit_rays[order], return_index=True)[1]
+            hit_rays, tris, t = r[hit_rays[order][first]], tris[order][first], t[order][first]
+            closer = t < t_best[hit_rays]
+            t_best[hit_rays[closer]] = t[closer]
+            obj_best[hit_rays[closer]], tri_best[hit_rays[closer]] = k, tris[closer]
+        missed = obj_best < 0
+        t_best[missed] = np.inf
+        return t_best, obj_best, tri_best
+
+    def occluded(self, origins: np.ndarray, dirs: np.ndarray, t_min: float = 0.0, t_max=np.inf) -> np.ndarray:
+        ''' boolean mask of the (R,3) rays that hit anything with t_min <= t <= t_max '''
+        origins = np.asarray(origins, dtype='f4').reshape(-1, 3)
+        dirs = np.asarray(dirs, dtype='f4').reshape(-1, 3)
+        t_max = np.broadcast_to(t_max, origins.shape[:1])
+        blocked = np.zeros(origins.shape[0], dtype=bool)
+        rays, objs = self.objects.ray_pairs(origins, dirs, t_min, t_max)
+        for k in np.unique(objs):
+            r = rays[objs == k]
+            r = r[~blocked[r]]
+            if r.shape[0]:
+                blocked[r[self.meshes[k].hits(origins[r], dirs[r], t_min, t_max[r])[0]]] = True
+        return blocked
@@ -0,0 +1,46 @@
+import numpy as np
+import glm
+from SceneBounds import mat4_to_np
+
+max_cascades = 4  # size of the cascade arrays of the shading program
+
+
+def split_depths(n: float, f: float, count: int, blend: float = 0.5) -> np.ndarray:
+    ''' count+1 depths from n to f that cut the view into count slices, blending logarithmic splits (the same
+    ratio far/near in each slice, which matches the perspective of the view) and uniform splits '''
+    i = np.arange(count + 1) / count
+    return blend * n * (f / n) ** i + (1 - blend) * (n + (f - n) * i)
+
+
+def slice_corners(camera, d0: float, d1: float) -> np.ndarray:
+    ''' (8,3) world corners of the part of the view volume of a camera between depths d0 and d1 '''
+    l, r, b, t, n, f = camera.frustum()
+    corners = np.array([[x * d / n, y * d / n, -d, 1] for d in (d0, d1) for x in (l, r) for y in (b, t)], dtype='f4')
+    return (corners @ mat4_to_np(camera.V_inv).T)[:, :3]
+
+
+def fit_light_frustum(light, points: np.ndarray) -> tuple:
+    ''' l, r, b, t, n, f of the smallest part of the light frustum that holds the (N,3) world points and
+    everything between them and the light: the near plane stays the one of the light, and l, r, b, t and the far
+    plane shrink to the points. Returns the whole light frustum if some of the points are behind the light. '''
+    l0, r0, b0, t0, n, f0 = light.frustum()
+    A = mat4_to_np(light.V)
+    coords = points @ A[:3, :3].T + A[:3, 3]
+    depth = -coords[:, 2]
+    if np.any(depth < n):
+        return l0, r0, b0, t0, n, f0
+    x, y = coords[:, 0] / depth * n, coords[:, 1] / depth * n  # on the near plane
+    l, r = np.clip([x.min(), x.max()], l0, r0)
+    b, t = np.clip([y.min(), y.max()], b0, t0)
+    eps = 1e-6 * (r0 - l0 + t0 - b0)
+    return float(l), float(max(r, l + eps)), float(b), float(max(t, b + eps)), n, float(max(min(depth.max(), f0), n * 1.001))
+
+
+def fit_cascades(camera, light, count: int, blend: float = 0.5) -> tuple:
+    ''' light projections of count slices of the view of a camera, and the view depth where each slice ends '''
+    l, r, b, t, n, f = camera.frustum()
+    n = max(n, f * 1e-3)  # the near plane fitted to the scene can be behind the camera
+    depths = split_depths(n, f, count, blend)
+    projections = [glm.frustum(*fit_light_frustum(light, slice_corners(camera, d0, d1)))
+                   for d0, d1 in zip(depths[:-1], depths[1:])]
+    return projections, [float(d) for d in depths[1:]]
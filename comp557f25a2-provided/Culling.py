@@ -0,0 +1,103 @@
+import numpy as np
+import glm
+from SceneBounds import mat4_to_np
+
+
+def frustum_planes(M: glm.mat4) -> np.ndarray:
+    ''' the 6 planes (a,b,c,d) of the clipping volume of the matrix M (e.g., PV) as a (6,4) array, in the
+    coordinates M is applied to, with positive values inside: left, right, bottom, top, near, far.
+    A point p is inside the volume when -w <= x,y,z <= w for (x,y,z,w) = M p, and each of these 6 conditions
+    is linear in p, so this works for any 4x4 matrix, including the post projection view. '''
+    A = mat4_to_np(M)
+    return np.stack([A[3] + A[0], A[3] - A[0], A[3] + A[1], A[3] - A[1], A[3] + A[2], A[3] - A[2]])
+
+
+def boxes_in_frustum(box_min: np.ndarray, box_max: np.ndarray, M: glm.mat4) -> np.ndarray:
+    ''' boolean mask over (K,3) axis aligned boxes, false for boxes that are completely outside one of the
+    planes of the clipping volume of M. This is conservative: a box that is kept may still be invisible,
+    e.g., outside a corner of the volume, but no box with a visible point is culled. '''
+    return boxes_inside_planes(box_min, box_max, frustum_planes(M))
+
+
+def boxes_inside_planes(box_min: np.ndarray, box_max: np.ndarray, planes: np.ndarray) -> np.ndarray:
+    ''' boolean mask over (K,3) axis aligned boxes, false for boxes that are completely outside one of the
+    (P,4) planes (a,b,c,d), with positive values inside '''
+    centers = (box_min + box_max) * 0.5
+    extents = (box_max - box_min) * 0.5
+    # largest value of each plane over each box: at the center plus the extents projected on the plane normal
+    reach = centers @ planes[:, :3].T + extents @ np.abs(planes[:, :3]).T + planes[:, 3]
+    return np.all(reach >= 0, axis=1)
+
+
+# the 8 corners of the [-1,1]^3 clipping cube, and its 12 edges as pairs of corners that differ in one coordinate
+cube_corners = np.array([[x, y, z] for x in (-1, 1) for y in (-1, 1) for z in (-1, 1)], dtype='f4')
+cube_edges = np.array([(i, i | bit) for i in range(8) for bit in (1, 2, 4) if not i & bit])
+
+
+def frustum_corners(M: glm.mat4) -> np.ndarray:
+    ''' the (8,3) corners of the clipping volume of M in the coordinates M is applied to, or None when the
+    volume is not a bounded frustum (e.g., a perspective with a near plane behind the eye) '''
+    corners = np.hstack([cube_corners, np.ones((8, 1), dtype='f4')]) @ mat4_to_np(glm.inverse(M)).T
+    w = corners[:, 3]
+    if not (np.all(w > 0) or np.all(w < 0)):
+        return None
+    return corners[:, :3] / w[:, None]
+
+
+def clip_segments(a: np.ndarray, b: np.ndarray, planes: np.ndarray) -> np.ndarray:
+    ''' the end points of the parts of the (E,3) segments a-b that are inside all the planes (Liang-Barsky) '''
+    da = a @ planes[:, :3].T + planes[:, 3]  # (E,6) plane values at both ends
+    db = b @ planes[:, :3].T + planes[:, 3]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = da / (da - db)  # where each segment crosses each plane
+    t_in = np.max(np.where((da < 0) & (db >= 0), t, 0), axis=1)
+    t_out = np.min(np.where((da >= 0) & (db < 0), t, 1), axis=1)
+    keep = ~np.any((da < 0) & (db < 0), axis=1) & (t_in <= t_out)
+    d = b[keep] - a[keep]
+    return np.vstack([a[keep] + t_in[keep, None] * d, a[keep] + t_out[keep, None] * d])
+
+
+def frustum_intersection(A: glm.mat4, B: glm.mat4) -> np.ndarray:
+    ''' (N,3) points whose convex hull is the intersection of the clipping volumes of A and B: the edges of
+    each volume clipped by the other, which gives the corners inside the other volume and all the points
+    where an edge of one crosses a face of the other. Returns None when either volume is not a frustum. '''
+    corners_a, corners_b = frustum_corners(A), frustum_corners(B)
+    if corners_a is None or corners_b is None:
+        return None
+    i, j = cube_edges[:, 0], cube_edges[:, 1]
+    return np.vstack([clip_segments(corners_a[i], corners_a[j], frustum_planes(B)),
+                      clip_segments(corners_b[i], corners_b[j], frustum_planes(A))])
+
+
+def shadow_caster_planes(light_PV: glm.mat4, view_PV: glm.mat4, margin: float = 0.0) -> np.ndarray:
+    ''' (P,4) planes around every object that can cast a shadow on something visible in the view: the part of the
+    light volume between the light and the region seen by both the light and the view.
+    In the clipping coordinates of the light, rays from the light are parallel to z, so this region is swept
+    towards the light by adding its points moved to the near plane (z = -1), and bounded by the planes of the
+    convex hull of these points (or of their bounding box, without scipy). The region is grown by margin in x and
+    y (e.g., a few shadow map texels for filtering). Planes of the light clipping coordinates are taken back to
+    world coordinates with the light PV, as for frustum_planes.
+    Returns the light volume planes when the volumes are not frustums, and None when the intersection is empty. '''
+    points = frustum_intersection(light_PV, view_PV)
+    if points is None:
+        return frustum_planes(light_PV)
+    if points.shape[0] == 0:
+        return None
+    L = mat4_to_np(light_PV)
+    clip = np.hstack([points, np.ones((points.shape[0], 1), dtype=points.dtype)]) @ L.T
+    ndc = clip[:, :3] / clip[:, 3:]
+    ndc[:, 2] += 1e-4
+    swept = np.vstack([ndc, ndc * [1, 1, 0] - [0, 0, 1]])
+    grown = np.vstack([swept + [dx, dy, 0] for dx in (-margin, margin) for dy in (-margin, margin)])
+    return np.vstack([hull_planes(grown) @ L, frustum_planes(light_PV)])
+
+
+def hull_planes(points: np.ndarray) -> np.ndarray:
+    ''' (P,4) planes (positive inside) of the convex hull of (N,3) points, or of their bounding box if scipy
+    is not available or the points are degenerate (e.g., all in a plane) '''
+    try:
+        from scipy.spatial import ConvexHull
+        return -ConvexHull(points).equations  # qhull normals point outwards
+    except Exception:  # ImportError, or QhullError for degenerate point sets
+        lo, hi = points.min(axis=0), points.max(axis=0)
+        return np.vstack([np.hstack([np.eye(3), -lo[:, None]]), np.hstack([-np.eye(3), hi[:, None]])])
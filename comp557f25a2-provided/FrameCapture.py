@@ -0,0 +1,164 @@
+import queue
+import threading
+import time
+from collections import deque
+from pathlib import Path
+import numpy as np
+import moderngl as mgl
+
+
+class ReadbackSlot:
+    ''' One pixel buffer object of a readback ring, with the host memory its pixels are copied to when collected.
+    Both grow to the largest readback made through the slot. '''
+    def __init__(self):
+        self.buffer = None
+        self.memory = np.zeros(0, dtype='u1')
+        self.free = threading.Event()  # cleared while the writer still uses the memory
+        self.free.set()
+        self.frame = self.tag = self.shape = self.dtype = None
+
+    def reserve(self, ctx: mgl.Context, nbytes: int):
+        if self.buffer is None or self.buffer.size < nbytes:
+            if self.buffer is not None:
+                self.buffer.release()
+            self.buffer = ctx.buffer(reserve=nbytes, dynamic=True)
+
+    def map(self) -> np.ndarray:
+        ''' copy the pixels of the buffer to host memory and return them as an array, top row first '''
+        nbytes = int(np.prod(self.shape)) * self.dtype.itemsize
+        if self.memory.size < nbytes:
+            self.memory = np.zeros(nbytes, dtype='u1')
+        self.buffer.read_into(self.memory, size=nbytes)
+        return self.memory[:nbytes].view(self.dtype).reshape(self.shape)[::-1]
+
+    def release(self):
+        if self.buffer is not None:
+            self.buffer.release()
+            self.buffer = None
+
+
+class FrameCapture:
+    ''' Readback of rendered images without waiting for the GPU. Each read copies a framebuffer (or a viewport
+    of it) into the next pixel buffer object of a ring kept for the name of the read, which returns as soon as
+    the copy is queued. At the end of each frame, the reads made latency frames before are collected: their
+    pixels are copied to host memory kept with the slot, by then without a stall, and handed to the consumers
+    and the writer as arrays of that memory (top row first), as consumer(tag, name, array).
+    An array stays valid until its slot comes around again, latency + 2 frames later, so consumers copy what
+    they keep; the writer holds on to its slot until written, and the ring waits for it when it falls behind.
+    moderngl does not map buffers, so collecting is one copy from the buffer into the slot's memory. '''
+    def __init__(self, ctx: mgl.Context, latency: int = 2, writer=None):
+        self.ctx = ctx
+        self.latency = latency
+        self.writer = writer
+        self.consumers = []
+        self.rings = {}  # name -> list of ReadbackSlot
+        self.next = {}   # name -> index of the next slot of the ring
+        self.pending = deque()  # (name, slot) not collected yet, in the order read
+        self.frame = 0
+        self.collected = 0  # counts of readbacks handed over, and of times the ring waited for the writer
+        self.waits = 0
+
+    def read(self, name: str, fbo: mgl.Framebuffer, viewport: tuple = None, components: int = 3,
+             attachment: int = 0, dtype: str = 'f1', tag=None):
+        ''' start copying an attachment of the framebuffer (-1 for depth) into the ring of the name, with the
+        arguments of Framebuffer.read; tag is handed over with the pixels (e.g., the frame's file name) '''
+        ring = self.rings.setdefault(name, [ReadbackSlot() for _ in range(self.latency + 2)])
+        i = self.next.get(name, 0)
+        self.next[name] = (i + 1) % len(ring)
+        slot = ring[i]
+        while any(pending is slot for _, pending in self.pending):
+            self.collect()  # (read more than once in a frame)
+        width, height = viewport[2:] if viewport is not None else fbo.size
+        slot.shape = (height, width, components) if components > 1 else (height, width)
+        slot.dtype = np.dtype('u1' if dtype == 'f1' else dtype)
+        slot.reserve(self.ctx, width * height * components * slot.dtype.itemsize)
+        fbo.read_into(slot.buffer, viewport=viewport, components=components, attachment=attachment, dtype=dtype)
+        slot.frame, slot.tag = self.frame, tag
+        self.pending.append((name, slot))
+
+    def end_frame(self):
+        ''' hand over the reads made latency frames ago (or before) '''
+        while self.pending and self.pending[0][1].frame <= self.frame - self.latency:
+            self.collect()
+        self.frame += 1
+
+    def collect(self):
+        ''' hand over the oldest read '''
+        name, slot = self.pending.popleft()
+        if not slot.free.is_set():
+            self.waits += 1
+            slot.free.wait()
+        array = slot.map()
+        for consumer in self.consumers:
+            consumer(slot.tag, name, array)
+        if self.writer is not None:
+            slot.free.clear()
+            self.writer.put(slot.tag, name, array, slot.free)
+        self.collected += 1
+
+    def flush(self):
+        ''' hand over all reads made so far '''
+        while self.pending:
+            self.collect()
+
+    def close(self):
+        ''' flush, wait for the writer to finish, and release the buffers '''
+        self.flush()
+        if self.writer is not None:
+            self.writer.close()
+        for ring in self.rings.values():
+            for slot in ring:
+                slot.release()
+        self.rings = {}
+
+
+class FrameWriter:
+    ''' A background thread that writes the arrays handed over by FrameCapture to a folder, as <tag>_<name>.npy
+    (or <tag>.npy for an empty name), or as png for 8 bit images when given a write_png(path, image) function
+    (e.g., Headless.write_png). Compressing and writing happen off the rendering thread, while it draws. '''
+    def __init__(self, folder, write_png=None):
+        self.folder = Path(folder)
+        self.write_png = write_png
+        self.paths = []  # files written, in order
+        self.seconds = 0.0  # time spent writing
+        self.error = None
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def put(self, tag, name: str, array: np.ndarray, done: threading.Event):
+        ''' queue an array to write, setting done once written (the array is not copied) '''
+        self.queue.put((tag, name, array, done))
+
+    def run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            tag, name, array, done = item
+            try:
+                if self.error is None:
+                    self.write(tag, name, array)
+            except Exception as e:  # raised again by close
+                self.error = e
+            finally:
+                done.set()
+
+    def write(self, tag, name: str, array: np.ndarray):
+        start = time.perf_counter()
+        stem = '_'.join(str(part) for part in (tag, name) if part not in (None, ''))
+        if self.write_png is not None and array.dtype == np.uint8 and array.ndim == 3:
+            path = self.folder / f'{stem}.png'
+            self.write_png(path, array)
+        else:
+            path = self.folder / f'{stem}.npy'
+            np.save(path, np.ascontiguousarray(array))  # (much faster than saving the flipped rows)
+        self.paths.append(path)
+        self.seconds += time.perf_counter() - start
+
+    def close(self):
+        ''' write what is queued and stop the thread '''
+        self.queue.put(None)
+        self.thread.join()
+        if self.error is not None:
+            raise self.error
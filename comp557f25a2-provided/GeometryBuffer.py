@@ -0,0 +1,210 @@
+import numpy as np
+import moderngl as mgl
+from MeshLOD import max_lod_levels
+
+# interleaved vertex layout: position and normal as float32, and the object colour as normalized bytes
+vertex_dtype = np.dtype([('position', 'f4', 3), ('normal', 'f4', 3), ('color', 'u1', 4)])
+
+
+class GeometryBuffer:
+    ''' All scene meshes packed into one interleaved vertex buffer and one index buffer, with a range of the
+    index buffer for each object. The vertex arrays of the different passes (see add_layout) share these two
+    buffers, e.g., the depth pass reads only the positions. As all objects are modelled in world coordinates,
+    any set of objects is drawn with one draw call per run of objects that are contiguous in the buffer.
+    Objects are numbered in the order they are appended; sets of objects are given as boolean masks in that
+    order (see object_mask), and the axis aligned bounding box of each object is kept for culling.
+    Objects can have simplified levels of detail (see MeshLOD). The indices of each level of all objects are
+    in their own part of the index buffer, after the full meshes (level 0), so objects drawn at the same level
+    are still contiguous; a level for each object is given as an integer array in object order (see runs).
+    Meshes are appended on the CPU, and the GPU buffers are (re)built before the next draw. '''
+    def __init__(self, ctx: mgl.Context, capacity: int = 1024):
+        self.ctx = ctx
+        self._verts = np.empty(max(capacity, 1), dtype=vertex_dtype)
+        self._indices = np.empty(max(capacity, 1) * 3, dtype='i4')
+        self.vertex_count = 0
+        self.index_count = 0
+        self._lod_indices = [np.empty(16, dtype='i4') for _ in range(max_lod_levels - 1)]  # indices of levels 1, 2, ...
+        self.lod_index_counts = [0] * (max_lod_levels - 1)
+        self.names = []     # object names, in the order of the per-object arrays below
+        self.ranges = {}    # object name -> (first, count) in the index buffer
+        self._firsts = np.empty(16, dtype='i8')       # first index and number of indices of each object
+        self._counts = np.empty(16, dtype='i8')
+        self._box_min = np.empty((16, 3), dtype='f4')  # bounding box corners of each object
+        self._box_max = np.empty((16, 3), dtype='f4')
+        self._level_firsts = np.zeros((16, max_lod_levels), dtype='i8')  # first index and number of indices of each
+        self._level_counts = np.zeros((16, max_lod_levels), dtype='i8')  # level of each object, in the part of the level
+        self._level_errors = np.full((16, max_lod_levels), np.inf, dtype='f4')  # geometric error, inf when missing
+        self._level_offsets = [0] * max_lod_levels  # where the part of each level starts in the GPU index buffer
+        self.layouts = {}   # layout name -> (program, format, attributes)
+        self.vaos = {}
+        self.vbo = None
+        self.ibo = None
+        self.dirty = False
+        self.draw_calls = 0  # total number of draw calls, for measuring
+        self.indices_drawn = 0  # total number of indices drawn (3 per triangle), for measuring
+
+    def append(self, name: str, positions: np.ndarray, indices: np.ndarray, normals: np.ndarray, color: tuple,
+               lods: list = ()) -> tuple:
+        ''' append a mesh with (N,3) positions and normals, a flat triangle index list, and an rgba colour in [0,1],
+        and its simplified levels as (positions, indices, normals, error) from the finest (see MeshData.lods).
+        Returns the (first, count) range of the object in the index buffer. '''
+        if name in self.ranges:
+            raise ValueError(f"object '{name}' is already in the geometry buffer")
+        positions = np.asarray(positions).reshape(-1, 3)
+        indices = np.asarray(indices).reshape(-1)
+        first = self.index_count
+        self._indices = grow(self._indices, first + indices.shape[0])
+        self._indices[first:first + indices.shape[0]] = indices + self._append_verts(positions, normals, color)
+        self.index_count += indices.shape[0]
+        self.ranges[name] = (first, indices.shape[0])
+        k = len(self.names)
+        self._firsts = grow(self._firsts, k + 1)
+        self._counts = grow(self._counts, k + 1)
+        self._box_min = grow(self._box_min, k + 1)
+        self._box_max = grow(self._box_max, k + 1)
+        self._level_firsts = grow(self._level_firsts, k + 1)
+        self._level_counts = grow(self._level_counts, k + 1)
+        self._level_errors = grow(self._level_errors, k + 1)
+        self._firsts[k], self._counts[k] = first, indices.shape[0]
+        self._box_min[k], self._box_max[k] = positions.min(axis=0), positions.max(axis=0)
+        self._level_firsts[k], self._level_counts[k], self._level_errors[k] = 0, 0, np.inf
+        self._level_firsts[k, 0], self._level_counts[k, 0], self._level_errors[k, 0] = first, indices.shape[0], 0
+        for level, (lod_positions, lod_indices, lod_normals, error) in enumerate(lods[:max_lod_levels - 1], 1):
+            lod_indices = np.asarray(lod_indices).reshape(-1)
+            part, start = self._lod_indices[level - 1], self.lod_index_counts[level - 1]
+            part = self._lod_indices[level - 1] = grow(part, start + lod_indices.shape[0])
+            part[start:start + lod_indices.shape[0]] = lod_indices + self._append_verts(lod_positions, lod_normals, color)
+            self.lod_index_counts[level - 1] += lod_indices.shape[0]
+            self._level_firsts[k, level], self._level_counts[k, level] = start, lod_indices.shape[0]
+            self._level_errors[k, level] = error
+        self.names.append(name)
+        self.dirty = True
+        return self.ranges[name]
+
+    def _append_verts(self, positions: np.ndarray, normals: np.ndarray, color: tuple) -> int:
+        ''' append vertices to the vertex buffer, and return the index of the first one '''
+        positions = np.asarray(positions).reshape(-1, 3)
+        base = self.vertex_count
+        self._verts = grow(self._verts, base + positions.shape[0])
+        verts = self._verts[base:base + positions.shape[0]]
+        verts['position'] = positions
+        verts['normal'] = np.asarray(normals).reshape(-1, 3)
+        verts['color'] = np.round(np.clip(color, 0, 1) * 255)
+        self.vertex_count += positions.shape[0]
+        return base
+
+    @property
+    def firsts(self) -> np.ndarray:
+        return self._firsts[:len(self.names)]
+
+    @property
+    def counts(self) -> np.ndarray:
+        return self._counts[:len(self.names)]
+
+    @property
+    def box_min(self) -> np.ndarray:
+        ''' (K,3) minimum corners of the bounding boxes of the objects '''
+        return self._box_min[:len(self.names)]
+
+    @property
+    def box_max(self) -> np.ndarray:
+        ''' (K,3) maximum corners of the bounding boxes of the objects '''
+        return self._box_max[:len(self.names)]
+
+    @property
+    def level_errors(self) -> np.ndarray:
+        ''' (K,max_lod_levels) geometric error of each level of each object, 0 for the full mesh, inf when missing '''
+        return self._level_errors[:len(self.names)]
+
+    @property
+    def level_counts(self) -> np.ndarray:
+        ''' (K,max_lod_levels) number of indices of each level of each object, 0 when missing '''
+        return self._level_counts[:len(self.names)]
+
+    def object_mask(self, names) -> np.ndarray:
+        ''' boolean mask over the objects, true for the given names '''
+        names = set(names)
+        return np.array([name in names for name in self.names], dtype=bool)
+
+    def add_layout(self, name: str, prog: mgl.Program, fmt: str, *attributes: str):
+        ''' add a vertex array of the buffers for a program, e.g., ('depth', prog, '3f 16x', 'in_position').
+        The format must cover the whole vertex (28 bytes), skipping unused fields with padding.
+        Layouts can be added after the buffers are built, without building them again. '''
+        self.layouts[name] = (prog, fmt, attributes)
+        if self.vbo is None or self.dirty:
+            self.dirty = True
+        else:
+            self.vaos[name] = self._vertex_array(prog, fmt, attributes)
+
+    def upload(self):
+        ''' rebuild the GPU buffers and vertex arrays from what was appended so far '''
+        self.release()
+        self.vbo = self.ctx.buffer(self._verts[:max(self.vertex_count, 1)])
+        parts = [self._indices[:self.index_count]] + [part[:n] for part, n in zip(self._lod_indices, self.lod_index_counts)]
+        self._level_offsets = np.cumsum([0] + [part.shape[0] for part in parts[:-1]]).tolist()
+        self.ibo = self.ctx.buffer(np.concatenate(parts) if self.index_count else self._indices[:1])
+        for name, (prog, fmt, attributes) in self.layouts.items():
+            self.vaos[name] = self._vertex_array(prog, fmt, attributes)
+        self.dirty = False
+
+    def _vertex_array(self, prog: mgl.Program, fmt: str, attributes: tuple) -> mgl.VertexArray:
+        return self.ctx.vertex_array(prog, [(self.vbo, fmt, *attributes)], index_buffer=self.ibo, mode=mgl.TRIANGLES)
+
+    def runs(self, mask: np.ndarray = None, levels: np.ndarray = None) -> list:
+        ''' (first, count) index ranges that draw the objects of the mask (all for None), merging adjacent objects,
+        at the level of each object in levels (the full meshes for None, and the coarsest one an object has when
+        the level is missing). The ranges of levels are in the GPU index buffer (see upload). '''
+        if levels is None:
+            if mask is None:
+                return [(0, self.index_count)] if self.index_count else []
+            return self._level_runs(mask, self.firsts, self.counts)
+        levels = np.minimum(levels, np.count_nonzero(self.level_counts, axis=1) - 1)
+        runs = []
+        for level in np.unique(levels if mask is None else levels[mask]).tolist():
+            at_level = levels == level if mask is None else mask & (levels == level)
+            firsts = self._level_firsts[:len(self.names), level] + self._level_offsets[level]
+            runs += self._level_runs(at_level, firsts, self.level_counts[:, level])
+        return runs
+
+    @staticmethod
+    def _level_runs(mask: np.ndarray, firsts: np.ndarray, counts: np.ndarray) -> list:
+        # the objects are contiguous in the index buffer, so each run of true values in the mask is one range
+        edges = np.diff(np.concatenate([[False], mask, [False]]).astype('i1'))
+        starts = np.flatnonzero(edges == 1)
+        stops = np.flatnonzero(edges == -1)
+        counts = firsts[stops - 1] + counts[stops - 1] - firsts[starts]
+        return list(zip(firsts[starts].tolist(), counts.tolist()))
+
+    def render(self, layout: str, mask: np.ndarray = None, levels: np.ndarray = None, instances: int = 1):
+        ''' draw the objects of the mask (all for None) with the vertex array of a layout, at the given levels
+        of detail (the full meshes for None), each draw instanced the given number of times '''
+        if self.dirty:
+            self.upload()
+        vao = self.vaos[layout]
+        for first, count in self.runs(mask, levels):
+            vao.render(vertices=count, first=first, instances=instances)
+            self.draw_calls += 1
+            self.indices_drawn += count
+
+    @property
+    def nbytes(self) -> int:
+        ''' bytes of GPU memory used by the vertex and index buffers '''
+        return self.vertex_count * vertex_dtype.itemsize + (self.index_count + sum(self.lod_index_counts)) * self._indices.itemsize
+
+    def release(self):
+        for vao in self.vaos.values():
+            vao.release()
+        self.vaos = {}
+        for buffer in (self.vbo, self.ibo):
+            if buffer is not None:
+                buffer.release()
+        self.vbo = self.ibo = None
+
+
+def grow(array: np.ndarray, size: int) -> np.ndarray:
+    ''' return the array, or a copy with (at least) double the capacity if size does not fit '''
+    if size <= array.shape[0]:
+        return array
+    bigger = np.empty((max(size, 2 * array.shape[0]),) + array.shape[1:], dtype=array.dtype)
+    bigger[:array.shape[0]] = array
+    return bigger
@@ -0,0 +1,175 @@
+''' Render the 4 views of the scene without a window or Qt, e.g., on a server without a display.
+
+    python Headless.py [jobs.json] [--out renders] [--size 1280x720] [--npy] [--views] [--depth-map] [--software]
+
+A job file holds a list of jobs. Each job can set camera poses and scene controls, and anything left
+out keeps its value from the previous job (or the defaults of Scene and SceneControl):
+
+    [{"name": "overview",
+      "cameras": {"main": {"rotate": [0.4, 1, 0, 0], "distance": 10},
+                  "light": {"R": [[1, 0, 0, 0], [0, 0, -1, 0], [0, 1, 0, 0], [0, 0, 0, 1]]}},
+      "controls": {"use_linear_filter": true, "main_view_fov": 30}}]
+
+A rotation is given either as "rotate": [angle in radians, x, y, z] or as a 4x4 matrix "R" in rows.
+Each job writes <name>.png with the 4 views (or <name>.npy with --npy), or <name>_main.png, <name>_light.png, ...
+with --views, and <name>_depth_map.npy with the shadow map depth with --depth-map. The frames are read back
+and written while the next jobs render (see FrameCapture).
+'''
+import argparse
+import json
+import os
+import struct
+import sys
+import zlib
+import numpy as np
+import moderngl as mgl
+import glm
+from pathlib import Path
+from Scene import Scene
+from SceneRenderer import SceneRenderer
+from FrameCapture import FrameCapture, FrameWriter
+
+camera_names = ['main', 'light', 'third_person', 'post_projection']  # in the order of Scene.cameras
+
+
+def create_headless_context(backend: str = None, software: bool = False) -> mgl.Context:
+    ''' create a standalone OpenGL 3.3 context without a window.
+    On Linux EGL is tried first, as it does not need an X server. With software set, Mesa is asked
+    for its software rasterizer (llvmpipe). '''
+    if software:
+        os.environ['LIBGL_ALWAYS_SOFTWARE'] = '1'
+    if backend is not None:
+        return mgl.create_standalone_context(require=330, backend=backend)
+    if sys.platform.startswith('linux'):
+        try:
+            return mgl.create_standalone_context(require=330, backend='egl')
+        except Exception:
+            pass  # fall back on the platform default (e.g., glx with a virtual display)
+    return mgl.create_standalone_context(require=330)
+
+
+def rotation_from_json(pose: dict):
+    ''' return the rotation matrix given in a camera pose, or None if there is none '''
+    if 'R' in pose:
+        rows = np.array(pose['R'], dtype='f4').reshape(4, 4)
+        return glm.mat4(*rows.T.flatten())  # glm takes the values column by column
+    if 'rotate' in pose:
+        angle, x, y, z = pose['rotate']
+        return glm.rotate(angle, glm.vec3(x, y, z))
+    return None
+
+
+def write_png(path: Path, img: np.ndarray, level: int = 6):
+    ''' write an (H,W,3) uint8 image as an 8 bit RGB png, compressed with the zlib level (1 is fastest) '''
+    h, w, _ = img.shape
+    rows = np.concatenate([np.zeros((h, 1), dtype='u1'), img.reshape(h, w * 3)], axis=1)  # filter type 0 on each row
+    raw = rows.tobytes()
+
+    def chunk(tag, data):
+        return struct.pack('>I', len(data)) + tag + data + struct.pack('>I', zlib.crc32(tag + data) & 0xffffffff)
+    with open(path, 'wb') as f:
+        f.write(b'\x89PNG\r\n\x1a\n')
+        f.write(chunk(b'IHDR', struct.pack('>IIBBBBB', w, h, 8, 2, 0, 0, 0)))
+        f.write(chunk(b'IDAT', zlib.compress(raw, level)))
+        f.write(chunk(b'IEND', b''))
+
+
+class HeadlessRenderer:
+    ''' The scene and its 4 views, rendered into an offscreen framebuffer of the given size. '''
+    def __init__(self, width: int = 1280, height: int = 720, backend: str = None, software: bool = False,
+                 ctx: mgl.Context = None):
+        self.ctx = ctx if ctx is not None else create_headless_context(backend, software)
+        self.size = (width, height)
+        self.fbo = self.ctx.framebuffer(
+            color_attachments=[self.ctx.renderbuffer(self.size)],
+            depth_attachment=self.ctx.depth_renderbuffer(self.size))
+        self.scene = Scene()
+        self.renderer = SceneRenderer(self.scene)
+        self.fbo.use()
+        self.renderer.initGL(self.ctx)
+        self.renderer.resize(width, height)
+
+    def set_camera(self, name: str, R: glm.mat4 = None, distance: float = None):
+        ''' set the rotation and/or distance of one of the cameras, by name (see camera_names) '''
+        camera = self.scene.cameras[camera_names.index(name)]
+        if R is not None:
+            camera.R = R
+        if distance is not None:
+            camera.distance = distance
+
+    def set_controls(self, **controls):
+        ''' set SceneControl values, e.g., set_controls(use_linear_filter=True) '''
+        for key, value in controls.items():
+            if not hasattr(self.scene.controls, key):
+                raise AttributeError(f"SceneControl has no control '{key}'")
+            setattr(self.scene.controls, key, value)
+
+    def apply_job(self, job: dict):
+        ''' set the camera poses and controls given in a job (see the module docstring) '''
+        for name, pose in job.get('cameras', {}).items():
+            self.set_camera(name, rotation_from_json(pose), pose.get('distance'))
+        self.set_controls(**job.get('controls', {}))
+
+    def render(self) -> np.ndarray:
+        ''' render a frame and return it as an (H,W,3) uint8 array, top row first '''
+        self.fbo.use()
+        self.renderer.render()
+        img = np.frombuffer(self.fbo.read(components=3), dtype='u1').reshape(self.size[1], self.size[0], 3)
+        return img[::-1]
+
+    def capture(self, capture: FrameCapture, tag, views: bool = False, depth_map: bool = False):
+        ''' render a frame and start its readback in the capture: the whole frame (with an empty name), or each
+        view by its camera name, and the shadow map depth (all cascade tiles) as depth_map '''
+        self.fbo.use()
+        self.renderer.render()
+        if views:
+            for name, (x, y, w, h) in zip(camera_names, self.renderer.view_ports):
+                capture.read(name, self.fbo, viewport=(int(x), int(y), int(w), int(h)), tag=tag)
+        else:
+            capture.read('', self.fbo, tag=tag)
+        if depth_map:
+            capture.read('depth_map', self.scene.texture.fbo_depth, components=1, attachment=-1, dtype='f4', tag=tag)
+        capture.end_frame()
+
+    def split_views(self, img: np.ndarray) -> list:
+        ''' cut a rendered frame into the images of the 4 views (main, light, third person, post projection) '''
+        views = []
+        for x, y, w, h in self.renderer.view_ports:
+            x, y, w, h = int(x), int(y), int(w), int(h)
+            top = self.size[1] - (y + h)
+            views.append(img[top:top + h, x:x + w])
+        return views
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Render the shadow mapping views without a display.')
+    parser.add_argument('jobs', nargs='?', help='json file with a list of jobs (default: one frame with default settings)')
+    parser.add_argument('--out', default='renders', help='output folder')
+    parser.add_argument('--size', default='1280x720', help='window size WxH')
+    parser.add_argument('--npy', action='store_true', help='write numpy arrays instead of png images')
+    parser.add_argument('--views', action='store_true', help='write each view to its own file')
+    parser.add_argument('--depth-map', action='store_true', help='also write the shadow map depth (npy)')
+    parser.add_argument('--software', action='store_true', help='use the Mesa software rasterizer')
+    parser.add_argument('--backend', default=None, help='glcontext backend, e.g., egl')
+    args = parser.parse_args()
+
+    jobs = json.loads(Path(args.jobs).read_text()) if args.jobs else [{'name': 'frame'}]
+    width, height = (int(x) for x in args.size.lower().split('x'))
+    out = Path(args.out)
+    out.mkdir(parents=True, exist_ok=True)
+
+    headless = HeadlessRenderer(width, height, backend=args.backend, software=args.software)
+    capture = FrameCapture(headless.ctx, writer=FrameWriter(out, write_png=None if args.npy else write_png))
+    for i, job in enumerate(jobs):
+        headless.apply_job(job)
+        headless.capture(capture, job.get('name', f'frame{i:04d}'), args.views, args.depth_map)
+    capture.close()
+    for path in capture.writer.paths:
+        print(path)
+    stats = headless.scene.shadow_stats
+    print(f'shadow passes: {stats.rendered} rendered, {stats.skipped} skipped ({stats.skip_rate:.0%}), '
+          f'about {stats.time_saved * 1e3:.1f} ms saved')
+
+
+if __name__ == '__main__':
+    main()
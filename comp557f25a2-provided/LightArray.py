@@ -0,0 +1,71 @@
+import ctypes
+import moderngl as mgl
+import glm
+
+max_lights = 16        # size of the light arrays in the shading and layered depth programs
+lights_unit = 3        # texture unit of the shadow map array (0, 1 shadow map, 2 view images, 4, 5 variance shadow map)
+light_elevation = 0.9  # angle of the other lights above the ground plane, in radians
+
+
+def light_ring_rotation(i: int, count: int) -> glm.mat4:
+    ''' the camera rotation of light i of count (i > 0, the first is the scene's light camera): the other lights
+    are evenly spaced around the vertical axis at light_elevation, looking at the origin '''
+    angle = 2 * glm.pi() * (i - 1) / (count - 1)
+    return glm.rotate(light_elevation, glm.vec3(1, 0, 0)) * glm.rotate(angle, glm.vec3(0, 1, 0))
+
+
+def gl_function(ctx: mgl.Context, name: str, restype, *argtypes):
+    ''' a GL function from the loader of the context (see Scene.set_depth_format) '''
+    return ctypes.CFUNCTYPE(restype, *argtypes)(ctx.mglo._context.load_opengl_function(name))
+
+
+def set_sampler_unit(ctx: mgl.Context, prog: mgl.Program, name: str, unit: int):
+    ''' assign a texture unit to a sampler2DArrayShadow uniform, a type moderngl does not know how to set '''
+    gl_function(ctx, 'glUseProgram', None, ctypes.c_uint)(prog.glo)
+    gl_function(ctx, 'glUniform1i', None, ctypes.c_int, ctypes.c_int)(prog[name].location, unit)
+
+
+class LightArray:
+    ''' Shadow maps of several lights in the layers of one 24 bit depth texture array, with a framebuffer that
+    has all layers attached. The shadow pass draws the casters once, instanced for each light, and a geometry
+    shader sends each instance to the layer of its light (gl_Layer), so its draw calls do not grow with the
+    number of lights. moderngl only makes colour texture arrays and does not attach them to framebuffers, so the
+    depth storage and the framebuffer are made with GL calls through the loader of the context. '''
+    def __init__(self, ctx: mgl.Context, size: int, count: int):
+        self.ctx = ctx
+        self.size = size
+        self.count = count
+        self.texture = ctx.texture_array((size, size, count), 1, dtype='f4')
+        GL_TEXTURE_2D_ARRAY, GL_DEPTH_COMPONENT24, GL_DEPTH_COMPONENT, GL_UNSIGNED_INT = 0x8C1A, 0x81A6, 0x1902, 0x1405
+        tex_image_3d = gl_function(ctx, 'glTexImage3D', None, ctypes.c_uint, ctypes.c_int, ctypes.c_int, ctypes.c_int,
+                                   ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_uint, ctypes.c_uint, ctypes.c_void_p)
+        self.texture.use(location=lights_unit)  # binds the texture for the GL call
+        tex_image_3d(GL_TEXTURE_2D_ARRAY, 0, GL_DEPTH_COMPONENT24, size, size, count, 0, GL_DEPTH_COMPONENT, GL_UNSIGNED_INT, None)
+        self.sampler = ctx.sampler(filter=(mgl.LINEAR, mgl.LINEAR), compare_func='>=', repeat_x=False, repeat_y=False,
+                                   texture=self.texture)
+        self.sampler.use(location=lights_unit)
+
+        GL_FRAMEBUFFER, GL_DEPTH_ATTACHMENT = 0x8D40, 0x8D00
+        self.fbo_glo = ctypes.c_uint(0)
+        gl_function(ctx, 'glGenFramebuffers', None, ctypes.c_int, ctypes.POINTER(ctypes.c_uint))(1, ctypes.byref(self.fbo_glo))
+        gl_function(ctx, 'glBindFramebuffer', None, ctypes.c_uint, ctypes.c_uint)(GL_FRAMEBUFFER, self.fbo_glo.value)
+        gl_function(ctx, 'glFramebufferTexture', None, ctypes.c_uint, ctypes.c_uint, ctypes.c_uint, ctypes.c_int)(
+            GL_FRAMEBUFFER, GL_DEPTH_ATTACHMENT, self.texture.glo, 0)
+        gl_function(ctx, 'glDrawBuffer', None, ctypes.c_uint)(0)  # no colour
+        self.fbo = ctx.detect_framebuffer(self.fbo_glo.value)
+        self.fbo.viewport = (0, 0, size, size)
+        self.contents_key = None  # Scene.light_array_key of the last render, None if never rendered
+
+    @property
+    def nbytes(self) -> int:
+        ''' bytes of GPU memory of the layers, assuming 24 bit depth is stored in 32 bits '''
+        return self.size * self.size * 4 * self.count
+
+    def set_filter(self, use_linear_filter: bool):
+        self.sampler.filter = (mgl.LINEAR, mgl.LINEAR) if use_linear_filter else (mgl.NEAREST, mgl.NEAREST)
+
+    def release(self):
+        gl_function(self.ctx, 'glDeleteFramebuffers', None, ctypes.c_int, ctypes.POINTER(ctypes.c_uint))(
+            1, ctypes.byref(self.fbo_glo))
+        self.sampler.release()
+        self.texture.release()
@@ -0,0 +1,43 @@
+import numpy as np
+import glm
+from SceneBounds import mat4_to_np
+
+
+def view_clip_matrix(camera) -> glm.mat4:
+    ''' PV of a camera, with the near plane moved in front of the eye when the near plane fitted to the scene is
+    behind it (as for the cascades), or None for a near plane at the eye '''
+    l, r, b, t, n, f = camera.frustum()
+    if n == 0:
+        return None
+    m = max(n, f * 1e-3)
+    return glm.frustum(l / n * m, r / n * m, b / n * m, t / n * m, m, f) * camera.V
+
+
+def light_window(V: glm.mat4, n: float, points: np.ndarray) -> tuple:
+    ''' l, r, b, t on the near plane n of the (affine) light view V that hold the (N,3) world points as seen from
+    the light, and their largest depth f. Returns None for no points, or when some are behind the light. '''
+    if points is None or points.shape[0] == 0:
+        return None
+    A = mat4_to_np(V)
+    coords = points @ A[:3, :3].T + A[:3, 3]
+    depth = -coords[:, 2]
+    if np.any(depth <= 0):
+        return None
+    x, y = coords[:, 0] / depth * n, coords[:, 1] / depth * n  # similar triangles
+    return float(x.min()), float(x.max()), float(y.min()), float(y.max()), float(depth.max())
+
+
+def snap_interval(lo: float, hi: float, unit: float, size: int, steps: int = 4) -> tuple:
+    ''' an interval of size texels that holds lo, hi. The texel size is unit * 2^(-k/steps) for an integer k, and
+    the ends are on multiples of it, so when the interval is fitted again to a moving camera it only moves by
+    whole texels, and only changes scale in a few steps, and the shadow edges do not shimmer. '''
+    needed = (hi - lo) / (size - 1)  # one texel to spare for moving lo down to the grid
+    texel = unit * 2 ** (-np.floor(-np.log2(needed / unit) * steps) / steps)
+    lo = np.floor(lo / texel) * texel
+    return float(lo), float(lo + texel * size)
+
+
+def snap_to_texels(l: float, r: float, b: float, t: float, units: tuple, size: int) -> tuple:
+    ''' l, r, b, t snapped to texels of a size x size shadow map in x and y (see snap_interval), for the texel
+    sizes units of the map fitted to the whole scene (with a texel to spare, so that it snaps to itself) '''
+    return (*snap_interval(l, r, units[0], size), *snap_interval(b, t, units[1], size))
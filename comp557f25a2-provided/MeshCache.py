@@ -0,0 +1,160 @@
+import hashlib
+import os
+import shutil
+import numpy as np
+from pathlib import Path
+from ObjLoader import load_obj
+from BVH import BVH
+from SceneBounds import hull_points
+from MeshLOD import build_lods
+from VertexCache import optimize_mesh
+
+CACHE_VERSION = 7  # bump when the preprocessing changes so that old cache entries are rebuilt
+
+mesh_arrays = ('positions', 'indices', 'normals', 'plane', 'bvh_order', 'bvh_min', 'bvh_max',
+               'lod_positions', 'lod_normals', 'lod_indices', 'lod_ranges', 'lod_errors', 'hull')
+
+
+class MeshData:
+    ''' Preprocessed mesh ready to upload to the GPU.
+    positions and normals are (N,3) float32, indices are a flat int32 triangle list, and plane is the
+    (a,b,c,d) plane through the first vertex with the first vertex normal (only meaningful for the ground).
+    The bvh arrays are the hierarchy over the triangles (see BVH.arrays), so that it is built only once.
+    The lod arrays are the simplified levels of the mesh (see MeshLOD.build_lods) one after the other, with the
+    (vertex first, vertex count, index first, index count) of each level in lod_ranges, and its geometric error
+    in lod_errors. hull is the (M,3) float32 vertices of the convex hull of the positions, for the scene bounds
+    (see SceneBounds.hull_points). '''
+    def __init__(self, positions: np.ndarray, indices: np.ndarray, normals: np.ndarray, plane: np.ndarray,
+                 bvh_order: np.ndarray, bvh_min: np.ndarray, bvh_max: np.ndarray,
+                 lod_positions: np.ndarray, lod_normals: np.ndarray, lod_indices: np.ndarray,
+                 lod_ranges: np.ndarray, lod_errors: np.ndarray, hull: np.ndarray):
+        self.positions = positions
+        self.indices = indices
+        self.normals = normals
+        self.plane = plane
+        self.bvh_order = bvh_order
+        self.bvh_min = bvh_min
+        self.bvh_max = bvh_max
+        self.lod_positions = lod_positions
+        self.lod_normals = lod_normals
+        self.lod_indices = lod_indices
+        self.lod_ranges = lod_ranges
+        self.lod_errors = lod_errors
+        self.hull = hull
+
+    @property
+    def bvh_arrays(self) -> tuple:
+        return self.bvh_order, self.bvh_min, self.bvh_max
+
+    @property
+    def lods(self) -> list:
+        ''' the simplified levels as (positions, indices, normals, error), from the finest to the coarsest '''
+        return [(self.lod_positions[v:v + nv], self.lod_indices[i:i + ni], self.lod_normals[v:v + nv], float(e))
+                for (v, nv, i, ni), e in zip(self.lod_ranges, self.lod_errors)]
+
+
+def load_with_trimesh(obj_path: Path):
+    ''' load an OBJ file with trimesh (an optional dependency) and return (positions, faces, normals) '''
+    import trimesh
+    mesh = trimesh.load_mesh(obj_path)
+    normals = trimesh.geometry.mean_vertex_normals(mesh.vertices.shape[0], mesh.faces, mesh.face_normals)
+    return mesh.vertices, mesh.faces, normals
+
+
+def build_mesh_data(obj_path: Path, use_trimesh: bool = False, optimize: bool = True) -> MeshData:
+    ''' load an OBJ file and compute the data needed for drawing it.
+    The built-in loader is used unless use_trimesh is set, or the file is something it can't read.
+    With optimize, the triangles of the mesh and of each level of detail are put in vertex cache and overdraw
+    order, and the vertices in the order they are used (see VertexCache.optimize_mesh). '''
+    if use_trimesh:
+        verts, faces, normals = load_with_trimesh(obj_path)
+    else:
+        try:
+            verts, faces, normals = load_obj(obj_path)
+        except ValueError:
+            verts, faces, normals = load_with_trimesh(obj_path)
+    plane = np.array([*normals[0], -np.dot(normals[0], verts[0])], dtype='f4')
+    verts = np.ascontiguousarray(verts, dtype='f4')
+    faces = np.ascontiguousarray(faces, dtype='i4').reshape(-1, 3)
+    normals = np.ascontiguousarray(normals, dtype='f4')
+    lods = build_lods(verts, faces)
+    if optimize:
+        verts, faces, normals = optimize_mesh(verts, faces, normals)
+        lods = [(*optimize_mesh(p, f, n), e) for p, f, n, e in lods]
+    corners = verts[faces]
+    bvh = BVH.build(corners.min(axis=1), corners.max(axis=1))
+    vertex_counts = np.array([p.shape[0] for p, _, _, _ in lods], dtype='i8')
+    index_counts = np.array([f.size for _, f, _, _ in lods], dtype='i8')
+    ranges = np.stack([np.cumsum(vertex_counts) - vertex_counts, vertex_counts,
+                       np.cumsum(index_counts) - index_counts, index_counts], axis=1).reshape(-1, 4)
+    return MeshData(
+        verts,
+        faces.reshape(-1),
+        normals,
+        plane,
+        *bvh.arrays,
+        np.concatenate([p for p, _, _, _ in lods] or [np.zeros((0, 3))]).astype('f4'),
+        np.concatenate([n for _, _, n, _ in lods] or [np.zeros((0, 3))]).astype('f4'),
+        np.concatenate([f.reshape(-1) for _, f, _, _ in lods] or [np.zeros(0)]).astype('i4'),
+        ranges,
+        np.array([e for _, _, _, e in lods], dtype='f4'),
+        np.ascontiguousarray(hull_points(verts), dtype='f4'))
+
+
+class MeshCache:
+    ''' On-disk cache of preprocessed meshes, keyed by a hash of the OBJ file contents.
+    Each entry is a folder of .npy files that are memory mapped on load, so they can be handed to
+    ctx.buffer without parsing or copying. Editing an OBJ file changes its hash, so the old entry is
+    no longer used, and it is deleted when the new one is written. '''
+    def __init__(self, cache_dir: Path, enabled: bool = True, use_trimesh: bool = False):
+        self.cache_dir = Path(cache_dir)
+        self.enabled = enabled
+        self.use_trimesh = use_trimesh
+        self.hits = 0
+        self.misses = 0
+
+    def entry_dir(self, obj_path: Path) -> Path:
+        ''' the cache folder for the current contents of obj_path '''
+        h = hashlib.sha1(f'v{CACHE_VERSION}{"t" if self.use_trimesh else ""}'.encode())
+        h.update(Path(obj_path).read_bytes())
+        return self.cache_dir / f'{Path(obj_path).stem}-{h.hexdigest()[:16]}'
+
+    def load(self, obj_path: Path) -> MeshData:
+        ''' return the preprocessed mesh for obj_path, building and caching it if needed '''
+        if not self.enabled:
+            self.misses += 1
+            return build_mesh_data(obj_path, self.use_trimesh)
+        entry = self.entry_dir(obj_path)
+        if entry.is_dir():
+            try:
+                data = MeshData(*(np.load(entry / f'{a}.npy', mmap_mode='r') for a in mesh_arrays))
+                self.hits += 1
+                return data
+            except (OSError, ValueError):
+                pass  # incomplete or corrupt entry, rebuild it below
+        self.misses += 1
+        data = build_mesh_data(obj_path, self.use_trimesh)
+        try:
+            self._write(entry, data)
+        except OSError:
+            pass  # e.g., read-only data folder, just run without the cache
+        return data
+
+    def _write(self, entry: Path, data: MeshData):
+        ''' write an entry into a temporary folder, then move it in place and remove stale entries '''
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp = entry.with_name(f'{entry.name}.tmp{os.getpid()}')
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir()
+        for a in mesh_arrays:
+            np.save(tmp / f'{a}.npy', getattr(data, a))
+        shutil.rmtree(entry, ignore_errors=True)
+        os.replace(tmp, entry)
+        stem = entry.name.rsplit('-', 1)[0]
+        for old in self.cache_dir.glob(f'{stem}-*'):
+            if old != entry and old.name.rsplit('-', 1)[0] == stem and '.tmp' not in old.name:
+                shutil.rmtree(old, ignore_errors=True)
+
+    def clear(self):
+        ''' remove all cache entries '''
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
@@ -0,0 +1,125 @@
+import numpy as np
+
+max_lod_levels = 4  # the full mesh and up to 3 simplified levels
+bisection_steps = 8     # largest number of grid cells tried for each level
+target_tolerance = 0.1  # a level is accepted with this fraction fewer triangles than its target
+
+
+def face_normals(positions: np.ndarray, faces: np.ndarray) -> np.ndarray:
+    ''' (F,3) normals of the (F,3) triangles, with the length of twice their area '''
+    corners = positions[faces]
+    return np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+
+
+def boundary_planes(positions: np.ndarray, faces: np.ndarray, normals: np.ndarray) -> tuple:
+    ''' the (E,2) vertices of the edges used by only one triangle, and the unit normals and offsets of the planes
+    through them perpendicular to their triangle (so that the quadrics also keep the border of open surfaces) '''
+    edges = np.concatenate([faces[:, [0, 1]], faces[:, [1, 2]], faces[:, [2, 0]]])
+    owner = np.tile(np.arange(faces.shape[0]), 3)
+    _, index, count = np.unique(np.sort(edges, axis=1), axis=0, return_index=True, return_counts=True)
+    index = index[count == 1]
+    edges, owner = edges[index], owner[index]
+    n = np.cross(positions[edges[:, 1]] - positions[edges[:, 0]], normals[owner])
+    n /= np.maximum(np.linalg.norm(n, axis=1), 1e-30)[:, None]
+    return edges, n, -np.einsum('ij,ij->i', n, positions[edges[:, 0]])
+
+
+def mesh_planes(positions: np.ndarray, faces: np.ndarray) -> tuple:
+    ''' the planes that cluster_vertices measures against, which do not depend on the cell: the unit normals,
+    offsets and area weights of the triangles, and the border edges with their planes and squared lengths '''
+    normals = face_normals(positions, faces)
+    area = np.linalg.norm(normals, axis=1)
+    n = normals / np.maximum(area, 1e-30)[:, None]
+    d = -np.einsum('ij,ij->i', n, positions[faces[:, 0]])
+    edges, edge_n, edge_d = boundary_planes(positions, faces, n)
+    edge_w = np.sum((positions[edges[:, 1]] - positions[edges[:, 0]]) ** 2, axis=1)  # squared length, as an area
+    return n, d, area, edges, edge_n, edge_d, edge_w
+
+
+def cluster_vertices(positions: np.ndarray, faces: np.ndarray, cell: float, planes: tuple = None) -> tuple:
+    ''' simplify a mesh by merging all the vertices in each cell of a grid (Rossignac-Borrel vertex clustering).
+    Each cell is replaced by the point (in the cell) that minimizes the sum of squared distances to the planes of
+    the triangles around its vertices, weighted by area (Lindstrom's quadrics), which keeps sharp edges, and to
+    the planes along border edges (see boundary_planes).
+    Triangles with two vertices in the same cell vanish. Returns positions, faces, area weighted vertex
+    normals, and the geometric error: the largest distance from where a vertex moved to the plane of one of
+    its triangles or border edges (moving along the surface does not count, as it changes little of what is
+    drawn). planes are those of mesh_planes, computed here if not given. '''
+    origin = positions.min(axis=0)
+    keys = np.floor((positions - origin) / cell).astype('i8')
+    keys, cluster = np.unique(keys, axis=0, return_inverse=True)
+    cluster = cluster.reshape(-1)
+    k = keys.shape[0]
+
+    # sum the plane quadrics (A, b, c with distance^2 = x'Ax - 2b'x + c) of the triangles around each cell
+    n, d, area, edges, edge_n, edge_d, edge_w = planes if planes is not None else mesh_planes(positions, faces)
+    A = np.zeros((k, 3, 3))
+    b = np.zeros((k, 3))
+    for verts, pn, pd, w in ((faces, n, d, area), (edges, edge_n, edge_d, edge_w)):
+        for corner in range(verts.shape[1]):
+            np.add.at(A, cluster[verts[:, corner]], w[:, None, None] * pn[:, :, None] * pn[:, None, :])
+            np.add.at(b, cluster[verts[:, corner]], -w[:, None] * pd[:, None] * pn)
+
+    # regularize towards the mean of the cell, for flat and empty cells where the quadric is singular
+    counts = np.bincount(cluster, minlength=k)
+    mean = np.zeros((k, 3))
+    np.add.at(mean, cluster, positions)
+    mean /= counts[:, None]
+    reg = 1e-3 * np.trace(A, axis1=1, axis2=2) / 3 + 1e-12
+    A += reg[:, None, None] * np.eye(3)
+    b += reg[:, None] * mean
+    lo = origin + keys * cell
+    points = np.clip(np.linalg.solve(A, b[:, :, None])[:, :, 0], lo, lo + cell).astype('f4')
+
+    error = max(float(np.max(np.abs(np.einsum('ijk,ik->ij', points[cluster[verts]], pn) + pd[:, None]), initial=0))
+                for verts, pn, pd in ((faces, n, d), (edges, edge_n, edge_d)))
+    faces = cluster[faces]
+    faces = faces[(faces[:, 0] != faces[:, 1]) & (faces[:, 1] != faces[:, 2]) & (faces[:, 2] != faces[:, 0])]
+    # drop repeated triangles (the same vertices in the same order, after rotating the smallest first)
+    rotate = np.argmin(faces, axis=1)
+    faces = np.take_along_axis(faces, (rotate[:, None] + np.arange(3)) % 3, axis=1)
+    faces = np.unique(faces, axis=0)
+
+    # keep only the clusters still used, and number them in order
+    used, faces = np.unique(faces, return_inverse=True)
+    faces = faces.reshape(-1, 3).astype('i4')
+    points = points[used]
+    vertex_normals = np.zeros_like(points)
+    normals = face_normals(points, faces)
+    for corner in range(3):
+        np.add.at(vertex_normals, faces[:, corner], normals)
+    vertex_normals /= np.maximum(np.linalg.norm(vertex_normals, axis=1), 1e-30)[:, None]
+    return points, faces, vertex_normals.astype('f4'), error
+
+
+def build_lods(positions: np.ndarray, faces: np.ndarray, ratio: float = 0.25, min_triangles: int = 32) -> list:
+    ''' simplified levels of a mesh, each with about ratio times the triangles of the level before (up to
+    max_lod_levels - 1 levels, and not below min_triangles), as (positions, faces, normals, error) tuples.
+    The grid cell of each level is found by bisection on the number of triangles, for at most bisection_steps
+    steps, or until the level is within target_tolerance of its target. '''
+    positions = np.asarray(positions, dtype='f8')
+    faces = np.asarray(faces).reshape(-1, 3)
+    size = float(np.max(positions.max(axis=0) - positions.min(axis=0)))
+    planes = mesh_planes(positions, faces)
+    levels = []
+    target = faces.shape[0]
+    lo, hi = size / 1024, size / 2
+    for _ in range(max_lod_levels - 1):
+        target = int(target * ratio)
+        if target < min_triangles or size == 0:
+            break
+        best = None
+        for _ in range(bisection_steps):
+            cell = np.sqrt(lo * hi)
+            level = cluster_vertices(positions, faces, cell, planes)
+            if level[1].shape[0] <= target:
+                best, hi = level, cell
+                if level[1].shape[0] >= (1 - target_tolerance) * target:
+                    break
+            else:
+                lo = cell
+        if best is None or best[1].shape[0] < min_triangles:
+            break
+        levels.append(best)
+        lo, hi = hi, size / 2  # coarser levels need larger cells
+    return levels
@@ -0,0 +1,130 @@
+import numpy as np
+from pathlib import Path
+
+merge_digits = 8  # positions equal to this many decimals are merged into one vertex (as trimesh does)
+
+
+def _parse_indices(tokens: list, count: int, line_counts: np.ndarray) -> np.ndarray:
+    ''' convert a list of OBJ index strings to zero based ints, resolving negative (relative) indices
+    using the number of elements defined before each token's face line '''
+    idx = np.array(tokens, dtype='i8')
+    relative = idx < 0
+    idx[relative] += line_counts[relative]
+    idx[~relative] -= 1
+    if len(idx) and (idx.min() < 0 or idx.max() >= count):
+        raise ValueError('face index out of range')
+    return idx
+
+
+def read_obj(path: Path):
+    ''' read the positions, and normals if present, and the polygon faces of an OBJ file.
+    Returns (positions (N,3) float64, normals (K,3) float64 or None, polygon sizes (F,),
+    flat position indices and flat normal indices (or None) of all polygon corners). '''
+    lines = Path(path).read_text().splitlines()
+    v_lines = []
+    vn_lines = []
+    f_tokens = []
+    f_sizes = []
+    f_v_counts = []   # number of positions defined before each face corner (for negative indices)
+    f_vn_counts = []
+    for line in lines:
+        if line.startswith('v '):
+            v_lines.append(line[2:])
+        elif line.startswith('vn '):
+            vn_lines.append(line[3:])
+        elif line.startswith('f '):
+            tokens = line[2:].split()
+            f_tokens.extend(tokens)
+            f_sizes.append(len(tokens))
+            f_v_counts.append(len(v_lines))
+            f_vn_counts.append(len(vn_lines))
+
+    # positions may carry an optional w or vertex colours, only keep xyz
+    positions = np.array([l.split()[:3] for l in v_lines], dtype='f8').reshape(-1, 3)
+    normals = np.array([l.split()[:3] for l in vn_lines], dtype='f8').reshape(-1, 3) if vn_lines else None
+    sizes = np.array(f_sizes, dtype='i8')
+    if len(sizes) and sizes.min() < 3:
+        raise ValueError('face with fewer than 3 vertices')
+    v_counts = np.repeat(np.array(f_v_counts, dtype='i8'), sizes)
+    vn_counts = np.repeat(np.array(f_vn_counts, dtype='i8'), sizes)
+
+    # corners are v, v/vt, v//vn or v/vt/vn
+    if any('/' in t for t in f_tokens):
+        parts = [t.split('/') for t in f_tokens]
+        v_idx = _parse_indices([p[0] for p in parts], len(positions), v_counts)
+        has_normal = [len(p) > 2 and p[2] != '' for p in parts]
+        if normals is not None and all(has_normal):
+            n_idx = _parse_indices([p[2] for p in parts], len(normals), vn_counts)
+        else:
+            n_idx = None
+    else:
+        v_idx = _parse_indices(f_tokens, len(positions), v_counts)
+        n_idx = None
+    return positions, (normals if n_idx is not None else None), sizes, v_idx, n_idx
+
+
+def triangulate(sizes: np.ndarray, corners: np.ndarray) -> np.ndarray:
+    ''' fan triangulate polygons given their sizes and the flat array of their corner values,
+    returning a (T,3) array (a polygon (0,1,2,3) becomes (0,1,2), (0,2,3)) '''
+    tri_counts = sizes - 2
+    poly_start = np.cumsum(sizes) - sizes
+    first = np.repeat(poly_start, tri_counts)
+    tri_start = np.cumsum(tri_counts) - tri_counts
+    local = np.arange(tri_counts.sum()) - np.repeat(tri_start, tri_counts) + 1
+    return np.stack([corners[first], corners[first + local], corners[first + local + 1]], axis=1)
+
+
+def merge_vertices(positions: np.ndarray, faces: np.ndarray, normals: np.ndarray = None):
+    ''' merge duplicate vertices (with duplicate normals, if given) as trimesh does, keeping the first
+    occurrence of each in the original order, and remap the faces accordingly '''
+    key = np.round(positions * 10 ** merge_digits).astype('i8')
+    if normals is not None:
+        key = np.hstack([key, np.round(normals * 10 ** merge_digits).astype('i8')])
+    _, first, inverse = np.unique(key, axis=0, return_index=True, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    order = np.argsort(first)
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    keep = first[order]
+    return positions[keep], rank[inverse][faces], (normals[keep] if normals is not None else None)
+
+
+def face_normals(positions: np.ndarray, faces: np.ndarray, unit: bool = True) -> np.ndarray:
+    ''' (F,3) face normals, unit length or with length twice the triangle area; degenerate faces get zero normals '''
+    tris = positions[faces]
+    n = np.cross(tris[:, 1] - tris[:, 0], tris[:, 2] - tris[:, 0])
+    if unit:
+        length = np.linalg.norm(n, axis=1, keepdims=True)
+        n = np.divide(n, length, out=np.zeros_like(n), where=length > 0)
+    return n
+
+
+def vertex_normals(positions: np.ndarray, faces: np.ndarray, weighting: str = 'mean') -> np.ndarray:
+    ''' (N,3) unit vertex normals accumulated from the faces around each vertex.
+    'mean' averages unit face normals (same as trimesh.geometry.mean_vertex_normals),
+    'area' weights each face normal by the triangle area. '''
+    if weighting not in ('mean', 'area'):
+        raise ValueError(f"unknown normal weighting '{weighting}'")
+    fn = face_normals(positions, faces, unit=(weighting == 'mean'))
+    summed = np.zeros((positions.shape[0], 3))
+    np.add.at(summed, faces.reshape(-1), np.repeat(fn, 3, axis=0))
+    length = np.linalg.norm(summed, axis=1, keepdims=True)
+    return np.divide(summed, length, out=np.zeros_like(summed), where=length > 0)
+
+
+def load_obj(path: Path, weighting: str = 'mean'):
+    ''' load an OBJ file as a triangle mesh and return (positions (N,3), faces (T,3), normals (N,3)).
+    Normals from the file are used when every face corner has one, otherwise vertex normals are
+    computed with the given weighting. '''
+    positions, file_normals, sizes, v_idx, n_idx = read_obj(path)
+    if n_idx is not None:
+        # split vertices that are used with different normals
+        pairs, corner_vertex = np.unique(np.stack([v_idx, n_idx], axis=1), axis=0, return_inverse=True)
+        positions, normals = positions[pairs[:, 0]], file_normals[pairs[:, 1]]
+        faces = triangulate(sizes, corner_vertex.reshape(-1))
+        positions, faces, normals = merge_vertices(positions, faces, normals)
+        length = np.linalg.norm(normals, axis=1, keepdims=True)
+        return positions, faces, np.divide(normals, length, out=np.zeros_like(normals), where=length > 0)
+    faces = triangulate(sizes, v_idx)
+    positions, faces, _ = merge_vertices(positions, faces)
+    return positions, faces, vertex_normals(positions, faces, weighting)
@@ -1,8 +1,23 @@
+import time
+import ctypes
 import numpy as np
-import trimesh
 import moderngl as mgl
 from pathlib import Path
 from SceneControl import SceneControl
+from SceneBounds import SceneBounds
+from VertexStore import VertexStore
+from MeshCache import MeshCache
+from GeometryBuffer import GeometryBuffer
+from UniformState import Uniforms, ViewBlock
+from ShaderVariants import ShaderVariants, VariantUniforms, all_variant_keys, variant_name
+from ShadowFilter import VarianceShadowMap, poisson_disk, max_poisson_taps, moments_unit, blur_unit
+from Culling import frustum_planes, boxes_inside_planes, boxes_in_frustum, shadow_caster_planes, frustum_intersection
+from BVH import SceneBVH
+from ShadowQuery import ShadowQuery
+from LightArray import LightArray, light_ring_rotation, set_sampler_unit, max_lights, lights_unit
+from Cascades import fit_cascades, max_cascades
+from LightFocus import view_clip_matrix, light_window, snap_to_texels
+from SceneBounds import mat4_to_np
 import glm
 
 ground_name = 'ground'  # ground plane is a special case for cheap shadows
@@ -15,18 +30,116 @@ object_colors = {'monkey1': (0.97, 0.09, 0.0, 1),
                  'tree2': (0.09, 0.87, 0.09, 1),
                  ground_name: (0.69, 0.5, 0.49, 1)}
 
+# controls that every view reads through the uniforms set in SceneRenderer.set_program_state
+shading_controls = ('use_shadow_map', 'use_depth_bias', 'bias_slope_factor', 'use_linear_filter', 'draw_depth', 'draw_depth_map',
+                    'use_lod', 'lod_pixel_error', 'shadow_filter', 'pcf_kernel_size', 'poisson_taps', 'filter_radius',
+                    'vsm_blur_radius', 'vsm_bleed_reduction', 'light_count')
+
 
 class Camera:
     def __init__(self, R: glm.mat4, d: float):
         ''' A simple camera with rotation R and distance d from the origin along -Z axis in the rotated frame.
-        Each view associated with a camera is responsible for updating these values based on current scene controls. '''
-        self.R = R          # Rotation controlled by mouse movement (XYBall)
-        self.distance = d   # Distance controlled by mouse wheel
-        self.V = glm.translate(glm.mat4(1), glm.vec3(0, 0, -self.distance)) * self.R
-        self.P = glm.mat4(1)
+        Each view associated with a camera is responsible for setting its projection based on current scene controls,
+        with set_perspective or set_frustum.
+        V, P, PV, their inverses, and the position of the camera are computed when first needed and kept until R,
+        distance or the projection change. Each change also increments the version, so that anything computed from
+        the camera (e.g., the shadow map of the light camera) can be reused while the version stays the same. '''
+        self.version = 0
+        self._R = R          # Rotation controlled by mouse movement (XYBall)
+        self._distance = d   # Distance controlled by mouse wheel
+        self._P = glm.mat4(1)
+        self._projection = None  # parameters of the last set_perspective or set_frustum
+        self._cache = {}         # matrices computed from R, distance and P
+
     def update_cam_distance(self, mult):
         self.distance *= np.power(1.1, mult)
 
+    def changed(self):
+        self.version += 1
+        self._cache.clear()
+
+    @property
+    def R(self) -> glm.mat4:
+        return self._R
+
+    @R.setter
+    def R(self, R: glm.mat4):
+        if R != self._R:
+            self._R = R
+            self.changed()
+
+    @property
+    def distance(self) -> float:
+        return self._distance
+
+    @distance.setter
+    def distance(self, d: float):
+        if d != self._distance:
+            self._distance = d
+            self.changed()
+
+    @property
+    def P(self) -> glm.mat4:
+        return self._P
+
+    @P.setter
+    def P(self, P: glm.mat4):
+        if P != self._P:
+            self._P = P
+            self.changed()
+
+    def set_perspective(self, fov: float, aspect_ratio: float, n: float, f: float):
+        ''' set P to a perspective projection (fov in radians), unless it already is this one '''
+        if self._projection != ('perspective', fov, aspect_ratio, n, f):
+            self._projection = ('perspective', fov, aspect_ratio, n, f)
+            self.P = glm.perspective(fov, aspect_ratio, n, f)
+
+    def set_frustum(self, l: float, r: float, b: float, t: float, n: float, f: float):
+        ''' set P to an off-axis perspective projection, unless it already is this one '''
+        if self._projection != ('frustum', l, r, b, t, n, f):
+            self._projection = ('frustum', l, r, b, t, n, f)
+            self.P = glm.frustum(l, r, b, t, n, f)
+
+    def frustum(self) -> tuple:
+        ''' l, r, b, t, n, f of the projection, as for set_frustum (also for a perspective set with set_perspective) '''
+        kind, *params = self._projection
+        if kind == 'frustum':
+            return tuple(params)
+        fov, aspect_ratio, n, f = params
+        t = n * np.tan(fov / 2)
+        return -t * aspect_ratio, t * aspect_ratio, -t, t, n, f
+
+    def _cached(self, name: str, compute):
+        value = self._cache.get(name)
+        if value is None:
+            value = self._cache[name] = compute()
+        return value
+
+    @property
+    def V(self) -> glm.mat4:
+        return self._cached('V', lambda: glm.translate(glm.mat4(1), glm.vec3(0, 0, -self._distance)) * self._R)
+
+    @property
+    def PV(self) -> glm.mat4:
+        return self._cached('PV', lambda: self._P * self.V)
+
+    @property
+    def V_inv(self) -> glm.mat4:
+        return self._cached('V_inv', lambda: glm.inverse(self.V))
+
+    @property
+    def P_inv(self) -> glm.mat4:
+        return self._cached('P_inv', lambda: glm.inverse(self._P))
+
+    @property
+    def PV_inv(self) -> glm.mat4:
+        return self._cached('PV_inv', lambda: self.V_inv * self.P_inv)
+
+    @property
+    def position(self) -> glm.vec4:
+        ''' the position of the camera in world coordinates '''
+        return self._cached('position', lambda: self.V_inv * glm.vec4(0, 0, 0, 1))
+
 
 class Scene:
     ''' A scene with objects, cameras, light, and shaders.
@@ -41,6 +154,8 @@ class Scene:
         self.third_person_camera = Camera(glm.rotate(0.6, glm.vec3(1, 1, 0)), 20)
         self.post_projection_camera = Camera(glm.rotate(0.2, glm.vec3(1, 0, 0)), 8)   # Camera(glm.rotate(-glm.pi()/2, glm.vec3(0, 0, 1)), 8)
 
+        self.lights = [self.light_view_camera]  # and the other lights of the light array (see update_lights)
+
         self.cameras = [
             self.main_view_camera,
             self.light_view_camera,
@@ -50,11 +165,17 @@ class Scene:
 
         self.view_vol = None # initialized in initGL
         self.axis = None     # initialized in initGL 
+        self.geometry_version = 0  # incremented when objects are added
+        self.shadow_stats = ShadowPassStats()
+        self.cull_stats = {}  # pass name -> (objects drawn, objects culled) in the last draw of that pass
+
+        # preprocessed meshes are cached on disk, keyed by the contents of the obj files
+        self.mesh_cache = MeshCache(Path(__file__).parent / 'data/.mesh_cache')
 
     def initGL(self, ctx: mgl.Context):
         self.ctx = ctx
-        self.object_name = object_name
-        self.object_colors = object_colors
+        self.object_name = set()   # filled in by add_object, starting with the objects in the data folder
+        self.object_colors = {}
         self.ground_name = ground_name
 
         # load and compile the shaders
@@ -65,50 +186,159 @@ class Scene:
             vertex_shader=open(current_dir / 'glsl/depth_vert.glsl').read(),
             fragment_shader=open(current_dir / 'glsl/depth_frag.glsl').read())
 
-        # load the GLSL program for drawing the camera view with shadow map
-        self.prog_shadow_map = self.ctx.program(
-            vertex_shader=open(current_dir / 'glsl/render_with_sm_vert.glsl').read(),
-            fragment_shader=open(current_dir / 'glsl/render_with_sm_frag.glsl').read())
-        # assign textures unit ID to samplers in GLSL programs
-        self.prog_shadow_map['u_sampler_shadow'].value = 0
-        self.prog_shadow_map['u_sampler_shadow_map_raw'].value = 1
-
-        # Geometry
-        self.view_vol = View_Vol(self.ctx, self.prog_shadow_map)
-        self.axis = Axis(self.ctx, self.prog_shadow_map)
-
-        # Texture for shadown map
-        self.texture = Texture(self.ctx)
+        # the program that draws the shadow maps of all lights of the light array at once, one layer per light
+        self.prog_depth_layers = self.ctx.program(
+            vertex_shader=open(current_dir / 'glsl/depth_layers_vert.glsl').read(),
+            geometry_shader=open(current_dir / 'glsl/depth_layers_geom.glsl').read(),
+            fragment_shader=open(current_dir / 'glsl/depth_frag.glsl').read())
+        self.depth_layers_uniforms = Uniforms(self.prog_depth_layers)
+        self.light_array = None  # made by update_lights for more than one light
+        self.lights_key = None
+        self.light_positions = np.zeros((0, 4), dtype='f4')  # world positions of the lights of the light array
+
+        # the matrices and light position of each view go in a uniform buffer shared by all shading programs
+        self.view_block = ViewBlock(self.ctx)
+
+        # load the GLSL program for drawing the camera view with shadow map, compiled in a variant for each set of
+        # features (lighting, shadow map, ...) that the views draw with, instead of branching on uniforms
+        self.shading_variants = ShaderVariants(
+            self.ctx,
+            open(current_dir / 'glsl/render_with_sm_vert.glsl').read(),
+            open(current_dir / 'glsl/render_with_sm_frag.glsl').read(),
+            self.setup_shading_program)
+        self.shading_variants.compile(all_variant_keys())
+        # uniform handles are looked up once; the uniforms of the shading program also select its variant
+        self.uniforms = VariantUniforms(self.shading_variants)
+        self.uniforms['u_poisson_taps'] = poisson_disk(max_poisson_taps).astype('f4').tobytes()
+        self.depth_uniforms = Uniforms(self.prog_depth)
+
+        # the separable blur of the moments of a variance shadow map, drawing a quad over each tile
+        self.prog_blur = self.ctx.program(
+            vertex_shader=open(current_dir / 'glsl/blit_vert.glsl').read(),
+            fragment_shader=open(current_dir / 'glsl/blur_frag.glsl').read())
+        self.prog_blur['u_image'].value = blur_unit
+        self.blur_uniforms = Uniforms(self.prog_blur)
+        quad = np.array([-1, -1, 0, 1, -1, 0, 1, 1, 0, -1, 1, 0], dtype='f4')
+        self.blur_vao = make_vao(self.ctx, self.prog_blur, quad, np.array([0, 1, 2, 0, 2, 3]), mode=mgl.TRIANGLES)
+        self.light_space_transform = glm.mat4(1)  # set by the shadow pass
+        # (transform from world to texture coordinates, tile, main view depth where it ends) of each cascade of the
+        # shadow map, set by the shadow pass when it draws more than one, and the row of the main view matrix it used
+        self.cascades = []
+        self.cascade_depth_row = (0, 0, 1, 0)
+
+        # Geometry (lines are drawn with lighting off)
+        flat = self.shading_variants.program(frozenset())
+        self.view_vol = View_Vol(self.ctx, flat)
+        self.axis = Axis(self.ctx, flat, self.uniforms)
+
+        # Texture for shadown map (made again by update_shadow_texture when its controls change)
+        self.texture = Texture(self.ctx, self.controls.shadow_map_size, self.controls.shadow_depth_bits)
+        self.update_shadow_texture()
         
-        # We'll keep a buffer of scene verts (for computing bounds) starting with the origin in list of points in scene
-        # for efficiency would be better just to keep convex hull of scene points
-        self.verts = np.array([[0, 0, 0, 1]]).T
+        # We'll keep a compact store of scene verts (for computing bounds) with a range for each object
+        self.vertex_store = VertexStore()
+        # for efficiency the bounds fitting only uses the convex hull of scene points, starting with the origin
+        self.bounds = SceneBounds()
+        self.bounds.add_points(np.zeros((1, 3)))
+        # hierarchy over the objects and their triangles, for visibility queries on the CPU (e.g., casting rays)
+        self.bvh = SceneBVH()
+        self.shadow_query = ShadowQuery(self)
         
-        # Vertex arrays for each object, 2 versions, the second being for the shadow map (no normals)
-        self.vao_objects = {}
-        self.vao_object_shadows = {}
+        # All objects in one vertex and index buffer, with vertex arrays for drawing the views (positions, normals,
+        # and colours, one for each shading variant, see shading_layout) and one for the shadow map (only
+        # positions), all reading the same vertex buffer
+        self.geometry = GeometryBuffer(self.ctx)
+        self.geometry.add_layout('depth', self.prog_depth, '3f 16x', 'in_position')
+        self.geometry.add_layout('depth layers', self.prog_depth_layers, '3f 16x', 'in_position')
         
         current_dir = Path(__file__).parent  # glsl folder in same directory as this code
         
         for name in object_name:
-            # load geometry from current directory
-            mesh = trimesh.load_mesh(current_dir / f'data/{name}.obj')
-            
-            # get relevant mesh information
-            verts = mesh.vertices  # shape: (N, 3)
-            indices = mesh.faces.flatten()
-            normals = trimesh.geometry.mean_vertex_normals(verts.shape[0], mesh.faces, mesh.face_normals).astype('f4')
+            # load geometry from current directory (or the memory mapped cache of it)
+            mesh = self.mesh_cache.load(current_dir / f'data/{name}.obj')
             
             if name == ground_name:
-                # compute the ground plane assuming that the first vertex has the good normal for the whole plane
-                self.ground_plane = glm.vec4(normals[0, 0], normals[0, 1], normals[0, 2], -np.dot(normals[0, :], verts[0, :]))
-            
-            verts_by_4 = np.hstack([verts, np.ones((verts.shape[0], 1))])
-            self.verts = np.hstack((self.verts, verts_by_4.T))
+                # the ground plane assumes that the first vertex has the good normal for the whole plane
+                self.ground_plane = glm.vec4(*(float(x) for x in mesh.plane))
             
-            self.vao_objects[name] = make_vao(ctx, self.prog_shadow_map, verts, indices, normals, mode=mgl.TRIANGLES)
-            self.vao_object_shadows[name] = make_vao(ctx, self.prog_depth, verts, indices, normals=None, mode=mgl.TRIANGLES)
+            self.add_object(name, mesh.positions, mesh.indices, mesh.normals, object_colors[name], mesh.bvh_arrays,
+                            mesh.lods, mesh.hull)
+
+    def add_object(self, name: str, verts: np.ndarray, indices: np.ndarray, normals: np.ndarray, color: tuple,
+                   bvh_arrays: tuple = None, lods: list = (), hull: np.ndarray = None):
+        ''' add an object with (N,3) vertices and normals, a flat triangle index list, and an rgba colour.
+        The object is drawn in all views and casts shadows, and is included in the scene bounds.
+        bvh_arrays is the saved hierarchy over the triangles (see MeshData), which is built here if not given,
+        lods are the simplified levels of the mesh (see MeshData.lods), for drawing it at a distance, and hull is
+        the vertices of its convex hull, for the scene bounds (all vertices are used if not given). '''
+        self.object_name.add(name)
+        self.object_colors[name] = color
+        self.vertex_store.append(name, verts)
+        self.bounds.add_points(self.vertex_store.object_verts(name), hull)
+        self.bvh.add(name, verts, indices, bvh_arrays)
+        
+        self.geometry.append(name, verts, indices, normals, color, lods)
+        self.geometry_version += 1
     
+    def setup_shading_program(self, prog: mgl.Program):
+        ''' assign the texture units of the shadow map samplers (and moments) and the view uniform buffer to a new variant '''
+        if 'u_sampler_shadow' in prog:
+            prog['u_sampler_shadow'].value = 0
+        if 'u_sampler_shadow_map_raw' in prog:
+            prog['u_sampler_shadow_map_raw'].value = 1
+        if 'u_sampler_moments' in prog:
+            prog['u_sampler_moments'].value = moments_unit
+        if 'u_sampler_lights' in prog:
+            set_sampler_unit(self.ctx, prog, 'u_sampler_lights', lights_unit)
+        self.view_block.bind(prog)
+
+    def shading_layout(self) -> str:
+        ''' the geometry layout for the shading variant that the current uniforms select, added on first use '''
+        key = self.uniforms.key
+        name = 'shading ' + variant_name(key)
+        if name not in self.geometry.layouts:
+            prog = self.shading_variants.program(key)
+            # attributes that the variant compiles out (e.g., the normals without lighting) are skipped as padding
+            fields = [('3f', '12x', 'in_position'), ('3f', '12x', 'in_normal'), ('4f1', '4x', 'in_color')]
+            fmt = ' '.join(field if attribute in prog else padding for field, padding, attribute in fields)
+            self.geometry.add_layout(name, prog, fmt, *(attribute for _, _, attribute in fields if attribute in prog))
+        return name
+
+    def set_view_uniforms(self, mv: glm.mat4, mvp: glm.mat4, light_pos: glm.vec3):
+        ''' set the matrices and light position in view coordinates for drawing a view, with one buffer write '''
+        self.view_block.set_view(mv, mvp, self.light_space_transform, light_pos)
+        if self.light_array is not None:
+            positions = np.zeros((max_lights, 4), dtype='f4')
+            positions[:len(self.lights)] = self.light_positions @ mat4_to_np(mv).T
+            positions[:len(self.lights)] /= positions[:len(self.lights), 3:]  # (for the post perspective view)
+            self.uniforms['u_lights_view'] = positions[:, :3].tobytes()
+
+    def set_mvp(self, mvp: glm.mat4):
+        ''' replace the mvp matrix of the current view, e.g., for drawing a frustum or axis '''
+        self.view_block.set_mvp(mvp)
+
+    def cast_rays(self, origins: np.ndarray, dirs: np.ndarray, t_max: float = np.inf) -> tuple:
+        ''' closest hits of the (R,3) rays origins + t dirs with the scene triangles, as (t, object name, triangle)
+        arrays; t is inf and the name None for rays that hit nothing '''
+        t, objects, triangles = self.bvh.intersect(origins, dirs, 1e-4, t_max)
+        names = np.array(self.bvh.names + [None], dtype=object)[objects]
+        return t, names, triangles
+
+    def points_in_shadow(self, points: np.ndarray) -> np.ndarray:
+        ''' boolean mask of the (N,3) world points that are hidden from the light by some triangle of the scene,
+        by casting a ray from each point to the light (ground truth for the shadow map) '''
+        points = np.asarray(points, dtype='f4').reshape(-1, 3)
+        to_light = np.asarray(glm.vec3(self.get_light_pos_in_world()), dtype='f4') - points
+        return self.bvh.occluded(points, to_light, 1e-4, 1.0)
+
+    def shadow_map_visibility(self, points: np.ndarray, normals: np.ndarray = None, gpu: bool = None) -> np.ndarray:
+        ''' visibility (0 in shadow to 1 lit) of the (N,3) world points from the shadow map at the current pose of
+        the light camera, drawing the shadow pass first if it changed (see ShadowQuery); unlike points_in_shadow,
+        this has the resolution and bias of the shadow map, as the views draw it. With normals, the slope bias
+        is that of surfaces facing them. '''
+        self.render_shadow_pass()
+        return self.shadow_query.visibility(points, normals, gpu)
+
     def get_ground_plane(self) -> glm.vec4:
         ''' return the ground plane as a 4-vector (a,b,c,d) so that ax + by + cz + d = 0 '''
         return self.ground_plane
@@ -118,10 +348,8 @@ class Scene:
         Recall that the light is at the origin in the light view as defined by the light_view_camera. '''
 
         # TODO OBJECTIVE: compute the appropriate return value for this funciton!
-        #get the inverse of view matrix.
-        V_inverse = glm.inverse(self.light_view_camera.V)
-        light_position = V_inverse * glm.vec4(0, 0, 0, 1)
-        return  light_position
+        # the light camera keeps its position (from the inverse of its view matrix) until it moves
+        return self.light_view_camera.position
 
     def get_light_pos_in_view( self, V: glm.mat4 ) -> glm.vec3:
         ''' Given viewing matrix V, return the light position in that view. '''        
@@ -130,75 +358,154 @@ class Scene:
         return pos
 
     def get_all_scene_verts(self) -> np.ndarray:
-        ''' return all vertices in the scene as a 4xN array of homogeneous coordinates.
+        ''' return all vertices in the scene as an Nx3 float32 array (a view into the vertex store, not a copy).
         This is useful for computing scene bounds, e.g., near and far clipping planes, or l,r,t,b for the light view frustum '''
-        return self.verts
+        return self.vertex_store.all_verts()
+
+    def get_object_verts(self, name: str) -> np.ndarray:
+        ''' return the vertices of one object as an Nx3 float32 array (a view into the vertex store, not a copy) '''
+        return self.vertex_store.object_verts(name)
     
     def compute_nf_from_view(self, V: glm.mat4):
         ''' Given a viewing matrix V, compute near and far values that just fit the scene vertices. 
         Recall that near and far are the positive distances along the -Z axis of the view. '''
 
         # TODO: OBJECTIVE: compute n and f for the scene verts and return these values!
-        #get the list of vertices
-        verts = self.get_all_scene_verts()
-        z_coords = []
-        for i in range(verts.shape[1]):
-            v = glm.vec4(verts[0, i], verts[1, i], verts[2, i], verts[3, i])
-            #only apply the viewing matrix
-            v_view = V * v
-            z_coords.append(v_view.z)
-
-        z_coords = np.array(z_coords)
-
-        n = -np.max(z_coords)   # TODO: replace this arbitrary value!
-        f = -np.min(z_coords)  # TODO: replace this arbitrary value!
-        return n, f
+        # only the z extent of the scene hull in the view is needed
+        return self.bounds.compute_nf(V)
 
     def compute_lrbt_for_projection(self, V: glm.mat4, n: float, f: float):
         ''' Given a viewing matrix V, and near and far values, compute l,r,b,t values that just fit the scene vertices. '''
 
         # TODO: OBJECTIVE: compute l,r,b,t for the scene vertices, given the near and far values, and return these values!
-        verts = self.get_all_scene_verts()
-
-        # Convert to numpy and transform
-        V_np = np.array(V).reshape(4, 4).T
-        verts_view = V_np @ verts
-
-        x_coords = verts_view[0, :]  # all X coordinates
-        y_coords = verts_view[1, :]  # all Y coordinates
-
-        min_x = np.min(x_coords)
-        max_x = np.max(x_coords)
-        min_y = np.min(y_coords)
-        max_y = np.max(y_coords)
-
-        # Project to near plane use similar triangle
-        l = min_x * (n/f)  # TODO: replace this arbitrary value!
-        r = max_x * (n/f)  # TODO: replace this arbitrary value!
-        b = min_y * (n/f)  # TODO: replace this arbitrary value!
-        t = max_y * (n/f)  # TODO: replace this arbitrary value!
-        return l, r, b, t
+        # project the x and y extents of the scene hull in the view to the near plane using similar triangles
+        return self.bounds.compute_lrbt(V, n, f)
+
+    def compute_focused_frustum(self, V: glm.mat4, n: float, f: float, snap: bool = True) -> tuple:
+        ''' Given the light viewing matrix V, and near and far values that fit the scene, compute l,r,b,t,n,f of
+        the part of the light frustum that the main camera sees: everything that can shadow a point is between
+        it and the light, so it is inside too. This is the window (on the near plane) and the depth of the part
+        of the main view volume inside the light frustum fitted to the scene, cut down to the box of the objects
+        in the main view. With snap, l,r,b,t are snapped to shadow map texels (see LightFocus.snap_to_texels). '''
+        full = light_window(V, n, self.bounds.points) if n > 0 else None
+        if full is None:  # the light is inside the scene
+            return (*self.compute_lrbt_for_projection(V, n, f), n, f)
+        l, r, b, t, _ = full
+        view_PV = view_clip_matrix(self.main_view_camera)
+        seen = boxes_in_frustum(self.geometry.box_min, self.geometry.box_max, view_PV) if view_PV is not None else None
+        if seen is None or not np.any(seen):
+            return l, r, b, t, n, f
+        box_min, box_max = self.geometry.box_min[seen].min(axis=0), self.geometry.box_max[seen].max(axis=0)
+        box = np.array([[x, y, z] for x in (box_min[0], box_max[0]) for y in (box_min[1], box_max[1])
+                        for z in (box_min[2], box_max[2])], dtype='f4')
+        windows = [light_window(V, n, frustum_intersection(glm.frustum(l, r, b, t, n, f) * V, view_PV)),
+                   light_window(V, n, box)]
+        windows = [w for w in windows if w is not None]
+        if not windows:
+            return l, r, b, t, n, f
+        ls, rs, bs, ts, fs = zip(*windows)
+        fl, fr, fb, ft = max(*ls, l), min(*rs, r), max(*bs, b), min(*ts, t)
+        if fl >= fr or fb >= ft:  # nothing the main camera sees is lit
+            return l, r, b, t, n, f
+        if snap:  # (the shadow map texture is only replaced by the shadow pass, after the light camera is set)
+            size = self.controls.shadow_map_size
+            fl, fr, fb, ft = snap_to_texels(fl, fr, fb, ft, ((r - l) / (size - 1), (t - b) / (size - 1)), size)
+        return fl, fr, fb, ft, n, float(min(max(min(fs), n * 1.001), f))
+
+    def shadow_map_key(self) -> tuple:
+        ''' everything the contents of the shadow map depend on: the light camera, the geometry, the culling flag,
+        the main camera when shadow casters are culled to the main view or the map has cascades, and the blur of
+        the moments of a variance shadow map '''
+        uses_main_view = self.culls_shadow_casters() or self.texture.cascades > 1
+        return (self.light_view_camera.version, self.geometry_version, self.controls.use_culling,
+                self.main_view_camera.version if uses_main_view else None,
+                self.controls.lod_pixel_error if self.controls.use_lod else None,
+                self.controls.vsm_blur_radius if self.texture.variance is not None else None)
+
+    def update_shadow_texture(self):
+        ''' replace the shadow map texture when its size, depth format, cascades or filter controls have changed
+        (only the variance shadow map filter needs more than the depth texture) '''
+        c = self.controls
+        size, bits, cascades = c.shadow_map_size, c.shadow_depth_bits, min(max(c.shadow_cascades, 1), max_cascades)
+        variance = c.shadow_filter == 'vsm'
+        if (self.texture.size, self.texture.requested_bits, self.texture.cascades, self.texture.variance is not None) != \
+                (size, bits, cascades, variance):
+            self.texture.release()
+            self.texture = Texture(self.ctx, size, bits, cascades, variance)
+
+    def set_cascade_uniforms(self, projections: list, far: list):
+        ''' keep the cascades of the shadow map just drawn (see self.cascades), and set the uniforms the shading
+        program uses to look up the cascade of each fragment '''
+        window_transform = glm.translate(glm.vec3(0.5)) * glm.scale(glm.vec3(0.5))
+        self.cascades = [(window_transform * P * self.light_view_camera.V, self.texture.tile_coords(i), far[i])
+                         for i, P in enumerate(projections)]
+        self.cascade_depth_row = tuple(float(-x) for x in mat4_to_np(self.main_view_camera.V)[2])
+        for name, value in self.cascade_uniform_values().items():
+            self.uniforms[name] = value
+
+    def cascade_uniform_values(self) -> dict:
+        ''' the cascade uniforms (of the shading and visibility query programs) for self.cascades, padded to
+        max_cascades, or only a count of 1 for a single shadow map '''
+        if not self.cascades:
+            return {'u_cascade_count': 1}
+        transforms = [M for M, _, _ in self.cascades] + [glm.mat4(1)] * (max_cascades - len(self.cascades))
+        tiles = [tile for _, tile, _ in self.cascades] + [(0, 0, 1, 1)] * (max_cascades - len(self.cascades))
+        far = [f for _, _, f in self.cascades]
+        return {'u_cascade_count': len(self.cascades),
+                'u_cascade_transforms': b''.join(M.to_bytes() for M in transforms),
+                'u_cascade_tiles': np.array(tiles, dtype='f4').tobytes(),
+                'u_cascade_far': tuple(far + [far[-1]] * (max_cascades - len(far))),
+                'u_cascade_depth_row': self.cascade_depth_row}
+
+    def culls_shadow_casters(self) -> bool:
+        return self.controls.cull_shadow_casters and self.controls.use_frustum_culling
 
     def render_shadow_pass(self):
-        ''' render shadow-map (depth framebuffer -> texture) from light view '''
-        # render to the shadow map texture (an offscreen framebuffer)
-        self.texture.set_fbo()  
-        if self.controls.use_culling:
-            self.ctx.enable(mgl.CULL_FACE)
-            self.ctx.cull_face = 'front'   # reduce self-shadowing
-
+        ''' render shadow-map (depth framebuffer -> texture) from light view.
+        The shadow map is only rendered again when its key changes (see shadow_map_key), unless
+        shadow map caching is turned off in the controls. '''
         # TODO: OBJECTIVE: set up the appropraite matrix for drawing the shadow map view
         V_light = self.light_view_camera.V
         P_light = self.light_view_camera.P
 
-        mvp = P_light * V_light # TODO: compute the appropriate matrix to use for rendering the shadow map for the light camera
-        self.prog_depth['u_mvp'].write( mvp )    
-        self.render_for_shadow_map()
-
-        # return settings to normal 
-        self.ctx.screen.use() 
-        self.ctx.cull_face = 'back'
-        self.ctx.disable(mgl.CULL_FACE)
+        self.update_shadow_texture()
+        key = self.shadow_map_key()
+        if self.controls.cache_shadow_map and key == self.texture.contents_key:
+            self.shadow_stats.skipped += 1
+        else:
+            start = time.perf_counter()
+            # render to the shadow map texture (an offscreen framebuffer), remembering where to draw afterwards
+            target = self.ctx.fbo if self.ctx.fbo is not None else self.ctx.screen
+            self.texture.set_fbo()  
+            if self.controls.use_culling:
+                self.ctx.enable(mgl.CULL_FACE)
+                self.ctx.cull_face = 'front'   # reduce self-shadowing
+
+            if self.texture.cascades > 1:
+                # a light projection fitted to each depth slice of the main view, drawn in its own tile of the map
+                projections, far = fit_cascades(self.main_view_camera, self.light_view_camera, self.texture.cascades)
+                for i, P in enumerate(projections):
+                    self.ctx.viewport = self.texture.tile_viewport(i)
+                    mvp = P * V_light
+                    self.depth_uniforms['u_mvp'] = mvp
+                    self.render_for_shadow_map(mvp, f'shadow{i}', self.lod_levels(V_light, P))
+                self.set_cascade_uniforms(projections, far)
+            else:
+                mvp = self.light_view_camera.PV # TODO: compute the appropriate matrix to use for rendering the shadow map for the light camera
+                self.depth_uniforms['u_mvp'] = mvp
+                self.render_for_shadow_map(levels=self.lod_levels(V_light, P_light))
+                self.cascades = []
+                self.uniforms['u_cascade_count'] = 1
+            self.ctx.cull_face = 'back'
+            self.ctx.disable(mgl.CULL_FACE)
+            if self.texture.variance is not None:
+                tiles = [(self.texture.tile_coords(i), self.texture.tile_viewport(i)) for i in range(self.texture.cascades)]
+                self.texture.variance.blur(self.blur_uniforms, self.blur_vao, self.controls.vsm_blur_radius, tiles)
+
+            # return settings to normal 
+            target.use() 
+            self.texture.contents_key = key
+            self.shadow_stats.add_render(time.perf_counter() - start)
 
         # TODO: OBJECTIVE: set the light space transform that takes vertices in world coordinates to texture coordinates in the shadow map
         window_transform = glm.mat4(
@@ -208,33 +515,134 @@ class Scene:
             0.5, 0.5, 0.5, 1.0
         )
         light_space_transform = window_transform * P_light * V_light # TODO: compute the appropraite matrix!
-        self.prog_shadow_map['u_light_space_transform'].write(light_space_transform)
-
-
-    def render_for_view(self, draw_ground=True):
-        ''' render all objects in the scene using currently set up GLSL program.
+        self.light_space_transform = light_space_transform  # written with the matrices of each view (set_view_uniforms)
+        self.render_light_array()
+
+    def update_lights(self):
+        ''' make the cameras and shadow map array of the lights for the light count control: beyond the light
+        camera, the lights are placed around it (see light_ring_rotation) at its distance, each with a frustum
+        fitted to the scene '''
+        count = min(max(self.controls.light_count, 1), max_lights)
+        size = self.controls.shadow_map_size
+        if self.light_array is not None and (self.light_array.size, self.light_array.count) != (size, count):
+            self.light_array.release()
+            self.light_array = None
+        if count == 1:
+            self.lights = [self.light_view_camera]
+            return
+        if self.light_array is None:
+            self.light_array = LightArray(self.ctx, size, count)
+        key = (count, self.light_view_camera.distance, self.geometry_version)
+        if key != self.lights_key:
+            self.lights = [self.light_view_camera]
+            for i in range(1, count):
+                camera = Camera(light_ring_rotation(i, count), self.light_view_camera.distance)
+                n, f = self.compute_nf_from_view(camera.V)
+                camera.set_frustum(*self.compute_lrbt_for_projection(camera.V, n, f), n, f)
+                self.lights.append(camera)
+            self.lights_key = key
+
+    def light_array_key(self) -> tuple:
+        ''' everything the contents of the light array depend on (as shadow_map_key for the shadow map) '''
+        return (tuple(camera.version for camera in self.lights), self.geometry_version, self.controls.use_culling)
+
+    def render_light_array(self):
+        ''' render the shadow maps of all lights of the light array in one pass: the casters are drawn once, with
+        an instance for each light that goes to its layer, without frustum culling or levels of detail (which
+        differ between the lights). Then set the light transforms of the shading program. '''
+        self.update_lights()
+        array = self.light_array
+        if array is None:
+            return
+        key = self.light_array_key()
+        if not (self.controls.cache_shadow_map and key == array.contents_key):
+            target = self.ctx.fbo if self.ctx.fbo is not None else self.ctx.screen
+            array.fbo.use()
+            self.ctx.viewport = (0, 0, array.size, array.size)
+            self.ctx.scissor = None
+            self.ctx.clear(depth=1.0)
+            if self.controls.use_culling:
+                self.ctx.enable(mgl.CULL_FACE)
+                self.ctx.cull_face = 'front'
+            pvs = [camera.PV for camera in self.lights] + [glm.mat4(1)] * (max_lights - array.count)
+            self.depth_layers_uniforms['u_light_pvs'] = b''.join(M.to_bytes() for M in pvs)
+            self.geometry.render('depth layers', instances=array.count)
+            self.ctx.cull_face = 'back'
+            self.ctx.disable(mgl.CULL_FACE)
+            target.use()
+            array.contents_key = key
+        window_transform = glm.translate(glm.vec3(0.5)) * glm.scale(glm.vec3(0.5))
+        transforms = [window_transform * camera.PV for camera in self.lights] + [glm.mat4(1)] * (max_lights - array.count)
+        self.uniforms['u_light_count'] = array.count
+        self.uniforms['u_light_transforms'] = b''.join(M.to_bytes() for M in transforms)
+        self.light_positions = np.array([camera.position.to_list() for camera in self.lights], dtype='f4')
+        array.sampler.use(location=lights_unit)
+
+
+    def visible_objects(self, volume, pass_name: str, mask: np.ndarray = None) -> np.ndarray:
+        ''' mask of the objects (of the given mask, or all for None) whose bounding box is not outside the volume,
+        given as an mvp matrix (its view volume) or as an array of planes, or just the given mask when frustum
+        culling is off. Records the number of objects drawn and culled in cull_stats[pass_name]. '''
+        total = len(self.geometry.names) if mask is None else int(np.count_nonzero(mask))
+        if volume is not None and self.controls.use_frustum_culling:
+            planes = volume if isinstance(volume, np.ndarray) else frustum_planes(volume)
+            inside = boxes_inside_planes(self.geometry.box_min, self.geometry.box_max, planes)
+            mask = inside if mask is None else mask & inside
+        drawn = total if mask is None else int(np.count_nonzero(mask))
+        self.cull_stats[pass_name] = (drawn, total - drawn)
+        return mask
+
+    def lod_levels(self, V: glm.mat4, P: glm.mat4) -> np.ndarray:
+        ''' the level of detail of each object for drawing with the view V and perspective projection P in the
+        current viewport: the coarsest level whose geometric error (see MeshLOD.cluster_vertices), at the
+        nearest depth of the bounding box of the object, is at most lod_pixel_error pixels (or shadow map
+        texels) on screen. None (the full meshes) when LODs are off. '''
+        if not self.controls.use_lod:
+            return None
+        _, _, w, h = self.ctx.viewport
+        A, B = mat4_to_np(V), mat4_to_np(P)
+        pixels = max(abs(B[0, 0]) * w, abs(B[1, 1]) * h) / 2  # pixels per unit length at depth 1
+        center = (self.geometry.box_min + self.geometry.box_max) / 2
+        half = (self.geometry.box_max - self.geometry.box_min) / 2
+        depth = -(center @ A[2, :3] + A[2, 3]) - half @ np.abs(A[2, :3])
+        size = self.geometry.level_errors * pixels / np.maximum(depth, 1e-9)[:, None]
+        fine = size <= self.controls.lod_pixel_error
+        return np.max(np.where(fine, np.arange(fine.shape[1]), 0), axis=1)
+
+    def render_for_view(self, draw_ground=True, mvp: glm.mat4 = None, pass_name: str = 'view', levels: np.ndarray = None):
+        ''' render all objects in the scene with the shading variant of the current uniforms (see shading_layout).
         If these objects had different modeling transforms, then we would need to combine the current MVP with the modeling transform.
         but all objects were modeled in a common coordinate system, so we can just use the current MVP for all objects (i.e.,
-        modeling transform is identity for all objects).'''
-        for name in self.object_name:
-            self.prog_shadow_map['u_color'] = object_colors[name]
-            self.vao_objects[name].render()
+        modeling transform is identity for all objects).
+        The object colours are a vertex attribute, so everything is drawn with a single draw call per run of visible objects.
+        Given the mvp of the view, objects outside of its view volume are skipped, and the others are drawn at
+        the given levels of detail (see lod_levels). '''
+        self.geometry.render(self.shading_layout(), self.visible_objects(mvp, pass_name), levels)
     
-    def render_cheap_shadows(self, darken_factor: float = 0.3 ):
+    def render_cheap_shadows(self, darken_factor: float = 0.3, mvp: glm.mat4 = None, levels: np.ndarray = None):
         ''' render all objects in the scene, *except* for the ground plane. 
         The GLSL program's uniform matrices should be set up to project this geometry onto the ground plane.
-        Here the colours of the objects are set to a darkened version of the object colour. '''
-        # render all objects projected onto the ground, except the ground itself
-        for name in object_name:
-            if name == ground_name:
-                continue
-            self.prog_shadow_map['u_color'].write(np.array(np.array(object_colors[ground_name]) * darken_factor, dtype='f4').tobytes())
-            self.vao_objects[name].render()
+        Here the colours of the objects are set to a darkened version of the object colour.
+        Given the mvp that includes the projection onto the ground, shadows outside of the view volume are skipped. '''
+        # render all objects projected onto the ground, except the ground itself (lighting is off, so u_color is used)
+        self.uniforms['u_color'] = tuple(c * darken_factor for c in self.object_colors[ground_name])
+        casters = self.geometry.object_mask(name for name in self.object_name if name != ground_name)
+        self.geometry.render(self.shading_layout(), self.visible_objects(mvp, 'cheap_shadows', casters), levels)
     
-    def render_for_shadow_map(self):
-        ''' render all objects in the scene without normals or colours '''
-        for name in self.object_name:
-            self.vao_object_shadows[name].render()
+    def render_for_shadow_map(self, light_PV: glm.mat4 = None, pass_name: str = 'shadow', levels: np.ndarray = None):
+        ''' render all objects in the light view volume (of the light camera, or of the given light_PV of a cascade)
+        without normals or colours, at the given levels of detail (see lod_levels).
+        When shadow casters are culled, only the objects between the light and the part of the main view that
+        the light reaches are drawn (see Culling.shadow_caster_planes), so the shadow map is only complete for
+        what the main camera sees. '''
+        volume = self.light_view_camera.PV if light_PV is None else light_PV
+        if self.culls_shadow_casters():
+            # grow the volume by 2 texels, so that filtered lookups at its border still find the casters
+            volume = shadow_caster_planes(volume, self.main_view_camera.PV, margin=4 / self.texture.size)
+            if volume is None:  # the light reaches nothing the main camera sees
+                self.cull_stats[pass_name] = (0, len(self.geometry.names))
+                return
+        self.geometry.render('depth', self.visible_objects(volume, pass_name), levels)
 
     def render_cube_and_grid(self):
         ''' render a [-1,1]^3 cube with a grid on the side corresponding to the near plane '''
@@ -259,15 +667,16 @@ def make_vao(
         mode=mgl.LINES
 ) -> mgl.VertexArray:
     ''' helper function to create a vertex array object from vertex and index buffer for line geometry '''
-    vbo = ctx.buffer(vertices.astype("f4").tobytes())
-    ibo = ctx.buffer(indices.astype("i4").tobytes())
+    # arrays that are already contiguous float32/int32 (e.g., memory mapped from the mesh cache) are not copied
+    vbo = ctx.buffer(np.ascontiguousarray(vertices, dtype="f4"))
+    ibo = ctx.buffer(np.ascontiguousarray(indices, dtype="i4"))
     if normals is None:
         return ctx.vertex_array(
             prog,
             [(vbo, '3f', 'in_position')],
             index_buffer=ibo,
             mode=mode)
-    vbo2 = ctx.buffer(normals.astype("f4").tobytes())
+    vbo2 = ctx.buffer(np.ascontiguousarray(normals, dtype="f4"))
     vao = ctx.vertex_array(
         prog,
         [(vbo, '3f', 'in_position'),
@@ -301,8 +710,9 @@ class View_Vol:
 
 class Axis:
     ''' A simple line drawn 3D axis object with red, green, blue lines for x, y, z axis directions. '''
-    def __init__(self, ctx, program):
+    def __init__(self, ctx, program, uniforms: Uniforms):
         self.program = program
+        self.uniforms = uniforms  # of the program
         # make the axis lines
         self.line_x_vao = make_vao(ctx, self.program, np.array([0, 0, 0, 1, 0, 0]), np.array([0, 1]), normals=None, mode=mgl.LINES)
         self.line_y_vao = make_vao(ctx, self.program, np.array([0, 0, 0, 0, 1, 0]), np.array([0, 1]), normals=None, mode=mgl.LINES)
@@ -311,21 +721,55 @@ class Axis:
     def render(self):
         # draw a coordinate frame with red green blue axis colours
         # (note that lighting should be disabled when using  this function)
-        self.program['u_color'] = (1, 0, 0, 1)
+        self.uniforms['u_color'] = (1, 0, 0, 1)
         self.line_x_vao.render()
-        self.program['u_color'] = (0, 1, 0, 1)
+        self.uniforms['u_color'] = (0, 1, 0, 1)
         self.line_y_vao.render()
-        self.program['u_color'] = (0, 0, 1, 1)
+        self.uniforms['u_color'] = (0, 0, 1, 1)
         self.line_z_vao.render()
         
         
+# sized depth formats for the shadow map by bits: GL internal format and pixel type
+# (GL_DEPTH_COMPONENT16 and unsigned short, GL_DEPTH_COMPONENT24 and unsigned int, GL_DEPTH_COMPONENT32F and float)
+depth_formats = {16: (0x81A5, 0x1403), 24: (0x81A6, 0x1405), 32: (0x8CAC, 0x1406)}
+
+
+def set_depth_format(ctx: mgl.Context, texture: mgl.Texture, bits: int) -> int:
+    ''' reallocate a depth texture with the depth format of the given bits, and return the depth bits the driver
+    reports for it. moderngl only makes 24 bit depth textures, so this calls glTexImage2D through the GL loader of
+    the context; if that is not available the texture is left as it is and 24 is returned. '''
+    try:
+        load = ctx.mglo._context.load_opengl_function
+    except AttributeError:
+        return 24
+    tex_image_2d = ctypes.CFUNCTYPE(None, ctypes.c_uint, ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_int,
+                                    ctypes.c_int, ctypes.c_uint, ctypes.c_uint, ctypes.c_void_p)(load('glTexImage2D'))
+    get_level_parameter = ctypes.CFUNCTYPE(None, ctypes.c_uint, ctypes.c_int, ctypes.c_uint,
+                                           ctypes.POINTER(ctypes.c_int))(load('glGetTexLevelParameteriv'))
+    GL_TEXTURE_2D, GL_DEPTH_COMPONENT, GL_TEXTURE_DEPTH_SIZE = 0x0DE1, 0x1902, 0x884A
+    internal_format, pixel_type = depth_formats[bits]
+    texture.use(location=0)  # binds the texture for the GL calls below
+    tex_image_2d(GL_TEXTURE_2D, 0, internal_format, *texture.size, 0, GL_DEPTH_COMPONENT, pixel_type, None)
+    depth_size = ctypes.c_int(0)
+    get_level_parameter(GL_TEXTURE_2D, 0, GL_TEXTURE_DEPTH_SIZE, ctypes.byref(depth_size))
+    return depth_size.value
+
+
 class Texture:
-    ''' A shadow map texture, with associated framebuffer object and samplers for accessing the texture in different ways.'''
-    def __init__(self, ctx: mgl.Context):
-        shadow_size = (2 << 7, 2 << 7)  # 512²
+    ''' A shadow map texture, with associated framebuffer object and samplers for accessing the texture in different ways.
+    The framebuffer only has the depth texture (there is no colour to draw), of 16, 24 or 32 (float) bits.
+    With cascades, the texture holds a size x size tile for each cascade, 2 tiles per row.
+    With variance, the shadow pass also draws the moments of a variance shadow map (see ShadowFilter). '''
+    def __init__(self, ctx: mgl.Context, size: int = 256, depth_bits: int = 24, cascades: int = 1, variance: bool = False):
+        self.size = size
+        self.requested_bits = depth_bits
+        self.cascades = cascades
+        self.columns = 1 if cascades == 1 else 2
+        self.rows = -(-cascades // self.columns)
+        shadow_size = (size * self.columns, size * self.rows)
         self.tex_depth = ctx.depth_texture(shadow_size)
-        self.tex_color_depth = ctx.texture(shadow_size, components=1, dtype='f4')
-        self.fbo_depth = ctx.framebuffer(color_attachments=[self.tex_color_depth], depth_attachment=self.tex_depth)
+        self.depth_bits = set_depth_format(ctx, self.tex_depth, depth_bits)
+        self.fbo_depth = ctx.framebuffer(depth_attachment=self.tex_depth)
         self.sampler_depth = ctx.sampler(
             filter=(mgl.LINEAR, mgl.LINEAR),
             compare_func='>=',
@@ -339,6 +783,29 @@ class Texture:
             texture=self.tex_depth)
         self.sampler_depth.use(location=0)  # Assign the texture and sampling parameters to the texture unit
         self.sampler_depth_map_raw.use(location=1)  # Assign the texture and sampling parameters to the texture unit
+        self.variance = VarianceShadowMap(ctx, self.tex_depth) if variance else None
+        self.contents_key = None  # Scene.shadow_map_key of the last render into this texture, None if never rendered
+
+    @property
+    def nbytes(self) -> int:
+        ''' bytes of GPU memory of the shadow map (and moments), assuming 24 bit depth is stored in 32 bits '''
+        width, height = self.tex_depth.size
+        moments = self.variance.nbytes if self.variance is not None else 0
+        return width * height * (2 if self.depth_bits <= 16 else 4) + moments
+
+    def tile_viewport(self, i: int) -> tuple:
+        ''' the viewport (x, y, width, height) of the tile of cascade i '''
+        return (i % self.columns) * self.size, (i // self.columns) * self.size, self.size, self.size
+
+    def tile_coords(self, i: int) -> tuple:
+        ''' offset and scale (x, y, sx, sy) of the tile of cascade i in texture coordinates '''
+        return (i % self.columns) / self.columns, (i // self.columns) / self.rows, 1 / self.columns, 1 / self.rows
+
+    def release(self):
+        if self.variance is not None:
+            self.variance.release()
+        for obj in (self.sampler_depth, self.sampler_depth_map_raw, self.fbo_depth, self.tex_depth):
+            obj.release()
 
     def set_filter(self, use_linear_filter: bool):
         ''' set the texture filtering mode for the shadow map texture '''
@@ -351,5 +818,33 @@ class Texture:
         ''' set the framebuffer object for and clear it in preparation for rendering the shadow map. 
         The depth_clear_value should be 1.0 for standard depth test, or 0.0 if the depth test is inverted.
         '''
-        self.fbo_depth.use()
-        self.fbo_depth.clear(1, 1, 1, 1, depth=depth_clear_value)
\ No newline at end of file
+        fbo = self.fbo_depth if self.variance is None else self.variance.fbo  # (moments clear to the far plane)
+        fbo.viewport = (0, 0, *fbo.size)  # a cascade tile may have been the last viewport
+        fbo.use()
+        fbo.clear(1, 1, 1, 1, depth=depth_clear_value)
+
+class ShadowPassStats:
+    ''' Counts of rendered and skipped shadow passes, and the CPU time spent rendering them. '''
+    def __init__(self):
+        self.rendered = 0
+        self.skipped = 0
+        self.render_time = 0.0  # seconds
+
+    def add_render(self, seconds: float):
+        self.rendered += 1
+        self.render_time += seconds
+
+    @property
+    def skip_rate(self) -> float:
+        ''' fraction of shadow passes that reused the shadow map '''
+        total = self.rendered + self.skipped
+        return self.skipped / total if total else 0.0
+
+    @property
+    def time_saved(self) -> float:
+        ''' estimate of the seconds saved by skipping, using the mean time of a rendered pass '''
+        return self.skipped * self.render_time / self.rendered if self.rendered else 0.0
+
+    def as_dict(self) -> dict:
+        return {'rendered': self.rendered, 'skipped': self.skipped, 'skip_rate': self.skip_rate,
+                'render_time': self.render_time, 'time_saved': self.time_saved}
\ No newline at end of file
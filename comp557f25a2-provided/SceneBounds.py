@@ -0,0 +1,74 @@
+import numpy as np
+import glm
+
+
+def mat4_to_np(M: glm.mat4) -> np.ndarray:
+    ''' convert a glm matrix to a 4x4 numpy array in the usual (row, column) layout.
+    Note that np.array(M) is not used because its layout depends on the PyGLM version. '''
+    return np.array(M.to_list(), dtype='f4').T
+
+
+def hull_points(points: np.ndarray) -> np.ndarray:
+    ''' reduce an (N,3) point set to the vertices of its convex hull.
+    The extremes of a linear function (such as depth in a view) are always found at hull vertices,
+    so this reduction is exact for fitting bounds. If scipy is not available, or the points are
+    degenerate (e.g., a flat plane), all points are returned. scipy is slow to import, so this is only
+    called when a mesh is preprocessed (see MeshCache), not at startup. '''
+    if points.shape[0] < 5:
+        return points
+    try:
+        from scipy.spatial import ConvexHull
+    except ImportError:
+        return points
+    try:
+        return points[ConvexHull(points).vertices]
+    except Exception:  # QhullError for flat or otherwise degenerate point sets
+        return points
+
+
+class SceneBounds:
+    ''' Scene points reduced to the convex hull of each object, for fitting near/far and l,r,b,t values to a view.
+    Points are added per object, with their hull when it is known, and joined lazily on the first query.
+    Each query is then a single matrix multiply of the float32 hull points. '''
+    def __init__(self):
+        self._chunks = []     # hull points of each added point set
+        self._points = None   # hull points of the whole scene, joined lazily
+
+    def add_points(self, points: np.ndarray, hull: np.ndarray = None):
+        ''' add an (N,3) array of points, e.g., the vertices of one object, reduced to the given points of their
+        convex hull (see hull_points), or all kept if it is not given '''
+        points = points if hull is None else hull
+        self._chunks.append(np.asarray(points, dtype='f4').reshape(-1, 3))
+        self._points = None
+
+    @property
+    def points(self) -> np.ndarray:
+        ''' the (M,3) float32 hull points of everything added so far '''
+        if self._points is None:
+            if self._chunks:
+                points = np.concatenate(self._chunks)
+            else:
+                points = np.zeros((0, 3), dtype='f4')
+            self._points = np.ascontiguousarray(points, dtype='f4')
+        return self._points
+
+    def view_coords(self, V: glm.mat4) -> np.ndarray:
+        ''' return the (M,3) hull points in the view coordinates of the (affine) viewing matrix V '''
+        A = mat4_to_np(V)
+        return self.points @ A[:3, :3].T + A[:3, 3]
+
+    def view_extents(self, V: glm.mat4):
+        ''' return the min and max corners of the view coordinate bounding box of the scene '''
+        coords = self.view_coords(V)
+        return coords.min(axis=0), coords.max(axis=0)
+
+    def compute_nf(self, V: glm.mat4):
+        ''' near and far distances along the -Z axis of the view that just fit the scene '''
+        lo, hi = self.view_extents(V)
+        return float(-hi[2]), float(-lo[2])
+
+    def compute_lrbt(self, V: glm.mat4, n: float, f: float):
+        ''' l,r,b,t on the near plane that fit the view x and y extents of the scene, scaled by n/f '''
+        lo, hi = self.view_extents(V)
+        s = n / f
+        return float(lo[0] * s), float(hi[0] * s), float(lo[1] * s), float(hi[1] * s)
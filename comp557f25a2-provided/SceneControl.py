@@ -1,13 +1,18 @@
-from PyQt5 import QtWidgets, QtCore
-from PyQt5.QtGui import QKeyEvent
-QtWidgets.QApplication.setStyle("Fusion")
-
 class SceneControl:
+    ''' Flags and values of the scene that can be changed from the GUI or the keyboard.
+    This class does not need PyQt5, the Qt widgets are only imported when building the control panel. '''
     def __init__(self):
+        self.listeners = []  # called with no arguments whenever a control changes value, e.g., to schedule a repaint
         # Flags and values conrolled by UI elements (and keyboard) to adjust viewing and rendering options
         self.show_main_camera = True   # TODO: OBJECTIVE: SET DEFAULT TO TRUE ONCE YOU HAVE IMPLEMENTED DRAWING OF THE MAIN CAMERA FRUSTUM
         self.show_light_camera = True  # TODO: OBJECTIVE: SET DEFAULT TO TRUE ONCE YOU HAVE IMPLEMENTED DRAWING OF THE LIGHT CAMERA FRUSTUM
         self.use_linear_filter = False  # shadow map filtering
+        self.shadow_filter = 'hardware' # 'hardware' (one compare), 'pcf' (N x N compares), 'poisson' (on a Poisson disk), or 'vsm' (variance shadow map)
+        self.pcf_kernel_size = 3        # taps on each side of the PCF grid (odd, 1 to 9)
+        self.poisson_taps = 16          # taps of Poisson disk PCF (1 to 32)
+        self.filter_radius = 2.0        # radius of the Poisson disk, in shadow map texels
+        self.vsm_blur_radius = 2        # radius of the Gaussian blur of the variance shadow map moments, in texels (0 to 8)
+        self.vsm_bleed_reduction = 0.2  # lit fractions below this are cut to 0 in the variance test, against light bleeding
         self.use_culling = False        # front face culling  in light view to reduce self-shadowing
         self.cheap_shadows = False
         self.draw_depth = False         # draw the depth of fragments with respect to light position
@@ -15,23 +20,69 @@ class SceneControl:
         self.use_shadow_map = True     # TODO: OBJECTIVE: SET DEFAULT TO TRUE ONCE YOU HAVE IMPLEMENTED SHADOW MAPPING
         self.use_depth_bias = True
         self.bias_slope_factor = 0.005
+        self.cache_shadow_map = True    # only render the shadow map again when the light, geometry or culling changes
+        self.cache_views = True         # keep an image of each view, and only draw a view again when its inputs change
+        self.use_frustum_culling = True # skip objects whose bounding box is outside the view volume of a pass
+        self.cull_shadow_casters = False  # only draw the shadow casters of what the main view sees (with frustum culling)
+        self.shadow_map_size = 256      # width and height of the shadow map
+        self.shadow_depth_bits = 24     # depth precision of the shadow map: 16, 24, or 32 (float)
+        self.shadow_cascades = 1        # shadow maps for slices of the main view by depth (1 to 4), 1 for a single map
+        self.light_count = 1            # lights (1 to 16), the others around the light camera, with a shadow map array
+        self.use_lod = False            # draw distant objects (and shadow casters) with simplified meshes
+        self.lod_pixel_error = 1.0      # largest geometric error of a level of detail on screen, in pixels (or shadow map texels)
         self.manual_light_fov = True    # TODO: OBJECTIVE: SET DEFAULT TO FALSE ONCE YOU HAVE IMPLEMENTED AUTOMATIC FITTING OF LIGHT FRUSTUM
+        self.focus_light_frustum = False  # fit the light frustum to what the main view sees (without manual light fov)
         self.light_view_fov = 45
         self.main_view_fov = 20
 
-    def get_controls(self, layout: QtWidgets.QVBoxLayout):
+    def __setattr__(self, name, value):
+        changed = getattr(self, name, None) != value
+        super().__setattr__(name, value)
+        if changed:
+            for listener in self.__dict__.get('listeners', ()):
+                listener()
+
+    def add_listener(self, callback):
+        ''' call callback() whenever a control changes, from the GUI, the keyboard, or code '''
+        self.listeners.append(callback)
+
+    def get_controls(self, layout):
+        ''' add the widgets for the controls to the given QVBoxLayout '''
+        from SceneControlWidgets import SliderControl, CheckboxControl, RadioControl
+        from ShadowFilter import filter_modes, filter_labels
         layout.addWidget(SliderControl("Main View fov", 1, 179, self.main_view_fov, lambda f: setattr(self, 'main_view_fov', f), scale=0.1))
         layout.addWidget(CheckboxControl("Manual Light fov", self.manual_light_fov, lambda x: setattr(self, 'manual_light_fov', x)))
+        layout.addWidget(CheckboxControl("Focus light frustum on main view", self.focus_light_frustum, lambda x: setattr(self, 'focus_light_frustum', x)))
         layout.addWidget(SliderControl("Light View fov", 1, 179, self.light_view_fov, lambda f: setattr(self, 'light_view_fov', f), scale=0.1))
         layout.addWidget(CheckboxControl("show main camera", self.show_main_camera, lambda x: setattr(self, 'show_main_camera', x)))
         layout.addWidget(CheckboxControl("show light camera", self.show_light_camera, lambda x: setattr(self, 'show_light_camera', x)))
         layout.addWidget(CheckboxControl("Use linear filter", self.use_linear_filter, lambda x: setattr(self, 'use_linear_filter', x)))
+        modes = [self.shadow_filter] + [m for m in filter_modes if m != self.shadow_filter]
+        mode_of_label = {filter_labels[m]: m for m in modes}
+        layout.addWidget(RadioControl([filter_labels[m] for m in modes], lambda text: setattr(self, 'shadow_filter', mode_of_label[text])))
+        layout.addWidget(SliderControl("PCF kernel size", 1, 9, self.pcf_kernel_size, lambda x: setattr(self, 'pcf_kernel_size', int(round(x)) | 1), digits=0))
+        layout.addWidget(SliderControl("Poisson taps", 1, 32, self.poisson_taps, lambda x: setattr(self, 'poisson_taps', int(round(x))), digits=0))
+        layout.addWidget(SliderControl("Poisson radius (texels)", 0.5, 8, self.filter_radius, lambda f: setattr(self, 'filter_radius', f), scale=0.25))
+        layout.addWidget(SliderControl("VSM blur radius", 0, 8, self.vsm_blur_radius, lambda x: setattr(self, 'vsm_blur_radius', int(round(x))), digits=0))
+        layout.addWidget(SliderControl("VSM bleed reduction", 0, 0.9, self.vsm_bleed_reduction, lambda f: setattr(self, 'vsm_bleed_reduction', f), scale=0.05))
         layout.addWidget(CheckboxControl("Shadow pass front face culling", self.use_culling, lambda x: setattr(self, 'use_culling', x)))
         layout.addWidget(CheckboxControl("Use depth bias", self.use_depth_bias, lambda x: setattr(self, 'use_depth_bias', x)))
         layout.addWidget(SliderControl("Bias slope factor", 0.0, 0.05, self.bias_slope_factor, lambda f: setattr(self, 'bias_slope_factor', f), scale=0.001, digits=3))
         layout.addWidget(CheckboxControl("Draw cheap shadows", self.cheap_shadows, lambda x: setattr(self, 'cheap_shadows', x)))
         layout.addWidget(CheckboxControl("Use shadow map", self.use_shadow_map, lambda x: setattr(self, 'use_shadow_map', x)))
+        layout.addWidget(CheckboxControl("Cache shadow map", self.cache_shadow_map, lambda x: setattr(self, 'cache_shadow_map', x)))
+        layout.addWidget(CheckboxControl("Cache view images", self.cache_views, lambda x: setattr(self, 'cache_views', x)))
+        layout.addWidget(CheckboxControl("View frustum culling", self.use_frustum_culling, lambda x: setattr(self, 'use_frustum_culling', x)))
+        layout.addWidget(CheckboxControl("Cull shadow casters to main view", self.cull_shadow_casters, lambda x: setattr(self, 'cull_shadow_casters', x)))
         layout.addWidget(RadioControl(["Fragment depth", "Map depth"], self.depth_callback, use_exclusion=True))
+        sizes = [self.shadow_map_size] + [s for s in (256, 512, 1024, 2048, 4096) if s != self.shadow_map_size]
+        layout.addWidget(RadioControl([str(s) for s in sizes], lambda text: setattr(self, 'shadow_map_size', int(text))))
+        bits = [self.shadow_depth_bits] + [b for b in (16, 24, 32) if b != self.shadow_depth_bits]
+        layout.addWidget(RadioControl([f'{b} bit depth' for b in bits], lambda text: setattr(self, 'shadow_depth_bits', int(text.split()[0]))))
+        layout.addWidget(SliderControl("Shadow cascades", 1, 4, self.shadow_cascades, lambda x: setattr(self, 'shadow_cascades', int(round(x))), digits=0))
+        layout.addWidget(SliderControl("Lights", 1, 16, self.light_count, lambda x: setattr(self, 'light_count', int(round(x))), digits=0))
+        layout.addWidget(CheckboxControl("Mesh levels of detail", self.use_lod, lambda x: setattr(self, 'use_lod', x)))
+        layout.addWidget(SliderControl("LOD error (pixels)", 0.25, 8, self.lod_pixel_error, lambda f: setattr(self, 'lod_pixel_error', f), scale=0.25))
 
 
     def depth_callback(self, text):
@@ -48,8 +99,9 @@ class SceneControl:
             self.draw_depth = False
             self.draw_depth_map = False
 
-    def keyEvent(self, event: QKeyEvent):
-        ''' Keyboard interface for easy evaluation by TAs '''
+    def keyEvent(self, event):
+        ''' Keyboard interface for easy evaluation by TAs (event is a QKeyEvent) '''
+        from PyQt5 import QtCore
         match event.key():
             case QtCore.Qt.Key.Key_F:
                 self.use_linear_filter = not self.use_linear_filter  # shadow map filtering
@@ -74,89 +126,3 @@ class SceneControl:
                 self.show_CAM2 = not self.show_CAM2
             case QtCore.Qt.Key.Key_M:  # Manual light FOV control
                 self.manual_light_fov = not self.manual_light_fov  # (this only makes sense in the absence of tilting and shifting the light view)
-
-class SliderControl(QtWidgets.QWidget):
-    """Wrapper for creating sliders in UI."""
-
-    def __init__(self, label, min_val, max_val, init_val, callback1, scale=1.0, digits=2):
-        super().__init__()
-        self.callback_val_update = callback1
-        self.scale = scale
-        self.value = init_val
-        self.digits = digits
-        layout = QtWidgets.QHBoxLayout()
-        self.label = QtWidgets.QLabel(label)
-        self.slider = QtWidgets.QSlider(QtCore.Qt.Orientation.Horizontal)
-        self.slider.setRange(int(min_val / scale), int(max_val / scale))
-        self.slider.setValue(int(init_val / scale))
-        self.slider.valueChanged.connect(self.on_value_changed)
-        self.value_label = QtWidgets.QLabel(f"{init_val:.{self.digits}f}")
-        layout.addWidget(self.label)
-        layout.addWidget(self.slider)
-        layout.addWidget(self.value_label)
-        self.setLayout(layout)
-        self.slider.setFixedWidth(150)
-
-    def getValue(self):
-        return self.value
-
-    def setValue(self, val):
-        self.slider.blockSignals(True)
-        self.slider.setValue(int(val / self.scale))
-        self.value_label.setText(f"{val:.{self.digits}f}")
-        self.slider.blockSignals(False)
-
-    def on_value_changed(self, value_scaled):
-        self.value = value_scaled * self.scale
-        self.value_label.setText(f"{self.value:.{self.digits}f}")
-        self.callback_val_update(self.value)
-
-
-class CheckboxControl(QtWidgets.QWidget):
-    """Wrapper for creating labeled check box in UI."""
-    def __init__(self, label, init_val: bool, callback1):
-        super().__init__()
-        layout = QtWidgets.QHBoxLayout()
-        self.label = QtWidgets.QLabel(label)
-        self.box = QtWidgets.QCheckBox()
-        self.box.setChecked(init_val)
-        self.box.stateChanged.connect(callback1)
-        layout.addWidget(self.box)
-        layout.addWidget(self.label)
-        layout.addStretch()  # Push to left
-        self.setLayout(layout)
-
-
-class RadioControl(QtWidgets.QWidget):
-    """Wrapper for creating sliders in UI."""
-
-    def __init__(self, sub_labels, callback1, use_exclusion=False):
-        super().__init__()
-        self.callback = callback1
-        # Radio buttons
-        self.group = QtWidgets.QButtonGroup()
-        self.group.setExclusive(True)
-
-        layout = QtWidgets.QHBoxLayout()
-        first_button = None
-        for label in sub_labels:
-            b1 = QtWidgets.QRadioButton(label)
-            if not use_exclusion and first_button is None:
-                first_button = b1
-                b1.setChecked(True)
-            b1.toggled.connect(self.check_buttons)
-            self.group.addButton(b1)
-            layout.addWidget(b1)
-        if use_exclusion:
-            b1 = QtWidgets.QRadioButton("Default")
-            b1.setChecked(True)
-            b1.toggled.connect(self.check_buttons)
-            self.group.addButton(b1)
-            layout.addWidget(b1)
-
-        self.setLayout(layout)
-
-    def check_buttons(self):
-        rb = self.sender()
-        if rb.isChecked():
-            self.callback(rb.text())
@@ -0,0 +1,88 @@
+from PyQt5 import QtWidgets, QtCore
+
+
+class SliderControl(QtWidgets.QWidget):
+    """Wrapper for creating sliders in UI."""
+
+    def __init__(self, label, min_val, max_val, init_val, callback1, scale=1.0, digits=2):
+        super().__init__()
+        self.callback_val_update = callback1
+        self.scale = scale
+        self.value = init_val
+        self.digits = digits
+        layout = QtWidgets.QHBoxLayout()
+        self.label = QtWidgets.QLabel(label)
+        self.slider = QtWidgets.QSlider(QtCore.Qt.Orientation.Horizontal)
+        self.slider.setRange(int(min_val / scale), int(max_val / scale))
+        self.slider.setValue(int(init_val / scale))
+        self.slider.valueChanged.connect(self.on_value_changed)
+        self.value_label = QtWidgets.QLabel(f"{init_val:.{self.digits}f}")
+        layout.addWidget(self.label)
+        layout.addWidget(self.slider)
+        layout.addWidget(self.value_label)
+        self.setLayout(layout)
+        self.slider.setFixedWidth(150)
+
+    def getValue(self):
+        return self.value
+
+    def setValue(self, val):
+        self.slider.blockSignals(True)
+        self.slider.setValue(int(val / self.scale))
+        self.value_label.setText(f"{val:.{self.digits}f}")
+        self.slider.blockSignals(False)
+
+    def on_value_changed(self, value_scaled):
+        self.value = value_scaled * self.scale
+        self.value_label.setText(f"{self.value:.{self.digits}f}")
+        self.callback_val_update(self.value)
+
+
+class CheckboxControl(QtWidgets.QWidget):
+    """Wrapper for creating labeled check box in UI."""
+    def __init__(self, label, init_val: bool, callback1):
+        super().__init__()
+        layout = QtWidgets.QHBoxLayout()
+        self.label = QtWidgets.QLabel(label)
+        self.box = QtWidgets.QCheckBox()
+        self.box.setChecked(init_val)
+        self.box.stateChanged.connect(callback1)
+        layout.addWidget(self.box)
+        layout.addWidget(self.label)
+        layout.addStretch()  # Push to left
+        self.setLayout(layout)
+
+
+class RadioControl(QtWidgets.QWidget):
+    """Wrapper for creating sliders in UI."""
+
+    def __init__(self, sub_labels, callback1, use_exclusion=False):
+        super().__init__()
+        self.callback = callback1
+        # Radio buttons
+        self.group = QtWidgets.QButtonGroup()
+        self.group.setExclusive(True)
+
+        layout = QtWidgets.QHBoxLayout()
+        first_button = None
+        for label in sub_labels:
+            b1 = QtWidgets.QRadioButton(label)
+            if not use_exclusion and first_button is None:
+                first_button = b1
+                b1.setChecked(True)
+            b1.toggled.connect(self.check_buttons)
+            self.group.addButton(b1)
+            layout.addWidget(b1)
+        if use_exclusion:
+            b1 = QtWidgets.QRadioButton("Default")
+            b1.setChecked(True)
+            b1.toggled.connect(self.check_buttons)
+            self.group.addButton(b1)
+            layout.addWidget(b1)
+
+        self.setLayout(layout)
+
+    def check_buttons(self):
+        rb = self.sender()
+        if rb.isChecked():
+            self.callback(rb.text())
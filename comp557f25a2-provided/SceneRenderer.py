@@ -0,0 +1,207 @@
+import numpy as np
+import moderngl as mgl
+from pathlib import Path
+from Scene import Scene, make_vao
+from ShadowFilter import max_pcf_kernel, max_poisson_taps
+from ViewSecond import ViewSecond
+from ViewMain import ViewMain
+from ViewLight import ViewLight
+from ViewPostPerspective import ViewPostPerspective
+
+view_names = ['main', 'light', 'third_person', 'post_projection']  # in the order of the viewports
+
+
+class ViewTarget:
+    ''' Offscreen colour and depth target that keeps the last image drawn for a view.
+    With samples > 0 the view is drawn into multisampled renderbuffers and resolved into the texture. '''
+    def __init__(self, ctx: mgl.Context, size: tuple, samples: int = 0):
+        self.size = size
+        self.texture = ctx.texture(size, components=4)
+        self.texture.filter = (mgl.NEAREST, mgl.NEAREST)  # copied pixel for pixel
+        self.fbo = ctx.framebuffer(color_attachments=[self.texture], depth_attachment=ctx.depth_renderbuffer(size))
+        self.msaa_fbo = None
+        if samples > 0:
+            self.msaa_fbo = ctx.framebuffer(
+                color_attachments=[ctx.renderbuffer(size, components=4, samples=samples)],
+                depth_attachment=ctx.depth_renderbuffer(size, samples=samples))
+        self.key = None  # inputs of the view when the image was drawn (see SceneRenderer.view_key)
+
+    def draw_fbo(self) -> mgl.Framebuffer:
+        return self.msaa_fbo if self.msaa_fbo is not None else self.fbo
+
+    def resolve(self, ctx: mgl.Context):
+        if self.msaa_fbo is not None:
+            ctx.copy_framebuffer(self.fbo, self.msaa_fbo)
+
+    def release(self):
+        for fbo in (self.fbo, self.msaa_fbo):
+            if fbo is not None:
+                for attachment in fbo.color_attachments + (fbo.depth_attachment,):
+                    attachment.release()
+                fbo.release()
+
+
+class SceneRenderer:
+    ''' Draws a frame of the 4 views of a scene into the current framebuffer: the shadow pass first, then
+    each view in its own viewport. This does not depend on Qt, so it is shared by the Qt widget and the
+    headless renderer.
+    When view caching is on (SceneControl.cache_views), each view is drawn into its own offscreen target, and
+    only when its inputs changed: the cameras and controls the view declares (cameras_read, controls_read),
+    the geometry, and the shadow map. The targets are then copied into the viewports. '''
+    def __init__(self, scene: Scene, samples: int = 0):
+        self.scene = scene
+        self.samples = samples  # multisampling of the view targets
+        self.w = 0
+        self.h = 0
+        self.view_ports = []
+        self.aspect_ratio = 1
+        self.view_targets = [None] * 4
+        self.redraws = [0] * 4  # number of times each view was drawn, and reused from its target
+        self.reuses = [0] * 4
+
+    def initGL(self, ctx: mgl.Context):
+        self.ctx = ctx
+        self.scene.initGL(self.ctx)
+        self.ctx.disable(mgl.CULL_FACE)  # have thin non-closed objets, so disable culling by default
+        self.ctx.enable(mgl.DEPTH_TEST)  # always use depth test!
+        self.views = [
+            ViewMain(self.scene, self.scene.cameras[0], self.ctx),
+            ViewLight(self.scene, self.scene.cameras[1], self.ctx),
+            ViewSecond(self.scene, self.scene.cameras[2], self.ctx),
+            ViewPostPerspective(self.scene, self.scene.cameras[3], self.ctx)
+        ]
+        # program and quad for copying the view targets to the viewports
+        current_dir = Path(__file__).parent
+        self.prog_blit = self.ctx.program(
+            vertex_shader=open(current_dir / 'glsl/blit_vert.glsl').read(),
+            fragment_shader=open(current_dir / 'glsl/blit_frag.glsl').read())
+        self.prog_blit['u_image'].value = 2  # units 0 and 1 hold the shadow map samplers
+        quad = np.array([-1, -1, 0, 1, -1, 0, 1, 1, 0, -1, 1, 0], dtype='f4')
+        self.blit_vao = make_vao(self.ctx, self.prog_blit, quad, np.array([0, 1, 2, 0, 2, 3]), mode=mgl.TRIANGLES)
+        self.samples = min(self.samples, self.ctx.max_samples)
+
+    def render(self):
+        ''' draw the shadow pass and the 4 views '''
+        # Draw the shadow pass first! (with the light and main cameras of this frame)
+        self.views[0].update_camera(self.aspect_ratio)
+        self.views[1].update_camera(self.aspect_ratio)
+        self.scene.render_shadow_pass()
+        self.set_program_state()
+        if not self.scene.controls.cache_views:
+            self.clear()
+            for v in range(4):
+                self.render_view(v)
+            return
+        target = self.ctx.fbo if self.ctx.fbo is not None else self.ctx.screen
+        for v in range(4):
+            self.update_view_target(v)
+        target.use()
+        self.clear()
+        self.blit_views()
+
+    def set_program_state(self):
+        ''' set some GLSL program parameters for everyone based on the scene controls '''
+        self.scene.uniforms['u_use_bias'] = self.scene.controls.use_depth_bias
+        self.scene.uniforms['u_bias_slope_factor'] = self.scene.controls.bias_slope_factor
+        self.scene.texture.set_filter(self.scene.controls.use_linear_filter)
+        self.scene.uniforms['u_draw_depth'] = self.scene.controls.draw_depth         # draw depth to light instead of colour
+        self.scene.uniforms['u_draw_depth_map'] = self.scene.controls.draw_depth_map # draw the shadow map depth instead of colour
+        self.scene.uniforms['u_use_shadow_map'] = self.scene.controls.use_shadow_map # enable use of the shadow map
+        self.scene.uniforms['u_use_lights'] = self.scene.light_array is not None   # light with all lights of the light array
+        if self.scene.light_array is not None:
+            self.scene.light_array.set_filter(self.scene.controls.use_linear_filter)
+        self.set_filter_state()
+
+    def set_filter_state(self):
+        ''' select the shadow map filter of the controls (see ShadowFilter) and set its parameters '''
+        controls = self.scene.controls
+        uniforms = self.scene.uniforms
+        uniforms['u_use_pcf'] = controls.shadow_filter == 'pcf'
+        uniforms['u_use_poisson_pcf'] = controls.shadow_filter == 'poisson'
+        uniforms['u_use_vsm'] = controls.shadow_filter == 'vsm'
+        uniforms['u_pcf_radius'] = min(max(controls.pcf_kernel_size, 1), max_pcf_kernel) // 2
+        uniforms['u_poisson_count'] = min(max(controls.poisson_taps, 1), max_poisson_taps)
+        uniforms['u_filter_radius'] = float(controls.filter_radius)
+        uniforms['u_vsm_bleed_reduction'] = float(controls.vsm_bleed_reduction)
+
+    def clear(self):
+        ''' clear the whole drawing surface '''
+        # We use a scissor test to restrict clearing and drawing to each desired viewport
+        self.ctx.scissor = self.ctx.viewport = (0, 0, self.w, self.h) # whole window
+        self.ctx.clear(1,1,1)
+
+    def render_view(self, v: int):
+        ''' draw view v (see view_names) in its own viewport '''
+        self.ctx.viewport = self.ctx.scissor = self.view_ports[v]
+        self.views[v].paintGL( self.aspect_ratio )
+
+    def view_key(self, v: int) -> tuple:
+        ''' everything the image of view v depends on '''
+        view = self.views[v]
+        controls = self.scene.controls
+        return (tuple(camera.version for camera in view.cameras_read()),
+                tuple(getattr(controls, name) for name in view.controls_read),
+                self.scene.geometry_version, self.scene.texture, self.scene.texture.contents_key,
+                self.scene.light_array, self.scene.light_array.contents_key if self.scene.light_array else None)
+
+    def update_view_target(self, v: int):
+        ''' draw view v into its offscreen target, unless the image there is still up to date '''
+        target = self.view_targets[v]
+        if target is not None and target.key == self.view_key(v):
+            self.reuses[v] += 1
+            return
+        if target is None:
+            x, y, w, h = self.view_ports[v]
+            target = self.view_targets[v] = ViewTarget(self.ctx, (int(w), int(h)), self.samples)
+        target.draw_fbo().use()
+        self.ctx.viewport = (0, 0, *target.size)
+        self.ctx.scissor = None
+        self.views[v].paintGL( self.aspect_ratio )
+        target.resolve(self.ctx)
+        # keyed after drawing, since the view updates its own camera while drawing
+        target.key = self.view_key(v)
+        self.redraws[v] += 1
+
+    def blit_views(self):
+        ''' copy the images of the view targets to their viewports in the current framebuffer '''
+        self.ctx.disable(mgl.DEPTH_TEST)
+        for v in range(4):
+            self.ctx.viewport = self.ctx.scissor = self.view_ports[v]
+            self.view_targets[v].texture.use(location=2)
+            self.blit_vao.render()
+        self.ctx.enable(mgl.DEPTH_TEST)
+
+    def release_view_targets(self):
+        for target in self.view_targets:
+            if target is not None:
+                target.release()
+        self.view_targets = [None] * 4
+
+    def resize(self, w, h):
+        ''' recompute the 4 viewports for a window of the given size '''
+        self.w = w
+        self.h = h
+        # Given the current window size, define 4 viewports that leave a small border between them
+        border = 4 # must be an even number of pixels
+        hw = int(self.w/2)
+        hh = int(self.h/2)
+        w = hw - 1.5*border; h = hh - 1.5*border;
+        self.view_ports = [
+            (border, hh + border/2, w, h),  # top-left
+            (hw + border/2, hh + border/2, w, h),  # top-right
+            (border, border, w, h),  # bottom-left
+            (hw + border/2, border, w, h)  # bottom-right
+        ]
+        self.aspect_ratio = w/h  # aspect ratio of each of the baby viewports
+        self.release_view_targets()  # made again at the new size when next drawn
+
+    def get_quadrant(self, x, y):
+        ''' return the quadrant (0,1,2,3) for the given x,y mouse position (y down from the top of the window) '''
+        if x < self.w/2 and y < self.h/2:
+            return 0
+        elif x >= self.w/2 and y < self.h/2:
+            return 1
+        elif x < self.w/2 and y >= self.h/2:
+            return 2
+        else:
+            return 3
@@ -0,0 +1,167 @@
+import time
+import moderngl as mgl
+from UniformState import Uniforms
+
+# features of the shading program (glsl/render_with_sm_frag.glsl), and the uniform that turns each one on
+feature_uniforms = {
+    'LIGHTING': 'u_use_lighting',
+    'SHADOW_MAP': 'u_use_shadow_map',
+    'DEPTH_BIAS': 'u_use_bias',
+    'INVERT_SHADOW_TEST': 'u_invert_shadow_test',
+    'DRAW_DEPTH': 'u_draw_depth',
+    'DRAW_DEPTH_MAP': 'u_draw_depth_map',
+    'PCF': 'u_use_pcf',
+    'POISSON_PCF': 'u_use_poisson_pcf',
+    'VSM': 'u_use_vsm',
+    'LIGHTS': 'u_use_lights',
+}
+shadow_filters = ('VSM', 'POISSON_PCF', 'PCF')  # filters of the shadow map other than one compare, one at a time
+features = tuple(feature_uniforms) + ('CASCADES',)  # CASCADES is on when u_cascade_count is more than 1
+selector_uniforms = set(feature_uniforms.values()) | {'u_cascade_count'}  # the uniforms that select the variant
+BRANCHING = 'BRANCHING'  # the key of the program that branches on bool uniforms for all features
+
+
+def variant_key(values: dict) -> frozenset:
+    ''' the features a variant needs for the given uniform values, leaving out those that change nothing drawn:
+    without lighting only u_color is drawn, the depth views do not shade, and the bias, inverted test and
+    filters only apply with the shadow map (with the first of shadow_filters that is on); the lights of the light
+    array have neither filters nor cascades '''
+    on = {feature for feature, name in feature_uniforms.items() if values.get(name)}
+    if 'LIGHTING' not in on:
+        return frozenset()
+    key = {'LIGHTING'}
+    if 'DRAW_DEPTH' in on:
+        key.add('DRAW_DEPTH')
+    elif 'DRAW_DEPTH_MAP' in on:
+        key.add('DRAW_DEPTH_MAP')
+    elif 'LIGHTS' in on:
+        key.add('LIGHTS')
+        if 'SHADOW_MAP' in on:
+            key |= on & {'SHADOW_MAP', 'DEPTH_BIAS', 'INVERT_SHADOW_TEST'}
+        return frozenset(key)
+    elif 'SHADOW_MAP' in on:
+        key |= on & {'SHADOW_MAP', 'DEPTH_BIAS', 'INVERT_SHADOW_TEST'}
+        key |= set([f for f in shadow_filters if f in on][:1])
+    else:
+        return frozenset(key)
+    if values.get('u_cascade_count', 1) > 1:
+        key.add('CASCADES')
+    return frozenset(key)
+
+
+def all_variant_keys() -> list:
+    ''' every distinct key that variant_key returns '''
+    keys = {frozenset(), frozenset({'LIGHTING'}), frozenset({'LIGHTING', 'LIGHTS'})}
+    for bias in ((), ('DEPTH_BIAS',)):
+        for invert in ((), ('INVERT_SHADOW_TEST',)):
+            keys.add(frozenset(('LIGHTING', 'LIGHTS', 'SHADOW_MAP') + bias + invert))
+    for cascades in ((), ('CASCADES',)):
+        keys.add(frozenset(('LIGHTING', 'DRAW_DEPTH') + cascades))
+        keys.add(frozenset(('LIGHTING', 'DRAW_DEPTH_MAP') + cascades))
+        for bias in ((), ('DEPTH_BIAS',)):
+            for invert in ((), ('INVERT_SHADOW_TEST',)):
+                for shadow_filter in ((),) + tuple((f,) for f in shadow_filters):
+                    keys.add(frozenset(('LIGHTING', 'SHADOW_MAP') + cascades + bias + invert + shadow_filter))
+    return sorted(keys, key=lambda key: (len(key), sorted(key)))
+
+
+def variant_name(key) -> str:
+    ''' short name of a variant key, e.g., 'LIGHTING+SHADOW_MAP', or 'FLAT' for none '''
+    return key if key == BRANCHING else '+'.join(f for f in features if f in key) or 'FLAT'
+
+
+class ShaderVariants:
+    ''' Programs compiled from one vertex and fragment shader with each feature #defined as true or false after
+    the version line of the fragment shader, so the branches on features are removed by the compiler, kept in a
+    cache keyed by the set of features that are on (or BRANCHING for the program that reads them from uniforms).
+    Programs are compiled on first use, and setup(prog) is called on each new one (e.g., to assign texture units).
+    The source of a variant is always the same for the same key, so drivers with an on-disk shader cache (e.g.,
+    Mesa, in ~/.cache/mesa_shader_cache) reuse the compiled variants of previous runs; moderngl has no access to
+    program binaries to save them here. '''
+    def __init__(self, ctx: mgl.Context, vertex_shader: str, fragment_shader: str, setup=None):
+        self.ctx = ctx
+        self.vertex_shader = vertex_shader
+        self.fragment_shader = fragment_shader
+        self.setup = setup
+        self.programs = {}       # key -> program
+        self.uniforms = {}       # key -> Uniforms of the program
+        self.compile_times = {}  # key -> seconds to compile and link, for measuring
+
+    def source(self, key) -> str:
+        ''' the fragment shader of a variant '''
+        if key == BRANCHING:
+            defines = ['#define BRANCHING']
+        else:
+            defines = [f'#define {f} {"true" if f in key else "false"}' for f in features]
+        version, _, rest = self.fragment_shader.partition('\n')
+        return '\n'.join([version] + defines + [rest])
+
+    def program(self, key) -> mgl.Program:
+        ''' the program of a variant, compiled on first use '''
+        prog = self.programs.get(key)
+        if prog is None:
+            start = time.perf_counter()
+            prog = self.ctx.program(vertex_shader=self.vertex_shader, fragment_shader=self.source(key))
+            self.compile_times[key] = time.perf_counter() - start
+            if self.setup is not None:
+                self.setup(prog)
+            self.programs[key] = prog
+            self.uniforms[key] = Uniforms(prog)
+        return prog
+
+    def compile(self, keys):
+        ''' compile the variants of the keys now, so that no frame waits for them later '''
+        for key in keys:
+            self.program(key)
+
+    def release(self):
+        for prog in self.programs.values():
+            prog.release()
+        self.programs = {}
+        self.uniforms = {}
+
+
+class VariantUniforms:
+    ''' The uniform state of the shading program, for drawing with its variants: it takes the same writes as
+    Uniforms (and the feature uniforms, e.g., u_use_lighting), keeps the values, and writes them to the variant
+    that the feature uniforms select (see variant_key). When the variant changes, the values it does not have yet
+    are written to it; uniforms that a variant compiles out are skipped. '''
+    def __init__(self, variants: ShaderVariants):
+        self.variants = variants
+        self.values = {}
+        self.key = variant_key(self.values)
+        self.program = variants.program(self.key)
+        self.writes = 0   # counts of writes made and skipped, for measuring
+        self.skipped = 0
+
+    def __setitem__(self, name: str, value):
+        if name in self.values and self.values[name] == value:
+            self.skipped += 1  # (the current variant is always up to date)
+            return
+        self.values[name] = value
+        if name in selector_uniforms:
+            key = variant_key(self.values)
+            if key != self.key:
+                self.select(key)
+        self._write(name, value)
+
+    def __getitem__(self, name: str):
+        return self.values[name]
+
+    def select(self, key):
+        ''' make the variant of the key current, bringing its uniforms up to date '''
+        self.key = key
+        self.program = self.variants.program(key)
+        for name, value in self.values.items():
+            self._write(name, value)
+
+    def _write(self, name: str, value):
+        uniforms = self.variants.uniforms[self.key]
+        if name not in uniforms.handles:
+            return
+        writes = uniforms.writes
+        uniforms[name] = value
+        if uniforms.writes > writes:
+            self.writes += 1
+        else:
+            self.skipped += 1
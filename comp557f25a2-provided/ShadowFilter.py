@@ -0,0 +1,93 @@
+import numpy as np
+import moderngl as mgl
+from UniformState import Uniforms
+
+# shadow map filters (SceneControl.shadow_filter): one hardware compare (2x2 PCF with the linear filter), a grid
+# of N x N compare taps, compare taps on a Poisson disk, or a variance shadow map
+filter_modes = ('hardware', 'pcf', 'poisson', 'vsm')
+filter_labels = {'hardware': 'Hardware', 'pcf': 'N-tap PCF', 'poisson': 'Poisson PCF', 'vsm': 'VSM'}
+max_pcf_kernel = 9     # taps on each side of the PCF grid
+max_poisson_taps = 32  # size of u_poisson_taps in the shading program
+max_blur_radius = 8    # size of u_weights in the blur program, less one
+moments_unit = 4       # texture unit of the moments (0 and 1 are the shadow map samplers, 2 the view images)
+blur_unit = 5
+
+
+def poisson_disk(count: int, seed: int = 0, candidates: int = 32) -> np.ndarray:
+    ''' (count,2) points in the unit disk that are well spread out, by best candidate sampling (Mitchell 1991):
+    each point is the one of a few random candidates furthest from the points before it, so that the first k
+    points of the sequence are also well spread, for filters with fewer taps '''
+    rng = np.random.default_rng(seed)
+    points = np.zeros((0, 2))
+    for _ in range(count):
+        angle = rng.uniform(0, 2 * np.pi, candidates)
+        radius = np.sqrt(rng.uniform(0, 1, candidates))
+        tries = np.stack([radius * np.cos(angle), radius * np.sin(angle)], axis=1)
+        if points.shape[0] == 0:
+            best = np.argmin(radius)
+        else:
+            best = np.argmax(np.min(np.linalg.norm(tries[:, None] - points[None], axis=2), axis=1))
+        points = np.vstack([points, tries[best]])
+    return points
+
+
+def gaussian_weights(radius: int) -> np.ndarray:
+    ''' weights of the centre texel and the texels 1, 2, ... radius away on each side of a Gaussian blur
+    (standard deviation of half the radius), summing to 1 over both sides '''
+    x = np.arange(radius + 1)
+    weights = np.exp(-0.5 * (x / max(radius / 2, 0.5)) ** 2)
+    return weights / (2 * weights.sum() - weights[0])
+
+
+class VarianceShadowMap:
+    ''' Moments (depth and depth squared) of the shadow map for variance shadow mapping (Donnelly and Lauritzen
+    2006), in a two channel float texture of the size of the shadow map. The depth program draws them with the
+    depth texture of the shadow map as depth buffer, so one pass fills both. The moments are then blurred with a
+    separable Gaussian (in each cascade tile) and mipmapped, so the shading program reads them with ordinary
+    trilinear filtering and bounds the lit fraction with Chebyshev's inequality. '''
+    def __init__(self, ctx: mgl.Context, tex_depth: mgl.Texture):
+        self.ctx = ctx
+        self.moments = ctx.texture(tex_depth.size, 2, dtype='f4')
+        self.moments.repeat_x = self.moments.repeat_y = False  # (no anisotropic filtering: llvmpipe sizes its
+        # footprint from the implicit derivatives, which jump where neighbouring pixels are in different cascades)
+        self.scratch = ctx.texture(tex_depth.size, 2, dtype='f4')  # the moments blurred in one direction
+        self.scratch.filter = (mgl.NEAREST, mgl.NEAREST)
+        self.scratch.repeat_x = self.scratch.repeat_y = False
+        self.fbo = ctx.framebuffer(color_attachments=[self.moments], depth_attachment=tex_depth)
+        self.fbo_moments = ctx.framebuffer(color_attachments=[self.moments])
+        self.fbo_scratch = ctx.framebuffer(color_attachments=[self.scratch])
+        self.build_mipmaps()
+
+    @property
+    def nbytes(self) -> int:
+        ''' bytes of GPU memory of the moments (with mipmaps) and the blur texture '''
+        width, height = self.moments.size
+        return width * height * 8 * 7 // 3
+
+    def build_mipmaps(self):
+        self.moments.build_mipmaps()
+        self.moments.filter = (mgl.LINEAR_MIPMAP_LINEAR, mgl.LINEAR)
+        self.moments.use(location=moments_unit)
+
+    def blur(self, uniforms: Uniforms, quad: mgl.VertexArray, radius: int, tiles: list):
+        ''' blur the moments of each tile, given as (x, y, sx, sy) texture coordinates and (x, y, w, h) viewport,
+        in x then y with the blur program (of the uniforms) drawing the quad, and rebuild the mipmaps '''
+        if radius > 0:
+            weights = np.zeros(max_blur_radius + 1, dtype='f4')
+            weights[:radius + 1] = gaussian_weights(min(radius, max_blur_radius))
+            uniforms['u_radius'] = min(radius, max_blur_radius)
+            uniforms['u_weights'] = weights.tobytes()
+            for source, target, direction in ((self.moments, self.fbo_scratch, (1, 0)),
+                                              (self.scratch, self.fbo_moments, (0, 1))):
+                source.use(location=blur_unit)
+                uniforms['u_direction'] = direction
+                target.use()
+                for coords, viewport in tiles:
+                    self.ctx.viewport = viewport
+                    uniforms['u_tile'] = coords
+                    quad.render()
+        self.build_mipmaps()
+
+    def release(self):
+        for obj in (self.fbo, self.fbo_moments, self.fbo_scratch, self.moments, self.scratch):
+            obj.release()
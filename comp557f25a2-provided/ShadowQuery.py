@@ -0,0 +1,167 @@
+import numpy as np
+import moderngl as mgl
+from pathlib import Path
+from UniformState import Uniforms
+from SceneBounds import mat4_to_np
+
+gpu_min_points = 1000  # queries of this many points or more go to the GPU by default (see bench_shadow_query)
+
+
+class ShadowQuery:
+    ''' Visibility of many world points from the shadow map of a scene (0 in shadow to 1 lit), as the shading
+    program would find it for a surface there: the light space transform (or the cascade of the point, by its
+    depth in the main view), the slope bias of compute_visibility (with the bias uniforms of the shading program),
+    and one hardware compare, nearest or bilinear (2x2 PCF) by the texture filter control. The other shadow
+    filters are not applied.
+    On the CPU, all points go through the transform in one matrix product and are compared with a copy of the
+    depth map, read back once for each shadow map drawn. On the GPU, a vertex program does the same for each
+    point, written back with transform feedback (OpenGL 3.3 has no compute shaders). '''
+    def __init__(self, scene):
+        self.scene = scene
+        self.depth = None  # copy of the depth map, and the (texture, contents key) it was read from
+        self.depth_key = None
+        self.prog = None  # made on first use of the GPU
+        self.capacity = 0
+        self.buffers = ()
+        self.vaos = {}
+
+    def visibility(self, points: np.ndarray, normals: np.ndarray = None, gpu: bool = None) -> np.ndarray:
+        ''' float32 visibility of the (N,3) world points, with their (N,3) normals for the slope bias (without,
+        the bias is that of a surface facing the light, none), on the GPU when gpu is set (by default, for
+        gpu_min_points or more) '''
+        points = np.ascontiguousarray(points, dtype='f4').reshape(-1, 3)
+        if normals is not None:
+            normals = np.ascontiguousarray(normals, dtype='f4').reshape(-1, 3)
+        if gpu is None:
+            gpu = points.shape[0] >= gpu_min_points
+        if points.shape[0] == 0:
+            return np.zeros(0, dtype='f4')
+        return self.visibility_gpu(points, normals) if gpu else self.visibility_cpu(points, normals)
+
+    def depth_map(self) -> np.ndarray:
+        ''' the depth map of the scene's shadow map as a (height, width) float32 array, bottom row first '''
+        texture = self.scene.texture
+        key = (texture, texture.contents_key)
+        if self.depth_key != key:
+            width, height = texture.tex_depth.size
+            self.depth = np.frombuffer(texture.tex_depth.read(), dtype='f4').reshape(height, width)
+            self.depth_key = key
+        return self.depth
+
+    def visibility_cpu(self, points: np.ndarray, normals: np.ndarray = None) -> np.ndarray:
+        scene = self.scene
+        controls = scene.controls
+        depth = self.depth_map()
+        height, width = depth.shape
+        homogeneous = np.hstack([points, np.ones((points.shape[0], 1), dtype='f4')])
+        if not scene.cascades:
+            coords = homogeneous @ mat4_to_np(scene.light_space_transform).T
+            st = coords[:, :2] / coords[:, 3:]
+        else:
+            # the cascade of each point, as in select_cascade, and its coordinates kept inside the tile
+            view_depth = homogeneous @ np.array(scene.cascade_depth_row, dtype='f4')
+            cascade = np.zeros(points.shape[0], dtype=int)
+            for i in range(len(scene.cascades) - 1):
+                cascade += (cascade == i) & (view_depth > scene.cascades[i][2])
+            coords = np.empty_like(homogeneous)
+            st = np.empty((points.shape[0], 2), dtype='f4')
+            half_texel = 0.5 / np.array([width, height], dtype='f4')
+            for i, (M, tile, _) in enumerate(scene.cascades):
+                mask = cascade == i
+                coords[mask] = homogeneous[mask] @ mat4_to_np(M).T
+                offset, scale = np.array(tile[:2], dtype='f4'), np.array(tile[2:], dtype='f4')
+                st[mask] = np.clip(offset + coords[mask, :2] / coords[mask, 3:] * scale,
+                                   offset + half_texel, offset + scale - half_texel)
+        z = coords[:, 2] / coords[:, 3] - self.bias(points, normals)
+        if scene.texture.depth_bits < 32:
+            z = np.clip(z, 0, 1)  # (the reference is clamped for fixed point depth formats)
+
+        if controls.use_linear_filter:
+            # the compare at the 4 nearest texel centres, weighted bilinearly
+            u = st * np.array([width, height], dtype='f4') - 0.5
+            base = np.floor(u)
+            f = u - base
+            x0, y0 = base[:, 0].astype(int), base[:, 1].astype(int)
+            x = np.clip(np.stack([x0, x0 + 1]), 0, width - 1)
+            y = np.clip(np.stack([y0, y0 + 1]), 0, height - 1)
+            fx, fy = f[:, 0], f[:, 1]
+            shadow = ((z >= depth[y[0], x[0]]) * (1 - fx) * (1 - fy) + (z >= depth[y[0], x[1]]) * fx * (1 - fy) +
+                      (z >= depth[y[1], x[0]]) * (1 - fx) * fy + (z >= depth[y[1], x[1]]) * fx * fy)
+        else:
+            x = np.clip(np.floor(st[:, 0] * width).astype(int), 0, width - 1)
+            y = np.clip(np.floor(st[:, 1] * height).astype(int), 0, height - 1)
+            shadow = (z >= depth[y, x]).astype('f4')
+        if self.shading_value('u_invert_shadow_test'):
+            shadow = 1 - shadow
+        return (1 - shadow).astype('f4')
+
+    def bias(self, points: np.ndarray, normals: np.ndarray = None):
+        ''' the slope bias of compute_visibility for each point (or 0 with the bias off or no normals) '''
+        if not self.shading_value('u_use_bias') or normals is None:
+            return 0
+        to_light = np.array(self.scene.get_light_pos_in_world().xyz, dtype='f4') - points
+        cos_theta = np.einsum('ij,ij->i', to_light, normals)
+        cos_theta /= np.linalg.norm(to_light, axis=1) * np.linalg.norm(normals, axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            bias = self.shading_value('u_bias_slope_factor') * np.tan(np.arccos(np.clip(cos_theta, -1, 1)))
+        bias = np.clip(np.nan_to_num(bias, nan=0), 0, 0.01)
+        return -bias if self.shading_value('u_invert_shadow_test') else bias
+
+    def shading_value(self, name: str):
+        ''' the value of a uniform of the shading program, as last set for drawing the views (off if never set) '''
+        return self.scene.uniforms.values.get(name, False)
+
+    def visibility_gpu(self, points: np.ndarray, normals: np.ndarray = None) -> np.ndarray:
+        scene = self.scene
+        controls = scene.controls
+        if self.prog is None:
+            ctx = scene.ctx
+            self.prog = ctx.program(
+                vertex_shader=open(Path(__file__).parent / 'glsl/visibility_vert.glsl').read(),
+                varyings=['v_visibility'])
+            self.prog['u_sampler_shadow'].value = 0
+            self.uniforms = Uniforms(self.prog)
+        n = points.shape[0]
+        self.reserve(n)
+        points_buffer, normals_buffer, out = self.buffers
+        points_buffer.write(points)
+        if normals is not None:
+            normals_buffer.write(normals)
+        uniforms = self.uniforms
+        uniforms['u_light_space_transform'] = scene.light_space_transform
+        uniforms['u_light_pos'] = tuple(scene.get_light_pos_in_world().xyz)
+        uniforms['u_has_normals'] = normals is not None
+        for name in ('u_use_bias', 'u_invert_shadow_test'):
+            uniforms[name] = bool(self.shading_value(name))
+        uniforms['u_bias_slope_factor'] = float(self.shading_value('u_bias_slope_factor'))
+        for name, value in scene.cascade_uniform_values().items():
+            uniforms[name] = value
+        scene.texture.set_filter(controls.use_linear_filter)
+        scene.texture.sampler_depth.use(location=0)
+        self.vaos[normals is not None].transform(out, mode=mgl.POINTS, vertices=n)
+        return np.frombuffer(out.read(size=n * 4), dtype='f4')
+
+    def reserve(self, n: int):
+        ''' buffers for (at least) n points, with a vertex array for the points with and without normals '''
+        if n <= self.capacity:
+            return
+        self.release_buffers()
+        ctx = self.scene.ctx
+        self.capacity = max(n, 2 * self.capacity)
+        self.buffers = (ctx.buffer(reserve=self.capacity * 12), ctx.buffer(reserve=self.capacity * 12),
+                        ctx.buffer(reserve=self.capacity * 4))
+        points_buffer, normals_buffer, _ = self.buffers
+        self.vaos = {False: ctx.vertex_array(self.prog, [(points_buffer, '3f', 'in_position')]),
+                     True: ctx.vertex_array(self.prog, [(points_buffer, '3f', 'in_position'),
+                                                        (normals_buffer, '3f', 'in_normal')])}
+
+    def release_buffers(self):
+        for obj in list(self.vaos.values()) + list(self.buffers):
+            obj.release()
+        self.vaos, self.buffers, self.capacity = {}, (), 0
+
+    def release(self):
+        self.release_buffers()
+        if self.prog is not None:
+            self.prog.release()
+            self.prog = None
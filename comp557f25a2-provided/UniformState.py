@@ -0,0 +1,74 @@
+import moderngl as mgl
+import glm
+
+
+class Uniforms:
+    ''' The uniforms of a program, looked up by name once, with writes skipped when the value is unchanged.
+    Values are glm vectors and matrices (written as bytes), or bools, numbers and tuples. '''
+    def __init__(self, prog: mgl.Program):
+        self.handles = {}
+        for name in prog:
+            member = prog[name]
+            if isinstance(member, mgl.Uniform):
+                self.handles[name] = member
+        self.values = {}  # last value written to each uniform
+        self.writes = 0   # counts, for measuring
+        self.skipped = 0
+
+    def __setitem__(self, name: str, value):
+        if name in self.values and self.values[name] == value:
+            self.skipped += 1
+            return
+        handle = self.handles[name]
+        if isinstance(value, (bool, int, float, tuple)):
+            handle.value = value
+        else:
+            handle.write(value)
+        self.values[name] = value
+        self.writes += 1
+
+    def __getitem__(self, name: str):
+        return self.values[name]
+
+
+class ViewBlock:
+    ''' Uniform buffer with the matrices and light data of the view being drawn, matching the ViewBlock
+    uniform block of the shading program (std140 layout):
+        mat4 u_mv; mat4 u_mvp; mat4 u_light_space_transform; vec4 u_light_pos;
+    Each view fills the whole block with one write (set_view), and the overlays drawn in a view (frustums,
+    axes, cheap shadows) replace only the mvp matrix (set_mvp). '''
+    size = 3 * 64 + 16
+    mvp_offset = 64
+
+    def __init__(self, ctx: mgl.Context, binding: int = 0):
+        self.binding = binding
+        self.buffer = ctx.buffer(reserve=self.size)
+        self.buffer.bind_to_uniform_block(binding)
+        self.data = bytearray(self.size)
+        self.written = None  # bytes of the buffer, to skip writes that change nothing
+        self.writes = 0
+        self.skipped = 0
+
+    def bind(self, prog: mgl.Program, block_name: str = 'ViewBlock'):
+        ''' connect the uniform block of a program to this buffer '''
+        prog[block_name].binding = self.binding
+
+    def set_view(self, mv: glm.mat4, mvp: glm.mat4, light_space_transform: glm.mat4, light_pos: glm.vec3):
+        data = self.data
+        data[0:64] = mv.to_bytes()
+        data[64:128] = mvp.to_bytes()
+        data[128:192] = light_space_transform.to_bytes()
+        data[192:208] = glm.vec4(light_pos, 0).to_bytes()
+        self.write()
+
+    def set_mvp(self, mvp: glm.mat4):
+        self.data[self.mvp_offset:self.mvp_offset + 64] = mvp.to_bytes()
+        self.write()
+
+    def write(self):
+        if self.written == self.data:
+            self.skipped += 1
+            return
+        self.buffer.write(self.data)
+        self.written = bytes(self.data)
+        self.writes += 1
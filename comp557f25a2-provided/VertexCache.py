@@ -0,0 +1,103 @@
+import numpy as np
+
+cache_size = 16  # entries of the FIFO post-transform vertex cache that the triangle order is tuned for
+
+
+def acmr(faces: np.ndarray, size: int = cache_size) -> float:
+    ''' average cache miss ratio: vertices transformed per triangle when the (F,3) triangles are drawn in order
+    through a FIFO post-transform cache of the given size (0.5 is the best possible for large meshes, 3 the worst) '''
+    faces = np.asarray(faces).reshape(-1, 3)
+    if faces.shape[0] == 0:
+        return 0.0
+    entered = {}  # vertex -> number of misses when it entered the cache
+    misses = 0
+    for v in faces.reshape(-1).tolist():
+        if misses - entered.get(v, -size - 1) > size:
+            entered[v] = misses
+            misses += 1
+    return misses / faces.shape[0]
+
+
+def tipsify(faces: np.ndarray, vertex_count: int, size: int = cache_size) -> tuple:
+    ''' order of the (F,3) triangles for the post-transform vertex cache (Tipsify, Sander et al. 2007): fan around
+    one vertex at a time, and move to the vertex of the last triangles that will still be in the cache after its
+    remaining triangles are drawn, or back along the dead-end stack. Returns the triangle order and the start of
+    each cluster: a new cluster begins whenever the order has to jump out of the cache. '''
+    faces = np.asarray(faces).reshape(-1, 3)
+    flat = faces.reshape(-1)
+    order = np.argsort(flat, kind='stable')
+    offsets = np.searchsorted(flat[order], np.arange(vertex_count + 1)).tolist()
+    adjacent = (order // 3).tolist()
+    corners = faces.tolist()
+    live = np.bincount(flat, minlength=vertex_count).tolist()
+    stamp = [-size - 1] * vertex_count  # when each vertex entered the cache
+    emitted = [False] * faces.shape[0]
+    dead_end = []
+    out, clusters = [], []
+    time, cursor, fan = size + 1, 0, 0
+    while fan >= 0:
+        candidates = []
+        for t in adjacent[offsets[fan]:offsets[fan + 1]]:
+            if emitted[t]:
+                continue
+            emitted[t] = True
+            out.append(t)
+            for v in corners[t]:
+                dead_end.append(v)
+                candidates.append(v)
+                live[v] -= 1
+                if time - stamp[v] > size:
+                    stamp[v] = time
+                    time += 1
+
+        # the candidate that stays in the cache with its remaining triangles, and entered it first
+        fan, best = -1, -1
+        for v in candidates:
+            if live[v] > 0:
+                priority = time - stamp[v] if time - stamp[v] + 2 * live[v] <= size else 0
+                if priority > best:
+                    fan, best = v, priority
+        if fan < 0:
+            while dead_end and fan < 0:
+                v = dead_end.pop()
+                fan = v if live[v] > 0 else -1
+            while fan < 0 and cursor < vertex_count:
+                fan = cursor if live[cursor] > 0 else -1
+                cursor += 1
+            clusters.append(len(out))
+    return np.array(out, dtype='i8'), np.unique([0] + clusters[:-1]).astype('i8')
+
+
+def sort_clusters(positions: np.ndarray, faces: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    ''' order of the (F,3) triangles with the clusters starting at starts sorted for less overdraw: clusters that
+    face away from the centre of the mesh first, as they are more likely to hide the others from any direction
+    (the view independent sort of Sander et al. 2007) '''
+    corners = positions[faces]
+    normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])  # area weighted
+    centers = corners.mean(axis=1)
+    center = np.sum(centers * np.linalg.norm(normals, axis=1)[:, None], axis=0) / max(np.linalg.norm(normals, axis=1).sum(), 1e-30)
+    cluster = np.cumsum(np.isin(np.arange(faces.shape[0]), starts)) - 1
+    k = starts.shape[0]
+    cluster_normal = np.zeros((k, 3))
+    cluster_center = np.zeros((k, 3))
+    np.add.at(cluster_normal, cluster, normals)
+    np.add.at(cluster_center, cluster, centers)
+    cluster_center /= np.bincount(cluster, minlength=k)[:, None]
+    outward = np.einsum('ij,ij->i', cluster_center - center, cluster_normal)
+    return np.argsort(-outward[cluster], kind='stable')
+
+
+def optimize_mesh(positions: np.ndarray, faces: np.ndarray, normals: np.ndarray) -> tuple:
+    ''' the mesh with its triangles in vertex cache and overdraw order, and its vertices numbered in the order
+    the triangles first use them (so that they are fetched from memory in order), as positions, faces, normals '''
+    faces = np.asarray(faces).reshape(-1, 3)
+    if faces.shape[0] == 0:
+        return positions, faces, normals
+    order, starts = tipsify(faces, positions.shape[0])
+    faces = faces[order]
+    faces = faces[sort_clusters(positions, faces, starts)]
+    used, first = np.unique(faces.reshape(-1), return_index=True)
+    vertex_order = np.concatenate([used[np.argsort(first)], np.setdiff1d(np.arange(positions.shape[0]), used)])
+    remap = np.empty(positions.shape[0], dtype='i8')
+    remap[vertex_order] = np.arange(positions.shape[0])
+    return positions[vertex_order], remap[faces].astype(faces.dtype), normals[vertex_order]
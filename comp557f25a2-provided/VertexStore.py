@@ -0,0 +1,51 @@
+import numpy as np
+
+
+class VertexStore:
+    ''' Contiguous float32 xyz positions of all scene vertices, with a (start, stop) range for each object.
+    The storage grows geometrically, so appending an object costs amortized O(1) per vertex and the
+    total load time and peak memory stay linear in the size of the scene.
+    Views returned by this class share memory with the store; they are invalidated by a later append
+    that needs to grow the storage, so ask for them again after loading. '''
+    def __init__(self, capacity: int = 1024):
+        self._data = np.empty((max(capacity, 1), 3), dtype='f4')
+        self._size = 0
+        self.ranges = {}  # object name -> (start, stop) rows in the store
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def nbytes(self) -> int:
+        ''' bytes used by the stored vertices (not counting spare capacity) '''
+        return self._size * self._data.itemsize * 3
+
+    def reserve(self, count: int):
+        ''' make sure there is room for count vertices in total without growing again '''
+        if count > self._data.shape[0]:
+            data = np.empty((count, 3), dtype='f4')
+            data[:self._size] = self._data[:self._size]
+            self._data = data
+
+    def append(self, name: str, verts: np.ndarray) -> tuple:
+        ''' append the (N,3) vertices of an object and return its (start, stop) range '''
+        if name in self.ranges:
+            raise ValueError(f"object '{name}' is already in the vertex store")
+        verts = np.asarray(verts).reshape(-1, 3)
+        start = self._size
+        stop = start + verts.shape[0]
+        if stop > self._data.shape[0]:
+            self.reserve(max(stop, 2 * self._data.shape[0]))
+        self._data[start:stop] = verts
+        self._size = stop
+        self.ranges[name] = (start, stop)
+        return start, stop
+
+    def object_verts(self, name: str) -> np.ndarray:
+        ''' return an (N,3) view of the vertices of one object '''
+        start, stop = self.ranges[name]
+        return self._data[start:stop]
+
+    def all_verts(self) -> np.ndarray:
+        ''' return an (N,3) view of all vertices in the store '''
+        return self._data[:self._size]
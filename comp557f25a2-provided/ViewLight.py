@@ -1,33 +1,43 @@
 import moderngl as mgl
 from pyglm import glm
-from Scene import Scene, Camera
+from Scene import Scene, Camera, shading_controls
 
 class ViewLight():
+	controls_read = shading_controls + ('manual_light_fov', 'light_view_fov', 'focus_light_frustum')  # the view is drawn again when these change
+
 	def __init__(self, scene: Scene, camera: Camera, ctx: mgl.Context):
 		self.scene = scene
 		self.camera = camera
 		self.ctx = ctx
 
-	def paintGL(self, aspect_ratio: float):		
-		self.ctx.clear(0,0,0)
-		self.ctx.enable(mgl.DEPTH_TEST)
-		
-		# set up projection and view matrix for the light view	
-		self.camera.V = glm.translate(glm.mat4(1), glm.vec3(0, 0, -self.camera.distance)) * self.camera.R		
+	def cameras_read(self) -> list:
+		''' cameras whose changes need this view to be drawn again '''
+		return [self.camera]
+
+	def update_camera(self, aspect_ratio: float):
+		''' set up projection and view matrix for the light view (needed by the shadow pass before any view is drawn) '''
 		n, f = self.scene.compute_nf_from_view(self.camera.V)
 		if self.scene.controls.manual_light_fov:
 			fov = glm.radians(self.scene.controls.light_view_fov)
-			self.camera.P = glm.perspective(fov, aspect_ratio, n, f)
+			self.camera.set_perspective(fov, aspect_ratio, n, f)
+		elif self.scene.controls.focus_light_frustum:
+			self.camera.set_frustum(*self.scene.compute_focused_frustum(self.camera.V, n, f))
 		else:
 			l,r,b,t = self.scene.compute_lrbt_for_projection(self.camera.V, n, f)
-			self.camera.P = glm.frustum(l,r,b,t,n,f)
+			self.camera.set_frustum(l,r,b,t,n,f)
+
+	def paintGL(self, aspect_ratio: float):		
+		self.ctx.clear(0,0,0)
+		self.ctx.enable(mgl.DEPTH_TEST)
+		
+		self.update_camera(aspect_ratio)
 		
-		cam_mvp = self.camera.P * self.camera.V 
+		cam_mvp = self.camera.PV
 		cam_mv = self.camera.V 
 
-		self.scene.prog_shadow_map['u_mv'].write(cam_mv)
-		self.scene.prog_shadow_map['u_mvp'].write(cam_mvp)
-		self.scene.prog_shadow_map['u_light_pos'].write( glm.vec3(0,0,0) ) # light is at the origin in the light view
-		self.scene.prog_shadow_map['u_use_shadow_map'] = False # disable shadow map when rendering from light
-		self.scene.render_for_view()
-		self.scene.prog_shadow_map['u_use_shadow_map'] = self.scene.controls.use_shadow_map
\ No newline at end of file
+		self.scene.set_view_uniforms(cam_mv, cam_mvp, glm.vec3(0,0,0)) # light is at the origin in the light view
+		self.scene.uniforms['u_use_lighting'] = True  # set here too, as the view before this one may not have been drawn
+		self.scene.uniforms['u_use_shadow_map'] = False # disable shadow map when rendering from light
+		levels = self.scene.lod_levels(self.camera.V, self.camera.P)
+		self.scene.render_for_view(mvp=cam_mvp, pass_name='light', levels=levels)
+		self.scene.uniforms['u_use_shadow_map'] = self.scene.controls.use_shadow_map
\ No newline at end of file
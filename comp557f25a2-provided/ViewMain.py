@@ -1,33 +1,40 @@
 import moderngl as mgl
 from pyglm import glm
-from Scene import Scene, Camera
+from Scene import Scene, Camera, shading_controls
 
 
 class ViewMain():
+    controls_read = shading_controls + ('main_view_fov', 'cheap_shadows')  # the view is drawn again when these change
+
     def __init__(self, scene: Scene, camera: Camera, ctx: mgl.Context):
         self.scene = scene
         self.camera = camera
         self.ctx = ctx
 
+    def cameras_read(self) -> list:
+        ''' cameras whose changes need this view to be drawn again '''
+        return [self.camera, self.scene.light_view_camera]
+
+    def update_camera(self, aspect_ratio: float):
+        ''' set up projection and view matrix for the main camera view (the shadow pass may cull to this view) '''
+        fov = glm.radians(self.scene.controls.main_view_fov)
+        n, f = self.scene.compute_nf_from_view(self.camera.V)
+        self.camera.set_perspective(fov, aspect_ratio, n, f)
+
     def paintGL(self, aspect_ratio: float):
         self.ctx.clear(0, 0, 0)
         self.ctx.enable(mgl.DEPTH_TEST)
 
-        # set up projection and view matrix for the main camera vew
-        fov = glm.radians(self.scene.controls.main_view_fov)
-        self.camera.V = glm.translate(glm.mat4(1), glm.vec3(0, 0, -self.camera.distance)) * self.camera.R
-        n, f = self.scene.compute_nf_from_view(self.camera.V)
-        self.camera.P = glm.perspective(fov, aspect_ratio, n, f)
+        self.update_camera(aspect_ratio)
 
-        cam_mvp = self.camera.P * self.camera.V
+        cam_mvp = self.camera.PV
         cam_mv = self.camera.V
 
-        self.scene.prog_shadow_map['u_mv'].write(cam_mv)
-        self.scene.prog_shadow_map['u_mvp'].write(cam_mvp)
         light_pos = self.scene.get_light_pos_in_view(self.camera.V)
-        self.scene.prog_shadow_map['u_light_pos'].write(light_pos)
-        self.scene.prog_shadow_map['u_use_lighting'] = True
-        self.scene.render_for_view()
+        self.scene.set_view_uniforms(cam_mv, cam_mvp, light_pos)
+        self.scene.uniforms['u_use_lighting'] = True
+        levels = self.scene.lod_levels(self.camera.V, self.camera.P)
+        self.scene.render_for_view(mvp=cam_mvp, pass_name='main', levels=levels)
 
         if self.scene.controls.cheap_shadows:
             # TODO: OBJECTIVE: Implement cheap shadows
@@ -76,10 +83,10 @@ class ViewMain():
 
             cheap_shadow_modelling_transformation = V @ P @ glm.inverse(V)  # TODO: compute the appropriate matrix
 
-            cam_mvp = self.camera.P * self.camera.V * cheap_shadow_modelling_transformation
-            self.scene.prog_shadow_map['u_mvp'].write(cam_mvp)
-            self.scene.prog_shadow_map['u_use_lighting'] = False
-            self.scene.prog_shadow_map['u_use_shadow_map'] = False
-            self.scene.render_cheap_shadows()
-            self.scene.prog_shadow_map['u_use_lighting'] = True
-            self.scene.prog_shadow_map['u_use_shadow_map'] = self.scene.controls.use_shadow_map
+            cam_mvp = self.camera.PV * cheap_shadow_modelling_transformation
+            self.scene.set_mvp(cam_mvp)
+            self.scene.uniforms['u_use_lighting'] = False
+            self.scene.uniforms['u_use_shadow_map'] = False
+            self.scene.render_cheap_shadows(mvp=cam_mvp, levels=levels)
+            self.scene.uniforms['u_use_lighting'] = True
+            self.scene.uniforms['u_use_shadow_map'] = self.scene.controls.use_shadow_map
@@ -1,82 +1,56 @@
+import time
 import moderngl as mgl
 from pyglm import glm
 from Scene import Scene	
-from ViewSecond import ViewSecond
-from ViewMain import ViewMain
-from ViewLight import ViewLight
-from ViewPostPerspective import ViewPostPerspective
+from SceneRenderer import SceneRenderer
 
-from PyQt5 import QtOpenGL
+from PyQt5 import QtOpenGL, QtCore
 
 class QGLViewSceneControlWidget(QtOpenGL.QGLWidget):
-    """ OpenGL widget for rendering the scene with 4 different views and a control panel """
+    """ OpenGL widget for rendering the scene with 4 different views and a control panel.
+    The widget only repaints on demand: input events and control changes call request_repaint, which
+    schedules a single repaint, no more often than max_fps frames per second (None for no cap). """
 
-    def __init__(self):
+    def __init__(self, max_fps: float = 60):
         fmt = QtOpenGL.QGLFormat()
         fmt.setVersion(3, 3)
         fmt.setProfile(QtOpenGL.QGLFormat.CoreProfile)
         fmt.setSampleBuffers(True)
         super(QGLViewSceneControlWidget, self).__init__(fmt, None)
         self.scene = Scene()
+        self.renderer = SceneRenderer(self.scene, samples=4)  # the view targets are multisampled like the window
+        self.min_frame_interval = 1 / max_fps if max_fps else 0
+        self.last_paint_time = 0
+        self.repaint_timer = QtCore.QTimer(self)
+        self.repaint_timer.setSingleShot(True)
+        self.repaint_timer.timeout.connect(self.update)
+        self.scene.controls.add_listener(self.request_repaint)
         
     def initializeGL(self):
         self.ctx = mgl.create_context()
-        self.scene.initGL(self.ctx)
-        self.ctx.disable(mgl.CULL_FACE)  # have thin non-closed objets, so disable culling by default
-        self.ctx.enable(mgl.DEPTH_TEST)  # always use depth test!
-        self.views = [
-            ViewMain(self.scene, self.scene.cameras[0], self.ctx),
-            ViewLight(self.scene, self.scene.cameras[1], self.ctx),
-            ViewSecond(self.scene, self.scene.cameras[2], self.ctx),
-            ViewPostPerspective(self.scene, self.scene.cameras[3], self.ctx)
-        ]
+        self.renderer.initGL(self.ctx)
 
     def paintGL(self):
+        self.last_paint_time = time.perf_counter()
+        self.renderer.render()
 
-        # Draw the shadow pass first!
-        self.scene.render_shadow_pass()
-
-        # Set some GLSL program parameters for everyone based on the scene controls
-        self.scene.prog_shadow_map['u_use_bias'] = self.scene.controls.use_depth_bias
-        self.scene.prog_shadow_map['u_bias_slope_factor'] = self.scene.controls.bias_slope_factor
-        self.scene.texture.set_filter(self.scene.controls.use_linear_filter)
-        self.scene.prog_shadow_map['u_draw_depth'] = self.scene.controls.draw_depth         # draw depth to light instead of colour
-        self.scene.prog_shadow_map['u_draw_depth_map'] = self.scene.controls.draw_depth_map # draw the shadow map depth instead of colour
-        self.scene.prog_shadow_map['u_use_shadow_map'] = self.scene.controls.use_shadow_map # enable use of the shadow map
-        # We use a scissor test to restrict clearing and drawing to each desired viewport
-        self.ctx.scissor = self.ctx.viewport = (0, 0, self.w, self.h) # whole window
-        self.ctx.clear(1,1,1) # clear the whole drawing surface
-        for v in range(4):
-            self.ctx.viewport = self.ctx.scissor = self.view_ports[v]        
-            self.views[v].paintGL( self.aspect_ratio ) 
+    def request_repaint(self):
+        ''' the scene changed, so schedule one repaint (now, or when the frame rate cap allows) '''
+        if self.repaint_timer.isActive():
+            return  # a repaint is already scheduled, and it will show this change too
+        wait = self.last_paint_time + self.min_frame_interval - time.perf_counter()
+        if wait > 0:
+            self.repaint_timer.start(int(wait * 1000) + 1)
+        else:
+            self.update()  # Qt merges several update() calls before the next paint into one
 
     def resizeGL(self, w, h):
         ''' recompute the 4 viewports on window resize '''
-        self.w = w
-        self.h = h
-        # Given the current window size, define 4 viewports that leave a small border between them
-        border = 4 # must be an even number of pixels
-        hw = int(self.w/2)
-        hh = int(self.h/2)
-        w = hw - 1.5*border; h = hh - 1.5*border; 
-        self.view_ports = [
-            (border, hh + border/2, w, h),  # top-left
-            (hw + border/2, hh + border/2, w, h),  # top-right
-            (border, border, w, h),  # bottom-left
-            (hw + border/2, border, w, h)  # bottom-right
-        ]
-        self.aspect_ratio = w/h  # aspect ratio of each of the baby viewports
+        self.renderer.resize(w, h)
 
     def get_quadrant(self, x, y):
         ''' return the quadrant (0,1,2,3) for the given x,y mouse position '''
-        if x < self.w/2 and y < self.h/2:
-            return 0
-        elif x >= self.w/2 and y < self.h/2:
-            return 1 
-        elif x < self.w/2 and y >= self.h/2:
-            return 2 
-        else:
-            return 3 
+        return self.renderer.get_quadrant(x, y)
 
     def mousePressEvent(self, event):
         ''' remember the last mouse position and which quadrant we are in '''
@@ -90,8 +64,10 @@ class QGLViewSceneControlWidget(QtOpenGL.QGLWidget):
         ry = glm.rotate(glm.mat4(1), (new_x - self.last_mouse_pos[0]) * 0.01, glm.vec3(0, 1, 0))
         self.scene.cameras[self.quadrant].R = ry * rx * self.scene.cameras[self.quadrant].R
         self.last_mouse_pos = (new_x, new_y)
+        self.request_repaint()
 
     def wheelEvent(self, event):        
         ''' zoom the camera corresponding to the quadrant we are in '''
         mult = event.angleDelta().y() / 120
-        self.scene.cameras[self.get_quadrant( event.x(), event.y())].update_cam_distance(mult)
\ No newline at end of file
+        self.scene.cameras[self.get_quadrant( event.x(), event.y())].update_cam_distance(mult)
+        self.request_repaint()
\ No newline at end of file
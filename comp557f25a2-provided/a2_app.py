@@ -1,6 +1,8 @@
+import sys
 from PyQt5.QtCore import QTimer
 from PyQt5.QtWidgets import QWidget, QHBoxLayout, QVBoxLayout, QApplication, QLabel
 from ViewSceneControlWidget import QGLViewSceneControlWidget
+QApplication.setStyle("Fusion")
 
 #Name: Shuran, Cui
 #ID: 261275097
@@ -35,9 +37,11 @@ class ShadowMappingApplication(QWidget):
 
         self.setLayout(main_layout)
 
-        self.anim_timer = QTimer()
-        self.anim_timer.timeout.connect(self.timer_update)
-        self.anim_timer.start(16)
+        # the views repaint on demand when something changes; --continuous repaints every 16 ms instead
+        if '--continuous' in sys.argv:
+            self.anim_timer = QTimer()
+            self.anim_timer.timeout.connect(self.timer_update)
+            self.anim_timer.start(16)
 
     def keyPressEvent(self, event):
         self.view_grid.scene.controls.keyEvent(event)
@@ -0,0 +1,85 @@
+''' BVH build time and query throughput against brute force, for scenes of k copies of the data meshes:
+building the triangle hierarchies (from scratch, and from the arrays saved with the meshes), shadow rays from
+random points to the light (SceneBVH.occluded against testing every triangle), view frustum object queries,
+and near/far fitting (SceneBVH.depth_range against all vertices and the convex hull of SceneBounds).
+Brute force ray casting is timed on a subset of the rays. Rendering is headless (only used to load the scene).
+
+    python benchmarks/bench_bvh.py [rays] [--software]
+'''
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import glm
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from Headless import HeadlessRenderer  # noqa: E402
+from BVH import MeshBVH, intersect_triangles  # noqa: E402
+from Culling import boxes_in_frustum  # noqa: E402
+from SceneBounds import mat4_to_np  # noqa: E402
+from bench_frame_passes import add_copies  # noqa: E402
+
+
+def seconds(fn, repeat: int = 1) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def brute_occluded(scene, origins: np.ndarray, dirs: np.ndarray, chunk: int = 16) -> np.ndarray:
+    ''' test every ray against every triangle of the scene '''
+    corners = np.concatenate([mesh.positions[mesh.triangles] for mesh in scene.bvh.meshes])
+    blocked = np.zeros(origins.shape[0], dtype=bool)
+    for i in range(0, origins.shape[0], chunk):
+        o, d = origins[i:i + chunk], dirs[i:i + chunk]
+        k = o.shape[0]
+        t = intersect_triangles(np.repeat(o, corners.shape[0], 0), np.repeat(d, corners.shape[0], 0),
+                                *(np.tile(corners[:, j], (k, 1)) for j in range(3))).reshape(k, -1)
+        blocked[i:i + chunk] = np.any((t >= 1e-4) & (t <= 1), axis=1)
+    return blocked
+
+
+def main():
+    rays = int(sys.argv[1]) if len(sys.argv) > 1 and sys.argv[1].isdigit() else 10000
+    rng = np.random.default_rng(0)
+    print(f"{'copies':>6} {'triangles':>9} {'build ms':>9} {'load ms':>8} {'bvh rays/s':>11} {'brute rays/s':>13} "
+          f"{'frustum us':>11} {'flat us':>8} {'nf bvh us':>10} {'nf all us':>10} {'nf hull us':>11}")
+    for copies in (1, 16, 64):
+        headless = HeadlessRenderer(64, 36, software='--software' in sys.argv)
+        add_copies(headless, copies)
+        scene = headless.scene
+        bvh = scene.bvh
+        triangles = sum(mesh.triangles.shape[0] for mesh in bvh.meshes)
+        build = seconds(lambda: [MeshBVH(mesh.positions, mesh.triangles) for mesh in bvh.meshes])
+        arrays = [mesh.bvh.arrays for mesh in bvh.meshes]
+        load = seconds(lambda: [MeshBVH(mesh.positions, mesh.triangles, a) for mesh, a in zip(bvh.meshes, arrays)])
+
+        # shadow rays from random points above the ground of the whole grid
+        lo, hi = scene.geometry.box_min.min(axis=0), scene.geometry.box_max.max(axis=0)
+        points = rng.uniform(lo, hi, (rays, 3)).astype('f4')
+        to_light = np.asarray(glm.vec3(scene.get_light_pos_in_world()), dtype='f4') - points
+        bvh.objects  # build the object level before timing
+        bvh_time = seconds(lambda: bvh.occluded(points, to_light, 1e-4, 1.0))
+        subset = max(rays // max(copies * 4, 1), 16)
+        brute_time = seconds(lambda: brute_occluded(scene, points[:subset], to_light[:subset]))
+        assert np.array_equal(bvh.occluded(points[:subset], to_light[:subset], 1e-4, 1.0),
+                              brute_occluded(scene, points[:subset], to_light[:subset]))
+
+        PV, V = scene.main_view_camera.PV, scene.main_view_camera.V
+        frustum = seconds(lambda: bvh.frustum_objects(PV), 200)
+        flat = seconds(lambda: boxes_in_frustum(scene.geometry.box_min, scene.geometry.box_max, PV), 200)
+        A = mat4_to_np(V)
+        verts = scene.vertex_store.all_verts()
+        nf_bvh = seconds(lambda: bvh.depth_range(V), 50)
+        nf_all = seconds(lambda: (lambda z: (z.min(), z.max()))(verts @ A[2, :3]), 50)
+        nf_hull = seconds(lambda: scene.bounds.compute_nf(V), 50)
+        print(f'{copies:>6} {triangles:>9} {build * 1e3:>9.1f} {load * 1e3:>8.1f} {rays / bvh_time:>11.0f} '
+              f'{subset / brute_time:>13.0f} {frustum * 1e6:>11.1f} {flat * 1e6:>8.1f} {nf_bvh * 1e6:>10.1f} '
+              f'{nf_all * 1e6:>10.1f} {nf_hull * 1e6:>11.1f}')
+        headless.ctx.release()
+
+
+if __name__ == '__main__':
+    main()
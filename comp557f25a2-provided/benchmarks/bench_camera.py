@@ -0,0 +1,48 @@
+''' Matrix inversions per frame, counted by wrapping glm.inverse, while nothing moves and while the main camera
+and the light are rotated a little every frame. All 4 views are drawn every frame (the view cache is off).
+Rendering is headless.
+
+    python benchmarks/bench_camera.py [frames] [--software]
+'''
+import sys
+from pathlib import Path
+
+import glm
+from pyglm import glm as pyglm
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from Headless import HeadlessRenderer  # noqa: E402
+
+inversions = 0
+
+
+def counting(inverse):
+    def counted_inverse(*args):
+        global inversions
+        inversions += 1
+        return inverse(*args)
+    return counted_inverse
+
+
+def main():
+    global inversions
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 and sys.argv[1].isdigit() else 50
+    for module in {id(glm): glm, id(pyglm): pyglm}.values():  # the views import pyglm.glm, the rest glm
+        module.inverse = counting(module.inverse)
+    headless = HeadlessRenderer(320, 180, software='--software' in sys.argv)
+    headless.set_controls(cache_views=False)
+    headless.render()
+    spin = glm.rotate(0.01, glm.vec3(0, 1, 0))
+    print(f"{'moving':>8} {'inversions per frame':>21}")
+    for moving in ('nothing', 'main', 'light'):
+        inversions = 0
+        for _ in range(frames):
+            if moving != 'nothing':
+                camera = headless.scene.main_view_camera if moving == 'main' else headless.scene.light_view_camera
+                camera.R = spin * camera.R
+            headless.render()
+        print(f'{moving:>8} {inversions / frames:>21.1f}')
+
+
+if __name__ == '__main__':
+    main()
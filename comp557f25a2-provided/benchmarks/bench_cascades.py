@@ -0,0 +1,124 @@
+''' Cascaded shadow maps against the single shadow map: shadow quality and frame time.
+Quality is measured at the surface points seen through a grid of main view pixels (found by casting rays with
+the scene BVH):
+  texel/pixel  size of a shadow map texel over the size of a pixel at each point (median and 90th percentile),
+               so 1 means one texel per pixel, and larger values mean blocky shadow edges
+  error %      points where the shadow map test (read back and done on the CPU, with the nearest texel and the
+               slope bias of the shader) disagrees with a shadow ray cast to the light, among lit facing points
+Frame time is for all 4 views and the shadow pass (view and shadow caches off). Rendering is headless.
+
+    python benchmarks/bench_cascades.py [frames] [--software]
+'''
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import glm
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from Headless import HeadlessRenderer  # noqa: E402
+from Cascades import fit_cascades  # noqa: E402
+from SceneBounds import mat4_to_np  # noqa: E402
+
+configs = [(256, 1), (512, 1), (1024, 1), (256, 2), (256, 3), (256, 4), (512, 4)]  # (tile size, cascades)
+
+
+def surface_points(headless: HeadlessRenderer, grid=(160, 90)):
+    ''' the closest surface point, its normal, and its main view pixel size, through a grid of main view pixels '''
+    scene = headless.scene
+    camera = scene.main_view_camera
+    x, y = np.meshgrid((np.arange(grid[0]) + 0.5) / grid[0] * 2 - 1, (np.arange(grid[1]) + 0.5) / grid[1] * 2 - 1)
+    ndc = np.stack([x.ravel(), y.ravel()], axis=1)
+    M = mat4_to_np(camera.PV_inv)
+    ends = [np.hstack([ndc, np.full((ndc.shape[0], 1), z), np.ones((ndc.shape[0], 1))]) @ M.T for z in (-1, 1)]
+    near, far = (e[:, :3] / e[:, 3:] for e in ends)
+    t, objects, triangles = scene.bvh.intersect(near, far - near, 0, 1)
+    hit = np.isfinite(t)
+    points = near[hit] + t[hit, None] * (far - near)[hit]
+    corners = np.array([scene.bvh.meshes[k].positions[scene.bvh.meshes[k].triangles[i]]
+                        for k, i in zip(objects[hit], triangles[hit])])
+    normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+    normals /= np.linalg.norm(normals, axis=1, keepdims=True)
+    depth = -(points @ mat4_to_np(camera.V)[2, :3] + mat4_to_np(camera.V)[2, 3])
+    l, r, b, t_, n, f = camera.frustum()
+    pixel = (t_ - b) / n * depth / headless.renderer.view_ports[0][3]
+    return points, normals, depth, pixel
+
+
+def map_shadows(scene, points: np.ndarray, normals: np.ndarray, depth: np.ndarray) -> tuple:
+    ''' the shadow map test at each point (with the read back map), and the world size of its shadow map texel '''
+    light, texture = scene.light_view_camera, scene.texture
+    if texture.cascades > 1:
+        projections, far = fit_cascades(scene.main_view_camera, light, texture.cascades)
+        cascade = np.minimum(np.searchsorted(far, depth), texture.cascades - 1)
+    else:
+        projections, cascade = [light.P], np.zeros(points.shape[0], dtype=int)
+    L = mat4_to_np(light.V)
+    coords = points @ L[:3, :3].T + L[:3, 3]
+    atlas = np.frombuffer(texture.tex_depth.read(), dtype='f4').reshape(texture.tex_depth.size[1], -1)
+    texel = np.empty(points.shape[0])
+    in_map = np.empty(points.shape[0], dtype=bool)
+    for i, P in enumerate(projections):
+        sel = cascade == i
+        A = mat4_to_np(P)
+        l, r, b, t = (A[0, 2] - 1) / A[0, 0], (A[0, 2] + 1) / A[0, 0], (A[1, 2] - 1) / A[1, 1], (A[1, 2] + 1) / A[1, 1]
+        texel[sel] = max(r - l, t - b) * -coords[sel, 2] / texture.size  # near plane extents over n, times light depth
+        clip = np.hstack([points[sel], np.ones((sel.sum(), 1))]) @ (mat4_to_np(P) @ L).T
+        st = clip[:, :3] / clip[:, 3:] * 0.5 + 0.5
+        x0, y0, _, _ = texture.tile_viewport(i)
+        tx = x0 + np.clip((st[:, 0] * texture.size).astype(int), 0, texture.size - 1)
+        ty = y0 + np.clip((st[:, 1] * texture.size).astype(int), 0, texture.size - 1)
+        to_light = np.asarray(glm.vec3(scene.get_light_pos_in_world()), dtype='f4') - points[sel]
+        cos_theta = np.einsum('ij,ij->i', normals[sel], to_light) / np.linalg.norm(to_light, axis=1)
+        bias = np.clip(0.005 * np.tan(np.arccos(np.clip(np.abs(cos_theta), -1, 1))), 0, 0.01)
+        in_map[sel] = st[:, 2] - bias >= atlas[ty, tx]
+    return in_map, texel
+
+
+def ray_shadows(scene, points: np.ndarray, normals: np.ndarray) -> tuple:
+    ''' shadow rays from each point to the light, and which points face the light (or away from it) enough for
+    the shadow map test to be meaningful '''
+    to_light = np.asarray(glm.vec3(scene.get_light_pos_in_world()), dtype='f4') - points
+    facing = np.einsum('ij,ij->i', normals, to_light) / np.linalg.norm(to_light, axis=1)
+    normals = normals * np.sign(facing)[:, None]  # the side of the surface the light is on
+    lit_side = np.abs(facing) > 0.1
+    return scene.points_in_shadow(points + normals * 1e-3), lit_side
+
+
+def shadow_quality(headless: HeadlessRenderer) -> tuple:
+    ''' median and 90th percentile of texel size over pixel size, and % of points with the wrong shadow '''
+    points, normals, depth, pixel = surface_points(headless)
+    in_map, texel = map_shadows(headless.scene, points, normals, depth)
+    truth, lit_side = ray_shadows(headless.scene, points, normals)
+    ratio = texel / pixel
+    error = np.mean(in_map[lit_side] != truth[lit_side]) * 100
+    return np.median(ratio), np.percentile(ratio, 90), error
+
+
+def main():
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 and sys.argv[1].isdigit() else 20
+    print(f"{'fov':>4} {'size':>5} {'cascades':>8} {'texel MB':>9} {'texel/pixel':>12} {'p90':>6} {'error %':>8} "
+          f"{'shadow ms':>10} {'frame ms':>9}")
+    headless = HeadlessRenderer(1280, 720, software='--software' in sys.argv)
+    for fov in (20, 6):
+        for size, cascades in configs:
+            headless.set_controls(main_view_fov=fov, shadow_map_size=size, shadow_cascades=cascades,
+                                  cache_views=False, cache_shadow_map=False)
+            headless.render()
+            median, p90, error = shadow_quality(headless)
+            shadow, frame = [], []
+            for _ in range(frames):
+                start = time.perf_counter()
+                headless.scene.render_shadow_pass()
+                headless.ctx.finish()
+                shadow.append(time.perf_counter() - start)
+                start = time.perf_counter()
+                headless.render()
+                frame.append(time.perf_counter() - start)
+            print(f'{fov:>4} {size:>5} {cascades:>8} {headless.scene.texture.nbytes / 2**20:>9.2f} {median:>12.2f} '
+                  f'{p90:>6.2f} {error:>8.2f} {np.median(shadow) * 1e3:>10.2f} {np.median(frame) * 1e3:>9.2f}')
+
+
+if __name__ == '__main__':
+    main()
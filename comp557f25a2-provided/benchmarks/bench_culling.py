@@ -0,0 +1,77 @@
+''' View frustum culling: objects drawn and culled in each pass, draw calls, and frame time with culling on and
+off, for k copies of the data meshes on a grid and a wide and a narrow main view fov. All 4 views and the shadow
+pass are drawn every frame (view and shadow map caches off), with cheap shadows on. The main camera is moved
+back so that the whole grid is in front of it. Rendering is headless.
+Then shadow caster culling: depth pass objects and time with the light frustum fitted to the whole grid, with
+casters culled to the light volume only, and to the casters of what the main view sees.
+
+    python benchmarks/bench_culling.py [frames] [--software]
+'''
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import glm  # noqa: E402
+from Headless import HeadlessRenderer  # noqa: E402
+from bench_frame_passes import add_copies  # noqa: E402
+
+passes = ['shadow', 'main', 'cheap_shadows', 'light', 'third_person', 'post_projection']
+
+
+def main():
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 and sys.argv[1].isdigit() else 30
+    print(f"{'copies':>6} {'fov':>4} {'culling':>7} {'frame ms':>9} {'calls':>6} " + ' '.join(f'{p:>15}' for p in passes))
+    for copies in (16, 64):
+        headless = HeadlessRenderer(640, 360, software='--software' in sys.argv)
+        add_copies(headless, copies)
+        headless.set_camera('main', distance=60)
+        scene = headless.scene
+        for fov in (20, 5):
+            for culling in (False, True):
+                headless.set_controls(cache_views=False, cache_shadow_map=False, cheap_shadows=True,
+                                      main_view_fov=fov, use_frustum_culling=culling)
+                headless.render()
+                calls = scene.geometry.draw_calls
+                times = []
+                for _ in range(frames):
+                    start = time.perf_counter()
+                    headless.render()
+                    times.append(time.perf_counter() - start)
+                calls = (scene.geometry.draw_calls - calls) / frames
+                counts = ' '.join(f'{"%d/%d" % scene.cull_stats[p]:>15}' for p in passes)
+                print(f'{copies:>6} {fov:>4} {str(culling):>7} {np.median(times) * 1e3:>9.2f} {calls:>6.1f} {counts}')
+        headless.ctx.release()
+    print('(drawn/culled objects per pass)')
+
+    print(f"{'copies':>6} {'fov':>4} {'light':>5} {'casters':>7} {'shadow ms':>10} {'drawn/culled':>13}")
+    for copies in (16, 64):
+        headless = HeadlessRenderer(640, 360, software='--software' in sys.argv)
+        add_copies(headless, copies)
+        headless.set_camera('main', distance=60)
+        scene = headless.scene
+        for fov in (20, 5):
+            for tilt in (0, 0.5):
+                light = scene.light_view_camera
+                headless.set_camera('light', R=glm.rotate(tilt, glm.vec3(0, 1, 0)) * light.R)
+                for cull_casters in (False, True):
+                    headless.set_controls(cache_views=False, cache_shadow_map=False, manual_light_fov=False,
+                                          main_view_fov=fov, cull_shadow_casters=cull_casters)
+                    headless.render()  # sets up the cameras
+                    times = []
+                    for _ in range(frames):
+                        start = time.perf_counter()
+                        scene.render_shadow_pass()
+                        headless.ctx.finish()
+                        times.append(time.perf_counter() - start)
+                    casters = 'main' if cull_casters else 'light'
+                    print(f'{copies:>6} {fov:>4} {tilt:>5} {casters:>7} {np.median(times) * 1e3:>10.2f} '
+                          f'{"%d/%d" % scene.cull_stats["shadow"]:>13}')
+                headless.set_camera('light', R=glm.rotate(-tilt, glm.vec3(0, 1, 0)) * light.R)
+        headless.ctx.release()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+''' Overhead of capturing every frame of the data scene (1280x720, the 4 views and the shadow map depth) against
+drawing the frames only: with a synchronous Framebuffer.read of each after drawing, and with FrameCapture
+(pixel buffer objects read back 0, 1 or 2 frames later), with no writer and with the FrameWriter thread writing
+npy or png files (zlib level 6, or 1) to a temporary folder. The main camera turns a little each frame and the views and shadow map
+are not cached, so each frame draws everything. Times are per frame, over all frames up to the last file written,
+the median of 3 runs of each (taken in turns). Rendering is headless.
+
+    python benchmarks/bench_frame_capture.py [frames] [--software]
+'''
+import sys
+import tempfile
+import time
+from functools import partial
+from pathlib import Path
+
+import numpy as np
+import glm
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from Headless import HeadlessRenderer, write_png, camera_names  # noqa: E402
+from FrameCapture import FrameCapture, FrameWriter  # noqa: E402
+
+
+def read_sync(headless):
+    ''' read the views and the depth map as before FrameCapture, each with a stall '''
+    for x, y, w, h in headless.renderer.view_ports:
+        np.frombuffer(headless.fbo.read(viewport=(int(x), int(y), int(w), int(h)), components=3), dtype='u1')
+    np.frombuffer(headless.scene.texture.fbo_depth.read(components=1, attachment=-1, dtype='f4'), dtype='f4')
+
+
+def run(headless, frames: int, mode: str, latency: int = 2, encode: str = None) -> tuple:
+    ''' seconds per frame, seconds the writer spent per frame, and the waits on the writer '''
+    camera = headless.scene.cameras[0]
+    R = camera.R
+    with tempfile.TemporaryDirectory() as folder:
+        png = {'png': write_png, 'png 1': partial(write_png, level=1)}.get(encode)
+        writer = FrameWriter(folder, png) if encode else None
+        capture = FrameCapture(headless.ctx, latency, writer)
+        headless.ctx.finish()
+        start = time.perf_counter()
+        for i in range(frames):
+            camera.R = glm.rotate(0.01 * i, glm.vec3(0, 1, 0)) * R
+            if mode == 'capture':
+                headless.capture(capture, f'{i:04d}', views=True, depth_map=True)
+            else:
+                headless.fbo.use()
+                headless.renderer.render()
+                if mode == 'sync':
+                    read_sync(headless)
+        capture.close()
+        headless.ctx.finish()
+        seconds = (time.perf_counter() - start) / frames
+    camera.R = R
+    return seconds, (writer.seconds / frames if writer else 0), capture.waits
+
+
+def main():
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 and sys.argv[1].isdigit() else 30
+    headless = HeadlessRenderer(1280, 720, software='--software' in sys.argv)
+    headless.set_controls(cache_views=False, cache_shadow_map=False)
+    runs = [('draw only', 'draw', 2, None), ('sync read', 'sync', 2, None)]
+    runs += [(f'pbo latency {latency}', 'capture', latency, None) for latency in (0, 1, 2)]
+    runs += [(f'pbo latency 2 + {encode}', 'capture', 2, encode) for encode in ('npy', 'png', 'png 1')]
+    run(headless, 3, 'capture')  # warm up
+    print(f"{len(camera_names)} views and the depth map, {frames} frames")
+    results = [[run(headless, frames, mode, latency, encode) for _, mode, latency, encode in runs] for _ in range(3)]
+    print(f"{'capture':>22} {'ms/frame':>9} {'overhead ms':>12} {'writer ms':>10} {'waits':>6}")
+    base = np.median([r[0][0] for r in results])
+    for i, (label, *_) in enumerate(runs):
+        seconds, writing, waits = np.median([r[i] for r in results], axis=0)
+        print(f'{label:>22} {seconds * 1e3:>9.2f} {(seconds - base) * 1e3:>12.2f} {writing * 1e3:>10.2f} {waits:>6.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+''' Per-pass frame times: the shadow pass and each of the 4 views.
+Frames are rendered headlessly in the same sequence as QGLViewSceneControlWidget.paintGL (SceneRenderer.render).
+CPU time is measured around each pass, and GPU time with a GL timer query per pass (read back after the
+frame is finished, so the queries do not stall the pipeline in the middle of a frame).
+Sweeps the shadow map resolution, the number of copies of the scene objects, and render toggles, and
+writes the results as JSON for comparing versions.
+
+    python benchmarks/bench_frame_passes.py [--frames 100] [--out bench_frames.json] [--software]
+'''
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+
+app_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(app_dir))
+from Headless import HeadlessRenderer  # noqa: E402
+from Scene import ShadowPassStats, ground_name  # noqa: E402
+from SceneControl import SceneControl  # noqa: E402
+from SceneRenderer import view_names  # noqa: E402
+
+passes = ['shadow'] + view_names
+
+# render toggles, each applied on top of the SceneControl defaults, with shadow map caching turned off
+# so that the shadow pass is rendered (and measured) every frame, except for the shadow_cache toggle
+toggles = {
+    'default': {},
+    'linear_filter': {'use_linear_filter': True},
+    'culling': {'use_culling': True},
+    'cheap_shadows': {'cheap_shadows': True},
+    'no_depth_bias': {'use_depth_bias': False},
+    'shadow_cache': {'cache_shadow_map': True},
+    'no_frustum_culling': {'use_frustum_culling': False},
+}
+
+
+class PassTimer:
+    ''' CPU and GPU times of the named passes of a frame, one timer query per pass. '''
+    def __init__(self, ctx, names):
+        self.ctx = ctx
+        self.queries = {name: ctx.query(time=True) for name in names}
+        self.cpu = {name: [] for name in names}
+        self.gpu = {name: [] for name in names}
+        self.pending = []
+
+    @contextmanager
+    def measure(self, name: str):
+        query = self.queries[name]
+        start = time.perf_counter()
+        with query:
+            yield
+        self.cpu[name].append(time.perf_counter() - start)
+        self.pending.append(name)
+
+    def end_frame(self):
+        ''' read the GPU times of the passes of the frame that was just finished (elapsed is in ns) '''
+        for name in self.pending:
+            self.gpu[name].append(self.queries[name].elapsed * 1e-9)
+        self.pending = []
+
+
+def stats_ms(times: list) -> dict:
+    ''' summary of a list of times in seconds, in milliseconds '''
+    t = np.array(times) * 1e3
+    return {'mean': float(t.mean()), 'median': float(np.median(t)), 'p95': float(np.percentile(t, 95)),
+            'min': float(t.min()), 'max': float(t.max())}
+
+
+def add_copies(headless: HeadlessRenderer, copies: int, spacing: float = 6.0):
+    ''' add copies-1 translated copies of every object except the ground, on a grid in x and z '''
+    scene = headless.scene
+    originals = sorted(name for name in scene.object_name if name != ground_name)
+    side = int(np.ceil(np.sqrt(copies)))
+    for c in range(1, copies):
+        offset = np.array([c % side, 0, c // side], dtype='f4') * spacing
+        for name in originals:
+            mesh = scene.mesh_cache.load(app_dir / f'data/{name}.obj')
+            lods = [(p + offset, i, n, e) for p, i, n, e in mesh.lods]
+            scene.add_object(f'{name}_{c}', mesh.positions + offset, mesh.indices, mesh.normals,
+                             scene.object_colors[name], lods=lods)
+
+
+def render_frame(headless: HeadlessRenderer, timer: PassTimer):
+    ''' the sequence of SceneRenderer.render, with each pass timed '''
+    scene, renderer = headless.scene, headless.renderer
+    headless.fbo.use()
+    renderer.views[0].update_camera(renderer.aspect_ratio)
+    renderer.views[1].update_camera(renderer.aspect_ratio)
+    with timer.measure('shadow'):
+        scene.render_shadow_pass()
+    renderer.set_program_state()
+    renderer.clear()
+    for v, name in enumerate(view_names):
+        with timer.measure(name):
+            renderer.render_view(v)
+    headless.ctx.finish()
+    timer.end_frame()
+
+
+def run_config(headless: HeadlessRenderer, frames: int, warmup: int) -> dict:
+    ''' render warmup + frames frames with the current settings and return the per-pass statistics '''
+    timer = PassTimer(headless.ctx, passes)
+    frame_times = []
+    for i in range(warmup + frames):
+        if i == warmup:
+            timer = PassTimer(headless.ctx, passes)
+            frame_times = []
+        start = time.perf_counter()
+        render_frame(headless, timer)
+        frame_times.append(time.perf_counter() - start)
+    result = {
+        'frame_ms': stats_ms(frame_times),
+        'passes': {name: {'cpu_ms': stats_ms(timer.cpu[name]), 'gpu_ms': stats_ms(timer.gpu[name])} for name in passes},
+    }
+    return result
+
+
+def git_revision():
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=app_dir, capture_output=True, text=True)
+        return out.stdout.strip() or None
+    except OSError:
+        return None
+
+
+def int_list(text: str) -> list:
+    return [int(x) for x in text.split(',')]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Per-pass CPU/GPU frame times of the shadow mapping renderer.')
+    parser.add_argument('--frames', type=int, default=100, help='measured frames per configuration')
+    parser.add_argument('--warmup', type=int, default=10, help='frames rendered before measuring')
+    parser.add_argument('--size', default='1280x720', help='window size WxH')
+    parser.add_argument('--shadow-sizes', type=int_list, default=[256, 512, 1024, 2048], help='e.g., 256,1024')
+    parser.add_argument('--copies', type=int_list, default=[1, 4, 16], help='copies of the scene objects, e.g., 1,4')
+    parser.add_argument('--toggles', default=','.join(toggles), help=f'subset of {",".join(toggles)}')
+    parser.add_argument('--out', default='bench_frames.json', help='json file for the results')
+    parser.add_argument('--software', action='store_true', help='use the Mesa software rasterizer')
+    parser.add_argument('--backend', default=None, help='glcontext backend, e.g., egl')
+    args = parser.parse_args()
+
+    width, height = (int(x) for x in args.size.lower().split('x'))
+    results = []
+    meta = None
+    print(f"{'copies':>6} {'shadow':>6} {'toggle':>14} {'frame ms':>9} " + ' '.join(f'{p + " gpu ms":>22}' for p in passes))
+    for copies in args.copies:
+        headless = HeadlessRenderer(width, height, backend=args.backend, software=args.software)
+        add_copies(headless, copies)
+        if meta is None:
+            info = headless.ctx.info
+            meta = {'revision': git_revision(), 'python': platform.python_version(), 'numpy': np.__version__,
+                    'gl_renderer': info.get('GL_RENDERER'), 'gl_vendor': info.get('GL_VENDOR'),
+                    'gl_version': info.get('GL_VERSION'), 'size': [width, height],
+                    'frames': args.frames, 'warmup': args.warmup}
+        for shadow_size in args.shadow_sizes:
+            for toggle in args.toggles.split(','):
+                headless.scene.controls = SceneControl()
+                headless.set_controls(**{'cache_shadow_map': False, 'shadow_map_size': shadow_size, **toggles[toggle]})
+                headless.scene.shadow_stats = ShadowPassStats()
+                result = run_config(headless, args.frames, args.warmup)
+                result['shadow_stats'] = headless.scene.shadow_stats.as_dict()
+                result.update({'copies': copies, 'objects': len(headless.scene.object_name),
+                               'verts': len(headless.scene.vertex_store), 'shadow_size': shadow_size,
+                               'toggle': toggle, 'controls': toggles[toggle]})
+                results.append(result)
+                print(f"{copies:>6} {shadow_size:>6} {toggle:>14} {result['frame_ms']['median']:>9.2f} "
+                      + ' '.join(f"{result['passes'][p]['gpu_ms']['median']:>22.3f}" for p in passes))
+        headless.ctx.release()
+
+    Path(args.out).write_text(json.dumps({'meta': meta, 'results': results}, indent=1))
+    print(f'wrote {args.out}')
+
+
+if __name__ == '__main__':
+    main()
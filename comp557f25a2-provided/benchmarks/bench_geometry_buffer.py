@@ -0,0 +1,85 @@
+''' GPU memory, draw calls, and draw time of the scene geometry: the previous layout (per object, a position and
+index buffer for each of the shading and depth vertex arrays, plus a normal buffer, and one draw call with a
+u_color write per object) against the merged GeometryBuffer of Scene, for k copies of the data meshes.
+Rendering is headless; draw time is for one shading and one depth draw of all objects, including a glFinish.
+
+    python benchmarks/bench_geometry_buffer.py [--software]
+'''
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import moderngl as mgl
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from Headless import create_headless_context  # noqa: E402
+from Scene import Scene, make_vao  # noqa: E402
+
+data_dir = Path(__file__).resolve().parent.parent / 'data'
+
+
+def time_ms(fn, ctx, repeat: int = 50) -> float:
+    fn()
+    ctx.finish()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    ctx.finish()
+    return (time.perf_counter() - start) / repeat * 1e3
+
+
+def main():
+    ctx = create_headless_context(software='--software' in sys.argv)
+    fbo = ctx.framebuffer(color_attachments=[ctx.renderbuffer((640, 360))], depth_attachment=ctx.depth_renderbuffer((640, 360)))
+    fbo.use()
+    ctx.enable(mgl.DEPTH_TEST)
+    print(f"{'copies':>6} {'objects':>7} {'old MB':>7} {'new MB':>7} {'old calls':>9} {'new calls':>9} {'old ms':>7} {'new ms':>7}")
+    for copies in (1, 4, 16, 64):
+        scene = Scene()
+        scene.initGL(ctx)
+        meshes = {name: scene.mesh_cache.load(data_dir / f'{name}.obj') for name in sorted(scene.object_name)}
+        side = int(np.ceil(np.sqrt(copies)))
+        for c in range(1, copies):
+            offset = np.array([c % side, 0, c // side], dtype='f4') * 6.0
+            for name, mesh in meshes.items():
+                scene.add_object(f'{name}_{c}', mesh.positions + offset, mesh.indices, mesh.normals, scene.object_colors[name])
+
+        # the previous layout, built from the same meshes, with the program that branches on uniforms as before
+        prog = scene.shading_variants.program('BRANCHING')
+        old_shading, old_depth, old_bytes = [], [], 0
+        for c in range(copies):
+            offset = np.array([c % side, 0, c // side], dtype='f4') * 6.0
+            for name, mesh in meshes.items():
+                verts = mesh.positions + offset
+                old_shading.append((scene.object_colors[name], make_vao(ctx, prog, verts, mesh.indices, mesh.normals, mode=mgl.TRIANGLES)))
+                old_depth.append(make_vao(ctx, scene.prog_depth, verts, mesh.indices, normals=None, mode=mgl.TRIANGLES))
+                old_bytes += verts.size * 4 * 3 + mesh.indices.size * 4 * 2  # 2 position buffers, normals, 2 index buffers
+
+        def draw_old():
+            for color, vao in old_shading:
+                prog['u_color'] = color
+                vao.render()
+            for vao in old_depth:
+                vao.render()
+
+        def draw_new():
+            scene.render_for_view()
+            scene.render_for_shadow_map()
+
+        t_old = time_ms(draw_old, ctx)
+        scene.geometry.draw_calls = 0
+        t_new = time_ms(draw_new, ctx)
+        new_calls = scene.geometry.draw_calls // 51  # time_ms draws once more before timing
+        objects = len(scene.object_name)
+        print(f'{copies:>6} {objects:>7} {old_bytes / 2**20:>7.2f} {scene.geometry.nbytes / 2**20:>7.2f} '
+              f'{2 * objects:>9} {new_calls:>9} {t_old:>7.2f} {t_new:>7.2f}')
+        for _, vao in old_shading:
+            vao.release()
+        for vao in old_depth:
+            vao.release()
+        scene.geometry.release()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+''' Idle CPU use of the Qt application, with the old fixed 16 ms repaint timer (a2_app.py --continuous)
+and with on-demand repaints. The app is started, left to settle, and then its CPU time (user + system,
+read from /proc, so Linux only) is measured while nobody touches it. Needs a display (or a virtual one).
+
+    python benchmarks/bench_idle_cpu.py [seconds]
+'''
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+app = Path(__file__).resolve().parent.parent / 'a2_app.py'
+ticks_per_second = os.sysconf('SC_CLK_TCK')
+
+
+def cpu_seconds(pid: int) -> float:
+    ''' user + system CPU time of a process so far '''
+    stat = Path(f'/proc/{pid}/stat').read_text()
+    fields = stat[stat.rindex(')') + 2:].split()  # skip the pid and the command name, which may contain spaces
+    return (int(fields[11]) + int(fields[12])) / ticks_per_second
+
+
+def idle_cpu(args: list, seconds: float, settle: float = 3.0) -> float:
+    ''' fraction of a core used by the app while idle '''
+    proc = subprocess.Popen([sys.executable, str(app)] + args, cwd=app.parent)
+    try:
+        time.sleep(settle)
+        if proc.poll() is not None:
+            raise RuntimeError(f'a2_app.py exited with code {proc.returncode}')
+        start_cpu, start = cpu_seconds(proc.pid), time.perf_counter()
+        time.sleep(seconds)
+        return (cpu_seconds(proc.pid) - start_cpu) / (time.perf_counter() - start)
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 10.0
+    for label, args in (('16 ms timer', ['--continuous']), ('on demand', [])):
+        print(f'{label:>12}: {idle_cpu(args, seconds) * 100:6.1f} % of a core')
+
+
+if __name__ == '__main__':
+    main()
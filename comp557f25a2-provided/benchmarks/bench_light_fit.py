@@ -0,0 +1,87 @@
+''' Light frustum fitted to the whole scene against fitted to what the main view sees (focused, with and without
+snapping to texels), for each shadow map size, in the data scene and in k copies of it seen from further back:
+  coverage %   shadow map texels (a grid of samples) whose light ray hits a surface point the main view sees
+  texel/pixel  size of a shadow map texel over the size of a main view pixel at the surface points the main view
+               sees (median), and % of these points with the wrong shadow (as in bench_cascades.py)
+  shimmer %    points whose shadow test changes from one frame to the next as the main camera turns slowly
+Frame time is for all 4 views and the shadow pass (view and shadow caches off). Rendering is headless.
+
+    python benchmarks/bench_light_fit.py [frames] [--software]
+'''
+import sys
+import time
+from functools import partial
+from pathlib import Path
+
+import numpy as np
+import glm
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from Headless import HeadlessRenderer  # noqa: E402
+from Scene import Scene  # noqa: E402
+from SceneBounds import mat4_to_np  # noqa: E402
+from bench_frame_passes import add_copies  # noqa: E402
+from bench_cascades import surface_points, map_shadows, ray_shadows  # noqa: E402
+
+modes = {'scene': dict(focus_light_frustum=False), 'focused': dict(focus_light_frustum=True),
+         'unsnapped': dict(focus_light_frustum=True)}
+
+
+def texel_coverage(scene, samples: int = 128) -> float:
+    ''' % of a grid of samples over the shadow map whose light ray hits a point the main view sees '''
+    light, camera = scene.light_view_camera, scene.main_view_camera
+    l, r, b, t, n, f = light.frustum()
+    u = (np.arange(samples) + 0.5) / samples
+    x, y = np.meshgrid(l + (r - l) * u, b + (t - b) * u)
+    near = np.stack([x.ravel(), y.ravel(), np.full(x.size, -n), np.ones(x.size)], axis=1) @ mat4_to_np(light.V_inv).T
+    origin = np.asarray(glm.vec3(light.position), dtype='f4')
+    t_hit, _, _ = scene.bvh.intersect(np.broadcast_to(origin, (x.size, 3)), near[:, :3] - origin)
+    points = (origin + t_hit[np.isfinite(t_hit), None] * (near[np.isfinite(t_hit), :3] - origin)).astype('f4')
+    clip = np.hstack([points, np.ones((points.shape[0], 1))]) @ mat4_to_np(camera.PV).T
+    in_view = np.all(np.abs(clip[:, :3]) <= clip[:, 3:], axis=1)
+    eye = np.asarray(glm.vec3(camera.position), dtype='f4')
+    seen = in_view & ~scene.bvh.occluded(np.broadcast_to(eye, points.shape), points - eye, 0, 1 - 1e-4)
+    return np.count_nonzero(seen) / x.size * 100
+
+
+def main():
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 and sys.argv[1].isdigit() else 10
+    print(f"{'copies':>6} {'fov':>4} {'mode':>9} {'size':>5} {'coverage %':>11} {'texel/pixel':>12} {'error %':>8} "
+          f"{'shimmer %':>10} {'frame ms':>9}")
+    for copies in (1, 16):
+        headless = HeadlessRenderer(1280, 720, software='--software' in sys.argv)
+        if copies > 1:
+            add_copies(headless, copies)
+            headless.set_camera('main', distance=60)
+        scene = headless.scene
+        R = scene.main_view_camera.R
+        for fov in (20, 6):
+            for mode, controls in modes.items():
+                scene.compute_focused_frustum = partial(Scene.compute_focused_frustum, scene, snap=mode != 'unsnapped')
+                for size in (256, 512, 1024):
+                    headless.set_controls(cache_shadow_map=False, cache_views=False, manual_light_fov=False,
+                                          main_view_fov=fov, shadow_map_size=size, **controls)
+                    headless.set_camera('main', R=R)
+                    headless.render()
+                    points, normals, depth, pixel = surface_points(headless)
+                    in_map, texel = map_shadows(scene, points, normals, depth)
+                    truth, lit_side = ray_shadows(scene, points, normals)
+                    error = np.mean(in_map[lit_side] != truth[lit_side]) * 100
+                    coverage = texel_coverage(scene)
+
+                    # turn the main camera slowly, and test the same points against the shadow map of each frame
+                    flips, times = [], []
+                    for i in range(1, frames + 1):
+                        headless.set_camera('main', R=glm.rotate(0.002 * i, glm.vec3(0, 1, 0)) * R)
+                        start = time.perf_counter()
+                        headless.render()
+                        times.append(time.perf_counter() - start)
+                        previous, (in_map, _) = in_map, map_shadows(scene, points, normals, depth)
+                        flips.append(np.mean(in_map[lit_side] != previous[lit_side]) * 100)
+                    print(f'{copies:>6} {fov:>4} {mode:>9} {size:>5} {coverage:>11.1f} {np.median(texel / pixel):>12.2f} '
+                          f'{error:>8.2f} {np.mean(flips):>10.3f} {np.median(times) * 1e3:>9.2f}')
+        headless.ctx.release()
+
+
+if __name__ == '__main__':
+    main()
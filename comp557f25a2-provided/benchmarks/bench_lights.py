@@ -0,0 +1,65 @@
+''' Cost of more lights (see LightArray): for 1 to 16 lights, the frame time of the data scene (1280x720, 1024
+shadow maps, views and shadow maps not cached), the time of the pass that draws the shadow maps of the light array,
+with its draw calls and memory, and the time of the main view, where each fragment shades every light. The draw
+calls of the array pass do not grow with the number of lights, since the casters are drawn once, instanced for
+each layer; the time goes to the fragments. Each pass is timed from a finished GL queue to the end of its GPU work
+(timer queries are not reliable with a software renderer that defers draws), the median over the frames.
+Rendering is headless.
+
+    python benchmarks/bench_lights.py [frames] [--software]
+'''
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from Headless import HeadlessRenderer  # noqa: E402
+
+
+def timed(ctx, fn) -> float:
+    ''' seconds from a finished GL queue until the work of fn() is done '''
+    ctx.finish()
+    start = time.perf_counter()
+    fn()
+    ctx.finish()
+    return time.perf_counter() - start
+
+
+def run(headless, frames: int) -> tuple:
+    ''' median seconds of a frame, the array pass and the main view, and the draw calls of the array pass '''
+    scene, renderer, ctx = headless.scene, headless.renderer, headless.ctx
+    frame_times, array_times, view_times = [], [], []
+    calls = 0
+    for i in range(frames + 1):
+        frame = timed(ctx, headless.render)
+        # the array pass and the main view again, on their own
+        headless.fbo.use()
+        calls = scene.geometry.draw_calls
+        array = timed(ctx, scene.render_light_array)
+        calls = scene.geometry.draw_calls - calls
+        renderer.set_program_state()
+        view = timed(ctx, lambda: renderer.render_view(0))
+        if i > 0:  # the first frame warms up
+            frame_times.append(frame)
+            array_times.append(array)
+            view_times.append(view)
+    return np.median(frame_times), np.median(array_times), np.median(view_times), calls
+
+
+def main():
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 and sys.argv[1].isdigit() else 20
+    headless = HeadlessRenderer(1280, 720, software='--software' in sys.argv)
+    headless.set_controls(cache_views=False, cache_shadow_map=False, shadow_map_size=1024)
+    print(f"{'lights':>6} {'frame ms':>9} {'array ms':>9} {'draw calls':>11} {'array MB':>9} {'main view ms':>13}")
+    for count in (1, 2, 4, 8, 16):
+        headless.set_controls(light_count=count)
+        frame, array_seconds, view, calls = run(headless, frames)
+        array = headless.scene.light_array
+        mb = array.nbytes / 2 ** 20 if array is not None else 0
+        print(f'{count:>6} {frame * 1e3:>9.2f} {array_seconds * 1e3:>9.2f} {calls:>11} {mb:>9.1f} {view * 1e3:>13.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+''' Mesh levels of detail: triangles drawn, time and triangle throughput of the shadow pass (512 map) and of whole
+frames, and how much the shadow map and the main view change against the full meshes, for every object forced
+to one level, and for the levels picked by projected size (lod_pixel_error). The data scene and k copies of it
+seen from further back are drawn headless, with the light frustum fitted to the scene, and the view and shadow
+map caches off.
+  map diff %   shadow map texels whose depth changes by more than 1e-3 (of the [0,1] depth range)
+  view diff %  main view pixels that change by more than 2 (of 255) in some channel
+
+    python benchmarks/bench_lod.py [frames] [--software]
+'''
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from Headless import HeadlessRenderer  # noqa: E402
+from Scene import Scene  # noqa: E402
+from bench_frame_passes import add_copies  # noqa: E402
+
+choices = [('level 0', 0), ('level 1', 1), ('level 2', 2), ('level 3', 3),
+           ('auto 0.5', 0.5), ('auto 1', 1.0), ('auto 2', 2.0), ('auto 4', 4.0)]
+
+
+def main():
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 and sys.argv[1].isdigit() else 10
+    print(f"{'copies':>6} {'choice':>9} {'shadow tris':>12} {'shadow ms':>10} {'Mtris/s':>8} {'map diff %':>11} "
+          f"{'frame tris':>11} {'frame ms':>9} {'Mtris/s':>8} {'view diff %':>12}")
+    for copies in (1, 64):
+        headless = HeadlessRenderer(1280, 720, software='--software' in sys.argv)
+        if copies > 1:
+            add_copies(headless, copies)
+            headless.set_camera('main', distance=60)
+        scene, geometry = headless.scene, headless.scene.geometry
+        reference = None
+        for name, value in choices:
+            if name.startswith('level'):
+                levels = np.full(len(geometry.names), value)
+                scene.lod_levels = lambda V, P: levels
+                headless.set_controls(use_lod=True, lod_pixel_error=-value)  # (a new shadow map key for each level)
+            else:
+                scene.lod_levels = Scene.lod_levels.__get__(scene)
+                headless.set_controls(use_lod=True, lod_pixel_error=value)
+            headless.set_controls(cache_views=False, cache_shadow_map=False, shadow_map_size=512, manual_light_fov=False)
+            image = headless.split_views(headless.render())[0].astype(int)
+            depth = np.frombuffer(scene.texture.tex_depth.read(), dtype='f4')
+            if reference is None:
+                reference = depth, image
+            map_diff = np.mean(np.abs(depth - reference[0]) > 1e-3) * 100
+            view_diff = np.mean(np.any(np.abs(image - reference[1]) > 2, axis=-1)) * 100
+
+            shadow, frame = [], []
+            for _ in range(frames):
+                drawn = geometry.indices_drawn
+                start = time.perf_counter()
+                scene.render_shadow_pass()
+                headless.ctx.finish()
+                shadow.append(time.perf_counter() - start)
+                shadow_tris = (geometry.indices_drawn - drawn) // 3
+                drawn = geometry.indices_drawn
+                start = time.perf_counter()
+                headless.render()
+                headless.ctx.finish()
+                frame.append(time.perf_counter() - start)
+                frame_tris = (geometry.indices_drawn - drawn) // 3
+            shadow_s, frame_s = np.median(shadow), np.median(frame)
+            print(f'{copies:>6} {name:>9} {shadow_tris:>12} {shadow_s * 1e3:>10.2f} {shadow_tris / shadow_s / 1e6:>8.1f} '
+                  f'{map_diff:>11.2f} {frame_tris:>11} {frame_s * 1e3:>9.2f} {frame_tris / frame_s / 1e6:>8.1f} '
+                  f'{view_diff:>12.2f}')
+        headless.ctx.release()
+
+
+if __name__ == '__main__':
+    main()
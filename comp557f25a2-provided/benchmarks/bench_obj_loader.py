@@ -0,0 +1,42 @@
+''' Compare the built-in OBJ loader with the trimesh path on every file in data/.
+Checks that positions and faces are equal and normals match, and reports load times
+(plus the one-off import time of trimesh, which the built-in loader avoids).
+
+    python benchmarks/bench_obj_loader.py
+'''
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from ObjLoader import load_obj  # noqa: E402
+
+data_dir = Path(__file__).resolve().parent.parent / 'data'
+
+
+def main():
+    start = time.perf_counter()
+    from MeshCache import load_with_trimesh
+    import trimesh  # noqa: F401
+    import_time = time.perf_counter() - start
+    print(f'trimesh import: {import_time * 1e3:.0f} ms')
+    print(f"{'file':>12} {'verts':>6} {'faces':>6} {'equal':>6} {'normal err':>11} {'numpy ms':>9} {'trimesh ms':>11}")
+    ok = True
+    for path in sorted(data_dir.glob('*.obj')):
+        start = time.perf_counter()
+        v, f, n = load_obj(path)
+        t_np = time.perf_counter() - start
+        start = time.perf_counter()
+        tv, tf, tn = load_with_trimesh(path)
+        t_tm = time.perf_counter() - start
+        equal = np.array_equal(v, tv) and np.array_equal(f, tf)
+        err = np.abs(n - tn).max()
+        ok = ok and equal and err < 1e-6
+        print(f"{path.name:>12} {len(v):>6} {len(f):>6} {str(equal):>6} {err:>11.1e} {t_np * 1e3:>9.1f} {t_tm * 1e3:>11.1f}")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+''' Micro-benchmark for fitting near/far to the scene (Scene.compute_nf_from_view).
+Compares the original per-vertex glm loop, a numpy multiply over all vertices, and the convex hull
+based SceneBounds, for scenes made of k translated copies of the meshes in data/. The build time includes
+the hull of each mesh (see hull_points), which MeshCache computes when a mesh is preprocessed.
+
+    python benchmarks/bench_scene_bounds.py
+'''
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import glm
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from SceneBounds import SceneBounds, hull_points, mat4_to_np  # noqa: E402
+
+data_dir = Path(__file__).resolve().parent.parent / 'data'
+
+
+def load_positions(path: Path) -> np.ndarray:
+    ''' read only the vertex positions of an OBJ file '''
+    lines = [line.split()[1:4] for line in open(path) if line.startswith('v ')]
+    return np.array(lines, dtype='f8')
+
+
+def nf_glm_loop(verts4: np.ndarray, V: glm.mat4):
+    ''' the original implementation, one glm multiply per vertex '''
+    z_coords = []
+    for i in range(verts4.shape[1]):
+        v = glm.vec4(verts4[0, i], verts4[1, i], verts4[2, i], verts4[3, i])
+        z_coords.append((V * v).z)
+    z_coords = np.array(z_coords)
+    return -np.max(z_coords), -np.min(z_coords)
+
+
+def nf_numpy_all(verts4: np.ndarray, V: glm.mat4):
+    ''' one numpy multiply over all homogeneous vertices, no hull reduction '''
+    z = mat4_to_np(V)[2] @ verts4
+    return -z.max(), -z.min()
+
+
+def time_per_call(fn, *args, min_time=0.2):
+    ''' return the mean time of a call in seconds, repeating until min_time has passed '''
+    fn(*args)
+    count = 0
+    start = time.perf_counter()
+    while True:
+        fn(*args)
+        count += 1
+        elapsed = time.perf_counter() - start
+        if elapsed > min_time:
+            return elapsed / count
+
+
+def main():
+    meshes = [load_positions(p) for p in sorted(data_dir.glob('*.obj'))]
+    V = glm.translate(glm.mat4(1), glm.vec3(0, 0, -10)) * glm.rotate(0.4, glm.vec3(1, 0, 0))
+    print(f"{'copies':>6} {'verts':>8} {'hull':>6} {'build ms':>9} {'glm loop us':>12} {'numpy us':>9} {'hull us':>8}")
+    for copies in (1, 4, 16, 64, 256):
+        side = int(np.ceil(np.sqrt(copies)))
+        parts = [np.zeros((1, 3))]
+        for c in range(copies):
+            offset = np.array([c % side, 0, c // side]) * 6.0
+            parts.extend(m + offset for m in meshes)
+        verts = np.concatenate(parts)
+        verts4 = np.hstack([verts, np.ones((verts.shape[0], 1))]).T
+
+        start = time.perf_counter()
+        bounds = SceneBounds()
+        for p in parts:
+            bounds.add_points(p, hull_points(p))
+        hull_size = bounds.points.shape[0]
+        build = time.perf_counter() - start
+
+        assert np.allclose(bounds.compute_nf(V), nf_numpy_all(verts4, V), rtol=1e-5, atol=1e-4)
+        t_loop = time_per_call(nf_glm_loop, verts4, V) if copies <= 16 else float('nan')
+        t_np = time_per_call(nf_numpy_all, verts4, V)
+        t_hull = time_per_call(bounds.compute_nf, V)
+        print(f"{copies:>6} {verts.shape[0]:>8} {hull_size:>6} {build * 1e3:>9.1f} "
+              f"{t_loop * 1e6:>12.0f} {t_np * 1e6:>9.0f} {t_hull * 1e6:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+''' Per-fragment cost of each variant of the shading program (see ShaderVariants) against the program that branches
+on bool uniforms for all features (BRANCHING, as before the variants), drawing the data scene from the main camera
+into a 1280x720 target with the same uniforms. The depth test is off so that every draw shades all its fragments,
+which are counted with an occlusion query. The variants with CASCADES are drawn with 3 shadow map cascades.
+It also prints the time to compile and link all variants in a new process with the driver's on-disk shader cache
+off and on (the second run with it on reuses what the first compiled; Mesa reads MESA_SHADER_CACHE_DISABLE).
+Rendering is headless.
+
+    python benchmarks/bench_shader_variants.py [draws] [--software]
+'''
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import moderngl as mgl
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from Headless import HeadlessRenderer, create_headless_context  # noqa: E402
+from ShaderVariants import ShaderVariants, feature_uniforms, all_variant_keys, variant_name, BRANCHING  # noqa: E402
+
+glsl_dir = Path(__file__).resolve().parent.parent / 'glsl'
+
+
+def compile_all(software: bool) -> float:
+    ''' seconds to compile all the variants in a new context '''
+    ctx = create_headless_context(software=software)
+    variants = ShaderVariants(ctx, (glsl_dir / 'render_with_sm_vert.glsl').read_text(),
+                              (glsl_dir / 'render_with_sm_frag.glsl').read_text())
+    start = time.perf_counter()
+    variants.compile(all_variant_keys() + [BRANCHING])
+    return time.perf_counter() - start
+
+
+def time_draws(headless, draws: int, layout: str) -> tuple:
+    ''' median seconds to draw the scene draws times, and the fragments shaded by one draw '''
+    scene, ctx = headless.scene, headless.ctx
+    query = ctx.query(samples=True)
+    with query:
+        scene.geometry.render(layout)
+    times = []
+    for _ in range(7):
+        ctx.finish()
+        start = time.perf_counter()
+        for _ in range(draws):
+            scene.geometry.render(layout)
+        ctx.finish()
+        times.append(time.perf_counter() - start)
+    return np.median(times), query.samples
+
+
+def main():
+    if '--compile' in sys.argv:
+        print(compile_all('--software' in sys.argv))
+        return
+    draws = int(sys.argv[1]) if len(sys.argv) > 1 and sys.argv[1].isdigit() else 5
+    software = '--software' in sys.argv
+    headless = HeadlessRenderer(1280, 720, software=software)
+    scene, ctx = headless.scene, headless.ctx
+    target = ctx.framebuffer(color_attachments=[ctx.renderbuffer((1280, 720))])
+    variants = scene.shading_variants
+    branching = variants.program(BRANCHING)
+    scene.geometry.add_layout(BRANCHING, branching, '3f 3f 4f1', 'in_position', 'in_normal', 'in_color')
+
+    print(f"{'variant':>58} {'fragments':>10} {'ms':>8} {'ns/frag':>8} {'branching':>10} {'speedup':>8}")
+    for cascades in (1, 3):
+        headless.set_controls(cache_views=False, cache_shadow_map=False, shadow_cascades=cascades)
+        headless.render()
+        camera = scene.main_view_camera
+        for key in all_variant_keys():
+            if ('CASCADES' in key) != (cascades > 1):
+                continue
+            target.use()
+            ctx.disable(mgl.DEPTH_TEST)
+            scene.set_view_uniforms(camera.V, camera.PV, scene.get_light_pos_in_view(camera.V))
+            for feature, name in feature_uniforms.items():
+                scene.uniforms[name] = feature in key
+            assert scene.uniforms.key == key
+            seconds, fragments = time_draws(headless, draws, scene.shading_layout())
+
+            # the same uniforms in the branching program
+            uniforms = variants.uniforms[BRANCHING]
+            for name, value in scene.uniforms.values.items():
+                if name in uniforms.handles:
+                    uniforms[name] = value
+            branching_seconds, _ = time_draws(headless, draws, BRANCHING)
+            shaded = fragments * draws
+            print(f'{variant_name(key):>58} {fragments:>10} {seconds * 1e3:>8.2f} {seconds / shaded * 1e9:>8.2f} '
+                  f'{branching_seconds / shaded * 1e9:>10.2f} {branching_seconds / seconds:>8.2f}')
+    headless.ctx.release()
+
+    command = [sys.executable, __file__, '--compile'] + (['--software'] if software else [])
+    for label, env in (('cache off', {'MESA_SHADER_CACHE_DISABLE': 'true'}), ('cache on, 1st', {}), ('cache on, 2nd', {})):
+        output = subprocess.run(command, env={**os.environ, **env}, capture_output=True, text=True).stdout
+        print(f'compile {len(all_variant_keys()) + 1} programs, {label:>14}: {float(output.split()[-1]) * 1e3:.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
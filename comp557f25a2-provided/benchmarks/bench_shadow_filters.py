@@ -0,0 +1,89 @@
+''' Cost of each shadow map filter (see ShadowFilter) against how soft the shadows it draws are, in the data scene
+with a 1280x720 frame and a 512 shadow map, headless, with the view and shadow map caches off:
+  shadow ms     the shadow pass (with the blur and mipmaps of the variance shadow map)
+  frame ms      the shadow pass and the 4 views
+  penumbra %    main view pixels that receive light with a visibility strictly between 0.05 and 0.95
+  width px      penumbra pixels over the length of the shadow edges (pixels where the visibility crosses 0.5)
+The visibility of each pixel is found from the frame drawn with the shadow map cleared to the far plane (all lit)
+and to the near plane (all shadowed).
+
+    python benchmarks/bench_shadow_filters.py [frames] [--software]
+'''
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from Headless import HeadlessRenderer  # noqa: E402
+
+settings = [
+    ('hardware nearest', dict(shadow_filter='hardware', use_linear_filter=False)),
+    ('hardware linear', dict(shadow_filter='hardware', use_linear_filter=True)),
+    ('pcf 3x3', dict(shadow_filter='pcf', pcf_kernel_size=3)),
+    ('pcf 5x5', dict(shadow_filter='pcf', pcf_kernel_size=5)),
+    ('pcf 9x9', dict(shadow_filter='pcf', pcf_kernel_size=9)),
+    ('poisson 8 r2', dict(shadow_filter='poisson', poisson_taps=8, filter_radius=2.0)),
+    ('poisson 16 r2', dict(shadow_filter='poisson', poisson_taps=16, filter_radius=2.0)),
+    ('poisson 32 r4', dict(shadow_filter='poisson', poisson_taps=32, filter_radius=4.0)),
+    ('vsm blur 0', dict(shadow_filter='vsm', vsm_blur_radius=0)),
+    ('vsm blur 2', dict(shadow_filter='vsm', vsm_blur_radius=2)),
+    ('vsm blur 4', dict(shadow_filter='vsm', vsm_blur_radius=4)),
+    ('vsm blur 8', dict(shadow_filter='vsm', vsm_blur_radius=8)),
+]
+
+
+def main_view_with_map(headless, depth: float) -> np.ndarray:
+    ''' luminance of the main view drawn with the shadow map (and moments) cleared to the given depth '''
+    scene = headless.scene
+    headless.set_controls(cache_shadow_map=True)
+    texture = scene.texture
+    fbo = texture.fbo_depth if texture.variance is None else texture.variance.fbo
+    headless.ctx.scissor = None  # (left at the last view)
+    fbo.clear(depth, depth * depth, 0, 0, depth=depth)
+    if texture.variance is not None:
+        texture.variance.build_mipmaps()
+    image = headless.split_views(headless.render())[0].astype('f4') @ np.array([0.3, 0.59, 0.11], dtype='f4')
+    headless.set_controls(cache_shadow_map=False)
+    return image
+
+
+def softness(visibility: np.ndarray, receives: np.ndarray) -> tuple:
+    ''' % of the receiving pixels in penumbra, and penumbra pixels per pixel of shadow edge '''
+    penumbra = receives & (visibility > 0.05) & (visibility < 0.95)
+    lit = visibility > 0.5
+    both = receives[:, 1:] & receives[:, :-1], receives[1:] & receives[:-1]
+    edges = np.count_nonzero((lit[:, 1:] != lit[:, :-1]) & both[0]) + np.count_nonzero((lit[1:] != lit[:-1]) & both[1])
+    count = np.count_nonzero(penumbra)
+    return count / max(np.count_nonzero(receives), 1) * 100, count / max(edges, 1)
+
+
+def main():
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 and sys.argv[1].isdigit() else 10
+    headless = HeadlessRenderer(1280, 720, software='--software' in sys.argv)
+    scene, ctx = headless.scene, headless.ctx
+    print(f"{'filter':>16} {'shadow ms':>10} {'frame ms':>9} {'penumbra %':>11} {'width px':>9}")
+    for name, controls in settings:
+        headless.set_controls(cache_views=False, cache_shadow_map=False, shadow_map_size=512, **controls)
+        headless.render()
+        shadow, frame = [], []
+        for _ in range(frames):
+            ctx.finish()
+            start = time.perf_counter()
+            scene.render_shadow_pass()
+            ctx.finish()
+            shadow.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            image = headless.render()
+            frame.append(time.perf_counter() - start)
+        image = headless.split_views(image)[0].astype('f4') @ np.array([0.3, 0.59, 0.11], dtype='f4')
+        lit, dark = main_view_with_map(headless, 1.0), main_view_with_map(headless, 0.0)
+        receives = lit - dark > 20
+        visibility = np.where(receives, (image - dark) / np.maximum(lit - dark, 1e-6), 1)
+        penumbra, width = softness(visibility, receives)
+        print(f'{name:>16} {np.median(shadow) * 1e3:>10.2f} {np.median(frame) * 1e3:>9.2f} {penumbra:>11.2f} {width:>9.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+''' Shadow map memory and shadow pass time for each resolution (256 to 4096) and depth format (16, 24, 32 bit),
+against the previous layout that also had a float32 colour attachment. The shadow pass is rendered every time
+(shadow map cache off) and timed with a glFinish, for k copies of the data meshes. Rendering is headless.
+
+    python benchmarks/bench_shadow_map.py [repeats] [--software]
+'''
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from Headless import HeadlessRenderer  # noqa: E402
+from bench_frame_passes import add_copies  # noqa: E402
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 and sys.argv[1].isdigit() else 20
+    print(f"{'copies':>6} {'size':>5} {'bits':>4} {'old MB':>7} {'new MB':>7} {'shadow ms':>10}")
+    for copies in (1, 16):
+        headless = HeadlessRenderer(320, 180, software='--software' in sys.argv)
+        add_copies(headless, copies)
+        scene = headless.scene
+        for size in (256, 512, 1024, 2048, 4096):
+            for bits in (16, 24, 32):
+                headless.set_controls(cache_shadow_map=False, cache_views=False, manual_light_fov=False,
+                                      shadow_map_size=size, shadow_depth_bits=bits)
+                headless.render()
+                times = []
+                for _ in range(repeats):
+                    start = time.perf_counter()
+                    scene.render_shadow_pass()
+                    headless.ctx.finish()
+                    times.append(time.perf_counter() - start)
+                old = size * size * (4 + 4)  # 24 bit depth and a float32 colour attachment
+                texture = scene.texture
+                print(f'{copies:>6} {size:>5} {texture.depth_bits:>4} {old / 2**20:>7.2f} {texture.nbytes / 2**20:>7.2f} '
+                      f'{np.median(times) * 1e3:>10.2f}')
+        headless.ctx.release()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+''' Throughput of Scene.shadow_map_visibility (see ShadowQuery) for N points on the ground of the data scene and a
+little above it, within the bounds of the scene's vertices (normals up, slope bias and linear filter on, 1024 shadow map), on the CPU and on the GPU
+(transform feedback), against casting a ray to the light from each point through the BVH (points_in_shadow,
+up to 10^5 points). Also the fraction of points where the CPU and GPU disagree on lit (visibility > 0.5), and
+where the shadow map disagrees with the rays. Each time is the median of 5 queries after one to warm up, with
+the shadow map already drawn; the first CPU query of a new shadow map also reads back the depth map (read ms).
+Rendering is headless.
+
+    python benchmarks/bench_shadow_query.py [--cascades 3] [--software]
+'''
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from Headless import HeadlessRenderer  # noqa: E402
+
+
+def time_query(fn, repeat: int = 5) -> tuple:
+    ''' median seconds of fn(), and its last result '''
+    result = fn()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return np.median(times), result
+
+
+def main():
+    cascades = int(sys.argv[sys.argv.index('--cascades') + 1]) if '--cascades' in sys.argv else 1
+    headless = HeadlessRenderer(1280, 720, software='--software' in sys.argv)
+    headless.set_controls(use_linear_filter=True, use_depth_bias=True, shadow_map_size=1024, shadow_cascades=cascades)
+    headless.render()
+    scene = headless.scene
+    query = scene.shadow_query
+
+    query.depth_key = None
+    start = time.perf_counter()
+    query.depth_map()
+    print(f'{cascades} cascade(s), depth map {scene.texture.tex_depth.size}, read ms {(time.perf_counter() - start) * 1e3:.2f}')
+    print(f"{'points':>9} {'cpu ms':>8} {'cpu pts/s':>10} {'gpu ms':>8} {'gpu pts/s':>10} {'differ %':>9} "
+          f"{'rays ms':>8} {'rays pts/s':>10} {'vs rays %':>10}")
+    rng = np.random.default_rng(0)
+    verts = scene.get_all_scene_verts()
+    low, high = verts.min(axis=0), verts.max(axis=0)
+    low[1], high[1] = 0, 0.5
+    for n in (10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6, 4 * 10 ** 6):
+        points = rng.uniform(low, high, (n, 3)).astype('f4')
+        points[: n // 2, 1] = 0  # half on the ground
+        normals = np.tile(np.array([0, 1, 0], dtype='f4'), (n, 1))
+        cpu_seconds, cpu = time_query(lambda: scene.shadow_map_visibility(points, normals, gpu=False))
+        gpu_seconds, gpu = time_query(lambda: scene.shadow_map_visibility(points, normals, gpu=True))
+        differ = np.mean((cpu > 0.5) != (gpu > 0.5)) * 100
+        line = (f'{n:>9} {cpu_seconds * 1e3:>8.2f} {n / cpu_seconds:>10.3g} {gpu_seconds * 1e3:>8.2f} '
+                f'{n / gpu_seconds:>10.3g} {differ:>9.3f}')
+        if n <= 10 ** 5:
+            ray_seconds, shadowed = time_query(lambda: scene.points_in_shadow(points + normals * 1e-3), repeat=1)
+            disagree = np.mean((cpu > 0.5) == shadowed) * 100
+            line += f' {ray_seconds * 1e3:>8.2f} {n / ray_seconds:>10.3g} {disagree:>10.2f}'
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+''' Startup time of Scene.initGL with a cold and a warm mesh cache.
+Each run is a fresh python process (so import time of the mesh loading code is included), using a
+standalone EGL context and a temporary cache folder.
+
+    python benchmarks/bench_startup.py [runs]
+'''
+import json
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+app_dir = Path(__file__).resolve().parent.parent
+
+child = '''
+import json, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {app_dir!r})
+from pathlib import Path
+import moderngl as mgl
+from Scene import Scene
+from MeshCache import MeshCache
+imported = time.perf_counter()
+ctx = mgl.create_standalone_context(backend={backend!r})
+scene = Scene()
+scene.mesh_cache = MeshCache(Path({cache_dir!r}))
+context = time.perf_counter()
+scene.initGL(ctx)
+ctx.finish()
+done = time.perf_counter()
+print(json.dumps({{'import': imported - start, 'initGL': done - context, 'total': done - start - (context - imported),
+                  'hits': scene.mesh_cache.hits, 'misses': scene.mesh_cache.misses}}))
+'''
+
+
+def run(cache_dir: str, backend: str) -> dict:
+    code = child.format(app_dir=str(app_dir), cache_dir=cache_dir, backend=backend)
+    out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    backend = 'egl' if sys.platform.startswith('linux') else None
+    results = {'cold': [], 'warm': []}
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            results['cold'].append(run(cache_dir, backend))
+            results['warm'].append(run(cache_dir, backend))
+    print(f"{'cache':>5} {'import ms':>10} {'initGL ms':>10} {'total ms':>9} {'hits':>5} {'misses':>7}")
+    for mode, rs in results.items():
+        best = min(rs, key=lambda r: r['total'])
+        print(f"{mode:>5} {best['import'] * 1e3:>10.1f} {best['initGL'] * 1e3:>10.1f} {best['total'] * 1e3:>9.1f} "
+              f"{best['hits']:>5} {best['misses']:>7}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+''' Python overhead of a frame: the CPU time to issue the shadow pass and the 4 views (SceneRenderer.render with
+the view cache off, without waiting for the GPU), and the uniform writes made and skipped per frame, for scenes
+of k copies of the data meshes. Rendering is headless, at a small size to keep rasterization out of the way;
+on a software rasterizer the issue time still includes the vertex processing of the driver.
+It also compares the cost of a uniform write through a string-keyed program lookup with Uniforms.
+
+    python benchmarks/bench_uniforms.py [frames] [--software]
+'''
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import glm
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from Headless import HeadlessRenderer  # noqa: E402
+from bench_frame_passes import add_copies  # noqa: E402
+
+
+def main():
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 and sys.argv[1].isdigit() else 100
+    print(f"{'copies':>6} {'objects':>7} {'issue ms':>9} {'uniform writes':>15} {'skipped':>8} {'block writes':>13} {'skipped':>8}")
+    for copies in (1, 16, 64):
+        headless = HeadlessRenderer(64, 36, software='--software' in sys.argv)
+        add_copies(headless, copies)
+        headless.set_controls(cache_views=False, cache_shadow_map=False, show_light_camera=True, show_main_camera=True)
+        scene = headless.scene
+        headless.render()
+        counters = [scene.uniforms, scene.depth_uniforms, scene.view_block]
+        for c in counters:
+            c.writes = c.skipped = 0
+        times = []
+        for _ in range(frames):
+            headless.fbo.use()
+            start = time.perf_counter()
+            headless.renderer.render()
+            times.append(time.perf_counter() - start)
+            headless.ctx.finish()
+        writes = (scene.uniforms.writes + scene.depth_uniforms.writes) / frames
+        skipped = (scene.uniforms.skipped + scene.depth_uniforms.skipped) / frames
+        print(f'{copies:>6} {len(scene.object_name):>7} {np.median(times) * 1e3:>9.3f} {writes:>15.1f} {skipped:>8.1f} '
+              f'{scene.view_block.writes / frames:>13.1f} {scene.view_block.skipped / frames:>8.1f}')
+        headless.ctx.release()
+
+    headless = HeadlessRenderer(64, 36, software='--software' in sys.argv)
+    scene = headless.scene
+    prog = scene.shading_variants.program('BRANCHING')
+    M = glm.mat4(1)
+
+    def lookup():
+        prog['u_use_lighting'] = True
+        prog['u_color'] = (1, 1, 0, 0.75)
+        scene.prog_depth['u_mvp'].write(M)
+
+    def cached():
+        scene.uniforms['u_use_lighting'] = True
+        scene.uniforms['u_color'] = (1, 1, 0, 0.75)
+        scene.depth_uniforms['u_mvp'] = M
+
+    for label, fn in (('program lookup', lookup), ('Uniforms', cached)):
+        start = time.perf_counter()
+        for _ in range(10000):
+            fn()
+        print(f'{label:>14}: {(time.perf_counter() - start) / 30000 * 1e6:.2f} us per uniform write')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+''' Triangle and vertex order of each mesh in data/ as written in the OBJ file, against the order of
+VertexCache.optimize_mesh (done when the mesh cache is built): average cache miss ratio (vertices transformed
+per triangle) for FIFO post-transform caches of 16 and 32 entries, and draw time of each pass for the mesh drawn
+many times in the shadow map (depth only, 512) and in a 1280x720 view (shading), each timed with a glFinish.
+A small viewport (64x36) is also timed for the shading pass, where vertex work is a larger part of the time.
+Rendering is headless.
+
+    python benchmarks/bench_vertex_cache.py [draws] [--software]
+'''
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import moderngl as mgl
+import glm
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from Headless import create_headless_context  # noqa: E402
+from Scene import Scene  # noqa: E402
+from MeshCache import build_mesh_data  # noqa: E402
+from GeometryBuffer import GeometryBuffer  # noqa: E402
+from VertexCache import acmr  # noqa: E402
+
+data_dir = Path(__file__).resolve().parent.parent / 'data'
+
+
+def time_ms(fn, ctx, repeat: int = 15) -> float:
+    fn()
+    ctx.finish()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        ctx.finish()
+        times.append(time.perf_counter() - start)
+    return np.median(times) * 1e3
+
+
+def main():
+    draws = int(sys.argv[1]) if len(sys.argv) > 1 and sys.argv[1].isdigit() else 50
+    ctx = create_headless_context(software='--software' in sys.argv)
+    scene = Scene()
+    scene.initGL(ctx)
+    view = ctx.framebuffer(color_attachments=[ctx.renderbuffer((1280, 720))], depth_attachment=ctx.depth_renderbuffer((1280, 720)))
+    small = ctx.framebuffer(color_attachments=[ctx.renderbuffer((64, 36))], depth_attachment=ctx.depth_renderbuffer((64, 36)))
+    shadow = ctx.framebuffer(depth_attachment=ctx.depth_texture((512, 512)))
+    ctx.enable(mgl.DEPTH_TEST)
+    print(f"{'mesh':>8} {'tris':>6} {'order':>9} {'acmr 16':>8} {'acmr 32':>8} {'depth ms':>9} {'shading ms':>11} {'small ms':>9}")
+    for path in sorted(data_dir.glob('*.obj')):
+        for optimize in (False, True):
+            mesh = build_mesh_data(path, optimize=optimize)
+            faces = np.asarray(mesh.indices).reshape(-1, 3)
+            scene.uniforms['u_use_lighting'] = True
+            scene.uniforms['u_use_shadow_map'] = False
+            geometry = GeometryBuffer(ctx)
+            geometry.add_layout('shading', scene.uniforms.program, '3f 3f 4f1', 'in_position', 'in_normal', 'in_color')
+            geometry.add_layout('depth', scene.prog_depth, '3f 16x', 'in_position')
+            geometry.append(path.stem, mesh.positions, mesh.indices, mesh.normals, (0.5, 0.5, 0.5, 1))
+
+            # fit the mesh in a view from the front, the light looking down on it
+            center = (mesh.positions.min(axis=0) + mesh.positions.max(axis=0)) / 2
+            radius = float(np.linalg.norm(mesh.positions.max(axis=0) - mesh.positions.min(axis=0))) / 2
+            V = glm.lookAt(glm.vec3(*center) + glm.vec3(0, 0.5, 3) * radius, glm.vec3(*center), glm.vec3(0, 1, 0))
+            P = glm.perspective(glm.radians(45), 16 / 9, radius, 5 * radius)
+            L = glm.lookAt(glm.vec3(*center) + glm.vec3(0, 3, 0.1) * radius, glm.vec3(*center), glm.vec3(0, 1, 0))
+            scene.depth_uniforms['u_mvp'] = glm.perspective(glm.radians(45), 1, radius, 5 * radius) * L
+            scene.set_view_uniforms(V, P * V, glm.vec3(0, 0, 0))
+
+            def draw(target, layout):
+                def fn():
+                    target.use()
+                    target.clear(1, 1, 1, 1)
+                    for _ in range(draws):
+                        geometry.render(layout)
+                return fn
+
+            depth_ms = time_ms(draw(shadow, 'depth'), ctx)
+            shading_ms = time_ms(draw(view, 'shading'), ctx)
+            small_ms = time_ms(draw(small, 'shading'), ctx)
+            order = 'optimized' if optimize else 'obj'
+            print(f'{path.stem:>8} {faces.shape[0]:>6} {order:>9} {acmr(faces, 16):>8.3f} {acmr(faces, 32):>8.3f} '
+                  f'{depth_ms:>9.2f} {shading_ms:>11.2f} {small_ms:>9.2f}')
+            geometry.release()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+''' Load time and peak memory of collecting the scene vertices, for scenes with many objects.
+Compares growing a 4xN float64 array with np.hstack (the original Scene.initGL) against VertexStore.
+
+    python benchmarks/bench_vertex_store.py
+'''
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from VertexStore import VertexStore  # noqa: E402
+
+
+def load_hstack(meshes):
+    verts = np.array([[0, 0, 0, 1]]).T
+    for m in meshes:
+        verts_by_4 = np.hstack([m, np.ones((m.shape[0], 1))])
+        verts = np.hstack((verts, verts_by_4.T))
+    return verts
+
+
+def load_store(meshes):
+    store = VertexStore()
+    for i, m in enumerate(meshes):
+        store.append(str(i), m)
+    return store
+
+
+def measure(fn, meshes):
+    ''' return (seconds, peak traced bytes) of a call '''
+    tracemalloc.start()
+    start = time.perf_counter()
+    fn(meshes)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    rng = np.random.default_rng(0)
+    mesh = rng.random((1000, 3))  # about the size of an average mesh in data/
+    print(f"{'objects':>7} {'hstack ms':>10} {'hstack MB':>10} {'store ms':>9} {'store MB':>9}")
+    for count in (10, 100, 400, 1600):
+        meshes = [mesh] * count
+        t_h, m_h = measure(load_hstack, meshes)
+        t_s, m_s = measure(load_store, meshes)
+        print(f"{count:>7} {t_h * 1e3:>10.1f} {m_h / 2**20:>10.1f} {t_s * 1e3:>9.1f} {m_s / 2**20:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
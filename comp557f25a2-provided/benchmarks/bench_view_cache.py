@@ -0,0 +1,53 @@
+''' Frame time with and without the per-view image cache (SceneControl.cache_views) while the camera of one
+quadrant is rotated a little every frame, as when dragging the mouse in that quadrant, and while idle.
+Rendering is headless; each frame includes a glFinish so that GPU time is counted.
+
+    python benchmarks/bench_view_cache.py [frames] [--software]
+'''
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import glm
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from Headless import HeadlessRenderer  # noqa: E402
+from SceneRenderer import view_names  # noqa: E402
+
+
+def frame_ms(headless: HeadlessRenderer, quadrant, frames: int) -> float:
+    ''' median frame time in ms, rotating the camera of the quadrant (or nothing, for None) before each frame '''
+    times = []
+    spin = glm.rotate(0.01, glm.vec3(0, 1, 0))
+    for _ in range(frames):
+        if quadrant is not None:
+            camera = headless.scene.cameras[quadrant]
+            camera.R = spin * camera.R
+        start = time.perf_counter()
+        headless.fbo.use()
+        headless.renderer.render()
+        headless.ctx.finish()
+        times.append(time.perf_counter() - start)
+    return float(np.median(times)) * 1e3
+
+
+def main():
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 and sys.argv[1].isdigit() else 100
+    headless = HeadlessRenderer(1280, 720, software='--software' in sys.argv)
+    renderer = headless.renderer
+    print(f"{'moving':>16} {'uncached ms':>12} {'cached ms':>10} {'speedup':>8}  views drawn per frame")
+    for quadrant in [None, 0, 1, 2, 3]:
+        headless.set_controls(cache_views=False)
+        uncached = frame_ms(headless, quadrant, frames)
+        headless.set_controls(cache_views=True)
+        frame_ms(headless, None, 2)  # fill the view targets
+        renderer.redraws = [0] * 4
+        cached = frame_ms(headless, quadrant, frames)
+        drawn = ' '.join(f'{name}={count / frames:.2f}' for name, count in zip(view_names, renderer.redraws))
+        label = 'nothing' if quadrant is None else view_names[quadrant]
+        print(f'{label:>16} {uncached:>12.2f} {cached:>10.2f} {uncached / cached:>7.1f}x  {drawn}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,10 @@
+#version 330
+
+in vec3 in_position;
+
+out vec2 v_uv;
+
+void main() {
+	v_uv = in_position.xy * 0.5 + 0.5;
+	gl_Position = vec4(in_position, 1.0);
+}
\ No newline at end of file
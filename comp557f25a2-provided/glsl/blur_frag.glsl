@@ -0,0 +1,23 @@
+#version 330
+
+// one direction of a separable Gaussian blur, inside a tile of the texture (the cascades of a shadow map),
+// drawn into a texture of the same size (so the pixel of each fragment is its texel in the source)
+uniform sampler2D u_image;
+uniform ivec2 u_direction;  // (1, 0) or (0, 1)
+uniform vec4 u_tile;        // offset (xy) and scale (zw) of the tile in the texture
+uniform int u_radius;
+uniform float u_weights[9]; // weight of the centre texel, and of the texels 1, 2, ... u_radius away on each side
+
+out vec4 f_color;
+
+void main() {
+	vec2 size = vec2( textureSize( u_image, 0 ) );
+	ivec2 lo = ivec2( u_tile.xy * size + 0.5 );
+	ivec2 hi = ivec2( ( u_tile.xy + u_tile.zw ) * size + 0.5 ) - 1;
+	ivec2 texel = ivec2( gl_FragCoord.xy );
+	f_color = u_weights[0] * texelFetch( u_image, texel, 0 );
+	for ( int i = 1; i <= u_radius; i++ ) {
+		f_color += u_weights[i] * ( texelFetch( u_image, clamp( texel + i * u_direction, lo, hi ), 0 )
+		                          + texelFetch( u_image, clamp( texel - i * u_direction, lo, hi ), 0 ) );
+	}
+}
\ No newline at end of file
@@ -1,2 +1,11 @@
 #version 330
-void main() {}
\ No newline at end of file
+
+out vec2 f_moments; // for variance shadow maps (see ShadowFilter.py), dropped when only depth is drawn
+
+void main() {
+	// depth and depth squared, with the variance of the depth over the pixel from the slope of the surface
+	float z = gl_FragCoord.z;
+	float dx = dFdx( z );
+	float dy = dFdy( z );
+	f_moments = vec2( z, z * z + 0.25 * ( dx * dx + dy * dy ) );
+}
\ No newline at end of file
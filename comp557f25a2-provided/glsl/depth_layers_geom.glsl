@@ -0,0 +1,15 @@
+#version 330
+
+layout(triangles) in;
+layout(triangle_strip, max_vertices = 3) out;
+
+flat in int v_layer[];
+
+void main() {
+	for ( int i = 0; i < 3; i++ ) {
+		gl_Position = gl_in[i].gl_Position;
+		gl_Layer = v_layer[0];
+		EmitVertex();
+	}
+	EndPrimitive();
+}
\ No newline at end of file
@@ -0,0 +1,14 @@
+#version 330
+
+// the shadow maps of the light array (see LightArray.py): each instance draws the casters for one light,
+// in the layer of the light (set by depth_layers_geom.glsl)
+uniform mat4 u_light_pvs[16];
+
+in vec3 in_position;
+
+flat out int v_layer;
+
+void main() {
+	gl_Position = u_light_pvs[gl_InstanceID] * vec4(in_position, 1.0);
+	v_layer = gl_InstanceID;
+}
\ No newline at end of file
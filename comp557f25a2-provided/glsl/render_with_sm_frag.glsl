@@ -1,25 +1,73 @@
 #version 330
 
-uniform vec3 u_light_pos; // light position in view coordinates
+layout(std140) uniform ViewBlock {
+	mat4 u_mv;
+	mat4 u_mvp;
+	mat4 u_light_space_transform;
+	vec4 u_light_pos; // light position in view coordinates (w unused)
+};
 //uniform vec3 u_cam_pos; // camera position in world coordinates
-uniform vec4 u_color; // k_d material parameter, otherwise, the color to draw if lighting disabled
+uniform vec4 u_color; // the color to draw if lighting disabled (k_d material parameter is the vertex colour)
 
 uniform sampler2DShadow u_sampler_shadow;
 uniform sampler2D       u_sampler_shadow_map_raw;
 
+// The features below are compiled in (see ShaderVariants.py): each variant defines them as true or false after
+// the version line, so that the compiler removes the branches on them. The BRANCHING variant reads them from bool
+// uniforms instead, as one program for all features.
+#ifdef BRANCHING
 uniform bool u_use_lighting;
 uniform bool u_use_shadow_map;
 uniform bool u_draw_depth;
 uniform bool u_draw_depth_map;
-
 uniform bool u_use_bias;
+uniform bool u_invert_shadow_test;
+uniform bool u_use_pcf;
+uniform bool u_use_poisson_pcf;
+uniform bool u_use_vsm;
+uniform bool u_use_lights;
+#define LIGHTING u_use_lighting
+#define SHADOW_MAP u_use_shadow_map
+#define DRAW_DEPTH u_draw_depth
+#define DRAW_DEPTH_MAP u_draw_depth_map
+#define DEPTH_BIAS u_use_bias
+#define INVERT_SHADOW_TEST u_invert_shadow_test
+#define PCF u_use_pcf
+#define POISSON_PCF u_use_poisson_pcf
+#define VSM u_use_vsm
+#define LIGHTS u_use_lights
+#define CASCADES true
+#endif
+
 uniform float u_bias_slope_factor; // should set  0.005 as default
 
-uniform bool u_invert_shadow_test;
+// shadow map filters (see ShadowFilter.py), other than the one hardware compare
+uniform sampler2D u_sampler_moments;  // blurred and mipmapped depth and depth squared (variance shadow map)
+uniform int u_pcf_radius;             // the PCF grid has 2 u_pcf_radius + 1 taps on each side, a texel apart
+uniform vec2 u_poisson_taps[32];      // points in the unit disk for Poisson disk PCF, the first u_poisson_count used
+uniform int u_poisson_count;
+uniform float u_filter_radius;        // radius of the Poisson disk, in texels
+uniform float u_vsm_bleed_reduction;  // lit fractions below this are cut to 0 in the variance test (light bleeding)
+
+// shadow map cascades: with more than one, the shadow map has a tile for each slice of the main view by depth
+uniform int u_cascade_count;          // 1 for a single shadow map (u_light_space_transform)
+uniform mat4 u_cascade_transforms[4]; // world to texture coordinates of the light projection of each cascade
+uniform vec4 u_cascade_tiles[4];      // offset (xy) and scale (zw) of the tile of each cascade in the shadow map
+uniform vec4 u_cascade_far;           // main view depth where each cascade ends
+uniform vec4 u_cascade_depth_row;     // main view depth of a world point p is dot(u_cascade_depth_row, vec4(p, 1))
+
+// more lights (see LightArray.py): with LIGHTS, the lighting of u_light_count lights is added up, each with its
+// shadow map in a layer of u_sampler_lights (one compare, without cascades or the other filters)
+uniform sampler2DArrayShadow u_sampler_lights;
+uniform int u_light_count;
+uniform mat4 u_light_transforms[16];  // world to texture coordinates of each light
+uniform vec3 u_lights_view[16];       // light positions in view coordinates
 
 in vec3 v_vert; // vertex position in view coordinates
 in vec3 v_norm; // normal in view coordinates
 in vec4 v_shadow_coord;
+in vec3 v_world;
+in vec4 v_color; // k_d material parameter
 
 out vec4 f_color;
 
@@ -27,33 +75,122 @@ const float LIGHT_AMBIENT = 0.3;
 const vec4 LIGHT = vec4( 0.8, 0.8, 0.8, 1.0 );
 const vec4 k_s   = vec4( 1, 1, 1, 1 );
 
-float compute_visibility(in float cos_theta) {
-	vec2 shadow_coord_ls = v_shadow_coord.xy / v_shadow_coord.w; // normalize for shadow coordinates in light space texture
+vec4 shadow_coord; // light space texture coordinates of the fragment (in its cascade)
+vec4 shadow_tile;  // tile of the cascade in the shadow map
+mat4 shadow_transform; // world to light space texture coordinates of the cascade
+
+void select_cascade() {
+	shadow_coord = v_shadow_coord;
+	shadow_transform = u_light_space_transform;
+	if ( !CASCADES || u_cascade_count <= 1 ) return;
+	float depth = dot( u_cascade_depth_row, vec4( v_world, 1.0 ) );
+	int i = 0;
+	while ( i < u_cascade_count - 1 && depth > u_cascade_far[i] ) i++;
+	shadow_coord = u_cascade_transforms[i] * vec4( v_world, 1.0 );
+	shadow_tile = u_cascade_tiles[i];
+	shadow_transform = u_cascade_transforms[i];
+}
+
+vec2 shadow_map_coords(in vec2 st) {
+	// st in [0,1] in the cascade, kept half a texel inside its tile so that filtering does not read the next tile
+	if ( !CASCADES || u_cascade_count <= 1 ) return st;
+	vec2 half_texel = 0.5 / vec2( textureSize( u_sampler_shadow_map_raw, 0 ) );
+	return clamp( shadow_tile.xy + st * shadow_tile.zw, shadow_tile.xy + half_texel, shadow_tile.xy + shadow_tile.zw - half_texel );
+}
+
+vec2 shadow_tile_scale() {
+	return ( !CASCADES || u_cascade_count <= 1 ) ? vec2( 1.0 ) : shadow_tile.zw;
+}
+
+vec2 shadow_map_texel() {
+	// the size of a texel in the st coordinates of the cascade
+	return 1.0 / ( vec2( textureSize( u_sampler_shadow, 0 ) ) * shadow_tile_scale() );
+}
+
+vec2 shadow_map_gradient(in vec2 st, in vec3 d_world) {
+	// change of the shadow map coordinates of st for a change d_world of the world position, in the cascade of the
+	// fragment (unlike the derivatives of the coordinates, which jump where neighbouring pixels change cascade)
+	vec4 d = shadow_transform * vec4( d_world, 0.0 );
+	return ( d.xy - st * d.w ) / shadow_coord.w * shadow_tile_scale();
+}
+
+float shadow_test(in vec2 st, in float z) {
+	return texture( u_sampler_shadow, vec3( shadow_map_coords( st ), z ) );
+}
+
+float filtered_shadow(in vec2 st, in float z) {
+	// fraction of the shadow map around st (in the cascade) closer to the light than depth z
+	if ( VSM ) {
+		// Chebyshev's upper bound on the lit fraction, from the mean and variance of the depth
+		vec2 moments = textureGrad( u_sampler_moments, shadow_map_coords( st ),
+		                            shadow_map_gradient( st, dFdx( v_world ) ), shadow_map_gradient( st, dFdy( v_world ) ) ).xy;
+		if ( z <= moments.x ) return 0.0;
+		float variance = max( moments.y - moments.x * moments.x, 1e-7 );
+		float d = z - moments.x;
+		float lit = variance / ( variance + d * d );
+		return 1.0 - clamp( ( lit - u_vsm_bleed_reduction ) / ( 1.0 - u_vsm_bleed_reduction ), 0.0, 1.0 );
+	}
+	if ( PCF ) {
+		vec2 texel = shadow_map_texel();
+		float sum = 0.0;
+		for ( int x = -u_pcf_radius; x <= u_pcf_radius; x++ )
+			for ( int y = -u_pcf_radius; y <= u_pcf_radius; y++ )
+				sum += shadow_test( st + vec2( x, y ) * texel, z );
+		float side = 2.0 * u_pcf_radius + 1.0;
+		return sum / ( side * side );
+	}
+	if ( POISSON_PCF ) {
+		vec2 texel = shadow_map_texel() * u_filter_radius;
+		float sum = 0.0;
+		for ( int i = 0; i < u_poisson_count; i++ )
+			sum += shadow_test( st + u_poisson_taps[i] * texel, z );
+		return sum / float( u_poisson_count );
+	}
+	return shadow_test( st, z );
+}
+
+float slope_bias(in float cos_theta) {
 	float bias = 0;
-	if (u_use_bias) {
+	if ( DEPTH_BIAS ) {
 		bias = u_bias_slope_factor * tan(acos(cos_theta)); // bias according to the slope (this function doesn't make a lot of sense)
-		bias = clamp(bias, 0, 0.01) * (u_invert_shadow_test ? -1 : 1);	
+		bias = clamp(bias, 0, 0.01) * (INVERT_SHADOW_TEST ? -1 : 1);	
+	}
+	return bias;
+}
+
+float compute_visibility(in float cos_theta) {
+	vec2 st = shadow_coord.xy / shadow_coord.w; // normalize for shadow coordinates in light space texture
+	float z_from_cam = shadow_coord.z / shadow_coord.w - slope_bias( cos_theta );
+	float shadow_value = filtered_shadow( st, z_from_cam );
+	if ( INVERT_SHADOW_TEST ) {
+		shadow_value = 1.0 - shadow_value;
 	}
-	float z_from_cam = v_shadow_coord.z / v_shadow_coord.w - bias;
-	vec3 shadow_coord = vec3( shadow_coord_ls, z_from_cam );
-	float shadow_value = texture( u_sampler_shadow, shadow_coord );	
-	if ( u_invert_shadow_test ) {
+	return 1.0 - shadow_value;
+}
+
+float light_visibility(in int i, in float cos_theta) {
+	// compute_visibility for light i of the light array
+	vec4 coord = u_light_transforms[i] * vec4( v_world, 1.0 );
+	float z = coord.z / coord.w - slope_bias( cos_theta );
+	float shadow_value = texture( u_sampler_lights, vec4( coord.xy / coord.w, float( i ), z ) );
+	if ( INVERT_SHADOW_TEST ) {
 		shadow_value = 1.0 - shadow_value;
 	}
 	return 1.0 - shadow_value;
 }
 				
 void main() {
-	if ( u_use_lighting == false ) {
+	if ( !LIGHTING ) {
 		f_color = u_color; 
 		return;
 	}
-	if ( u_draw_depth == true ) {
-		f_color = vec4( v_shadow_coord.z / v_shadow_coord.w );
+	select_cascade();
+	if ( DRAW_DEPTH ) {
+		f_color = vec4( shadow_coord.z / shadow_coord.w );
 		return;
 	}
-	if ( u_draw_depth_map == true ) {
-		vec2 shadow_coord_ls = v_shadow_coord.xy / v_shadow_coord.w;			
+	if ( DRAW_DEPTH_MAP ) {
+		vec2 shadow_coord_ls = shadow_map_coords( shadow_coord.xy / shadow_coord.w );
 		float d = texture( u_sampler_shadow_map_raw, shadow_coord_ls ).r;
 		f_color = vec4( d,d,d,1 );
 		return;
@@ -62,17 +199,31 @@ void main() {
 	// Setup vectors for computing lighting, and flip the normal if the face is backfacing
 	// Note that all these vectors are in view coordinates
 	vec3 normal_vector = normalize( v_norm ) * (gl_FrontFacing ? 1 : -1);
-	vec3 light_vector = normalize( u_light_pos - v_vert );
+	vec3 light_vector = normalize( u_light_pos.xyz - v_vert );
 	vec3 view_vector = normalize( - v_vert ); 
 	vec3 half_vector = normalize( light_vector + view_vector );
 
+	if ( LIGHTS ) {
+		// the light is shared evenly between the lights, so the exposure does not change with their number
+		vec4 sum = vec4( 0.0 );
+		for ( int i = 0; i < u_light_count; i++ ) {
+			vec3 l = normalize( u_lights_view[i] - v_vert );
+			float cos_l = dot( l, normal_vector );
+			vec4 L = v_color * LIGHT * max( cos_l, 0.0 ) +
+			         k_s * LIGHT * pow( max( dot( normalize( l + view_vector ), normal_vector ), 0.0 ), 50.0 );
+			sum += ( SHADOW_MAP ? light_visibility( i, cos_l ) : 1.0 ) * L;
+		}
+		f_color = sum / float( u_light_count ) + v_color * LIGHT_AMBIENT + ( SHADOW_MAP ? vec4( 0.0 ) : vec4( 0.1, 0.1, 0.1, 0 ) );
+		return;
+	}
+
 	// Compute lighting contributions
 	float cos_theta = dot( light_vector, normal_vector );
-	vec4 Ld = u_color * LIGHT * max( cos_theta, 0.0 );	
+	vec4 Ld = v_color * LIGHT * max( cos_theta, 0.0 );	
 	vec4 Ls = k_s * LIGHT *  pow( max( dot( half_vector, normal_vector ), 0.0 ), 50.0 );
-	vec4 La = u_color * LIGHT_AMBIENT;
+	vec4 La = v_color * LIGHT_AMBIENT;
 	
-	if ( u_use_shadow_map ) {
+	if ( SHADOW_MAP ) {
 		 f_color = compute_visibility( cos_theta ) * (Ld + Ls) + La;
 		 return;
 	}
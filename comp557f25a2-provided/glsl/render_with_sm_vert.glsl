@@ -1,20 +1,28 @@
 #version 330
 
-uniform mat4 u_mv;
-uniform mat4 u_mvp;
-uniform mat4 u_light_space_transform;
+layout(std140) uniform ViewBlock {
+	mat4 u_mv;
+	mat4 u_mvp;
+	mat4 u_light_space_transform;
+	vec4 u_light_pos; // light position in view coordinates (w unused)
+};
 
 in vec3 in_position;
 in vec3 in_normal;
 in vec2 in_texcoord_0;
+in vec4 in_color; // object colour, used when lighting is enabled
 
 out vec3 v_vert;
 out vec3 v_norm;
 out vec4 v_shadow_coord;
+out vec3 v_world; // world position, for looking up the shadow map cascades
+out vec4 v_color;
 
 void main() {
 	gl_Position = u_mvp * vec4(in_position, 1.0);
+	v_color = in_color;
 	v_shadow_coord = u_light_space_transform * vec4(in_position, 1.0);
+	v_world = in_position;
 	v_vert = (u_mv * vec4(in_position, 1.0)).xyz;
 	v_norm = (u_mv * vec4(in_normal, 0.0)).xyz; // should use the inverse transpose of u_mv if there is non-uniform scaling !!
 }
\ No newline at end of file
@@ -0,0 +1,50 @@
+#version 330
+
+// Visibility of world points from the shadow map (see ShadowQuery.py), one point per vertex, captured with
+// transform feedback: the cascade lookup, slope bias and hardware compare of render_with_sm_frag.glsl.
+
+uniform mat4 u_light_space_transform;
+uniform sampler2DShadow u_sampler_shadow;
+uniform vec3 u_light_pos;             // light position in world coordinates
+uniform bool u_has_normals;           // without normals, the bias is that of a surface facing the light
+uniform bool u_use_bias;
+uniform bool u_invert_shadow_test;
+uniform float u_bias_slope_factor;
+
+uniform int u_cascade_count;          // as in render_with_sm_frag.glsl
+uniform mat4 u_cascade_transforms[4];
+uniform vec4 u_cascade_tiles[4];
+uniform vec4 u_cascade_far;
+uniform vec4 u_cascade_depth_row;
+
+in vec3 in_position;
+in vec3 in_normal;
+
+out float v_visibility;
+
+void main() {
+	vec4 shadow_coord = u_light_space_transform * vec4( in_position, 1.0 );
+	vec4 tile = vec4( 0.0, 0.0, 1.0, 1.0 );
+	if ( u_cascade_count > 1 ) {
+		float depth = dot( u_cascade_depth_row, vec4( in_position, 1.0 ) );
+		int i = 0;
+		while ( i < u_cascade_count - 1 && depth > u_cascade_far[i] ) i++;
+		shadow_coord = u_cascade_transforms[i] * vec4( in_position, 1.0 );
+		tile = u_cascade_tiles[i];
+	}
+	vec2 st = shadow_coord.xy / shadow_coord.w;
+	if ( u_cascade_count > 1 ) {
+		vec2 half_texel = 0.5 / vec2( textureSize( u_sampler_shadow, 0 ) );
+		st = clamp( tile.xy + st * tile.zw, tile.xy + half_texel, tile.xy + tile.zw - half_texel );
+	}
+	float bias = 0;
+	if ( u_use_bias && u_has_normals ) {
+		float cos_theta = dot( normalize( u_light_pos - in_position ), normalize( in_normal ) );
+		bias = clamp( u_bias_slope_factor * tan( acos( cos_theta ) ), 0, 0.01 ) * ( u_invert_shadow_test ? -1 : 1 );
+	}
+	float shadow_value = texture( u_sampler_shadow, vec3( st, shadow_coord.z / shadow_coord.w - bias ) );
+	if ( u_invert_shadow_test ) {
+		shadow_value = 1.0 - shadow_value;
+	}
+	v_visibility = 1.0 - shadow_value;
+}
\ No newline at end of file